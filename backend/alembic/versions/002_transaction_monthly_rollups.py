@@ -0,0 +1,42 @@
+"""Transaction monthly rollups
+
+Revision ID: 002_txn_rollups
+Revises: 001_t1_schema
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "002_txn_rollups"
+down_revision: Union[str, None] = "001_t1_schema"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "transaction_monthly_rollups",
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), primary_key=True),
+        sa.Column("month", sa.Date(), primary_key=True),
+        sa.Column("type", sa.String(50), primary_key=True),
+        sa.Column("category", sa.String(100), primary_key=True),
+        sa.Column("total", sa.Numeric(15, 2), server_default="0", nullable=False),
+        sa.Column("txn_count", sa.Integer(), server_default="0", nullable=False),
+    )
+    # Backfill from existing transactions; afterwards the API keeps it in step.
+    op.execute(
+        """
+        INSERT INTO transaction_monthly_rollups (user_id, month, type, category, total, txn_count)
+        SELECT user_id, date_trunc('month', date)::date, type, category, sum(amount), count(*)
+        FROM transactions
+        GROUP BY user_id, date_trunc('month', date)::date, type, category
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("transaction_monthly_rollups")
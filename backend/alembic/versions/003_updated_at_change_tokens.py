@@ -0,0 +1,36 @@
+"""updated_at columns for conditional GET change tokens
+
+Revision ID: 003_updated_at
+Revises: 002_txn_rollups
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "003_updated_at"
+down_revision: Union[str, None] = "002_txn_rollups"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ["transactions", "stock_holdings", "real_estate_properties", "business_interests", "gold_holdings"]
+
+
+def upgrade() -> None:
+    for table in TABLES:
+        op.add_column(
+            table,
+            sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+        )
+    op.create_index("ix_accounts_user_updated", "accounts", ["user_id", "updated_at"])
+    op.create_index("ix_transactions_user_updated", "transactions", ["user_id", "updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_user_updated", table_name="transactions")
+    op.drop_index("ix_accounts_user_updated", table_name="accounts")
+    for table in TABLES:
+        op.drop_column(table, "updated_at")
@@ -0,0 +1,29 @@
+"""(user_id, date DESC, id DESC) index for keyset pagination
+
+Revision ID: 004_txn_keyset
+Revises: 003_updated_at
+Create Date: 2026-10-18
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "004_txn_keyset"
+down_revision: Union[str, None] = "003_updated_at"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_transactions_user_date_id",
+        "transactions",
+        ["user_id", sa.text("date DESC"), sa.text("id DESC")],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_transactions_user_date_id", table_name="transactions")
@@ -0,0 +1,52 @@
+"""Composite and partial indexes for hot multi-column predicates
+
+Revision ID: 005_composite_indexes
+Revises: 004_txn_keyset
+Create Date: 2026-10-18
+
+(user_id, date) on transactions is already served by
+ix_transactions_user_date_id from revision 004. The single-column user_id
+indexes on accounts and interest_entries are prefixes of the new composites
+and are dropped.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "005_composite_indexes"
+down_revision: Union[str, None] = "004_txn_keyset"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_accounts_user_active_segment_type", "accounts",
+        ["user_id", "is_active", "is_segment", "type"],
+    )
+    op.create_index(
+        "ix_accounts_user_source", "accounts", ["user_id", "source_type", "source_id"],
+        postgresql_where=sa.text("source_type IS NOT NULL"),
+    )
+    op.create_index(
+        "ix_accounts_parent_active", "accounts", ["parent_id"],
+        postgresql_where=sa.text("is_active"),
+    )
+    op.create_index(
+        "ix_interest_entries_user_year_status", "interest_entries",
+        ["user_id", "fiscal_year", "status"],
+    )
+    op.drop_index("ix_accounts_user_id", table_name="accounts")
+    op.drop_index("ix_interest_entries_user_id", table_name="interest_entries")
+
+
+def downgrade() -> None:
+    op.create_index("ix_interest_entries_user_id", "interest_entries", ["user_id"])
+    op.create_index("ix_accounts_user_id", "accounts", ["user_id"])
+    op.drop_index("ix_interest_entries_user_year_status", table_name="interest_entries")
+    op.drop_index("ix_accounts_parent_active", table_name="accounts")
+    op.drop_index("ix_accounts_user_source", table_name="accounts")
+    op.drop_index("ix_accounts_user_active_segment_type", table_name="accounts")
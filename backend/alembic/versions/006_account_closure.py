@@ -0,0 +1,48 @@
+"""Account closure table for arbitrary-depth hierarchies
+
+Revision ID: 006_account_closure
+Revises: 005_composite_indexes
+Create Date: 2026-10-18
+
+Backfilled from accounts.parent_id with a recursive CTE. Parent balances
+were previously summed one level deep; run
+`python -m app.services.segments --repair` afterwards to roll up deeper trees.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "006_account_closure"
+down_revision: Union[str, None] = "005_composite_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "account_closure",
+        sa.Column("ancestor_id", sa.Integer(), sa.ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("descendant_id", sa.Integer(), sa.ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True),
+        sa.Column("depth", sa.Integer(), nullable=False),
+    )
+    op.create_index("ix_account_closure_descendant", "account_closure", ["descendant_id", "depth"])
+    op.execute(
+        """
+        WITH RECURSIVE tree (ancestor_id, descendant_id, depth) AS (
+            SELECT id, id, 0 FROM accounts
+            UNION ALL
+            SELECT tree.ancestor_id, accounts.id, tree.depth + 1
+            FROM tree JOIN accounts ON accounts.parent_id = tree.descendant_id
+        )
+        INSERT INTO account_closure (ancestor_id, descendant_id, depth)
+        SELECT ancestor_id, descendant_id, depth FROM tree
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_account_closure_descendant", table_name="account_closure")
+    op.drop_table("account_closure")
@@ -0,0 +1,61 @@
+"""Unique root segment per user and category
+
+Revision ID: 007_unique_root_segments
+Revises: 006_account_closure
+Create Date: 2026-10-18
+
+Segment creation used to add a fresh "cash" segment for every account whose
+category had no default segment (bank, loan, ...). Duplicates are merged
+into the oldest segment of their category before the index is created:
+children and closure rows are moved over, and balances added together.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "007_unique_root_segments"
+down_revision: Union[str, None] = "006_account_closure"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+DUPLICATES = """
+    WITH ranked AS (
+        SELECT id, first_value(id) OVER (PARTITION BY user_id, category ORDER BY id) AS keeper
+        FROM accounts WHERE is_segment AND parent_id IS NULL
+    ), dupes AS (
+        SELECT id, keeper FROM ranked WHERE id <> keeper
+    )
+"""
+
+
+def upgrade() -> None:
+    op.execute(DUPLICATES + """
+        INSERT INTO account_closure (ancestor_id, descendant_id, depth)
+        SELECT dupes.keeper, c.descendant_id, c.depth
+        FROM account_closure c JOIN dupes ON c.ancestor_id = dupes.id
+        WHERE c.depth > 0
+    """)
+    op.execute(DUPLICATES + """
+        UPDATE accounts SET parent_id = dupes.keeper
+        FROM dupes WHERE accounts.parent_id = dupes.id
+    """)
+    op.execute(DUPLICATES + """
+        UPDATE accounts SET balance = accounts.balance + merged.total
+        FROM (
+            SELECT dupes.keeper, sum(a.balance) AS total
+            FROM accounts a JOIN dupes ON a.id = dupes.id GROUP BY dupes.keeper
+        ) merged
+        WHERE accounts.id = merged.keeper
+    """)
+    op.execute(DUPLICATES + "DELETE FROM accounts USING dupes WHERE accounts.id = dupes.id")
+    op.create_index(
+        "uq_accounts_user_root_segment", "accounts", ["user_id", "category"], unique=True,
+        postgresql_where=sa.text("is_segment AND parent_id IS NULL"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("uq_accounts_user_root_segment", table_name="accounts")
@@ -0,0 +1,38 @@
+"""FX rate table for multi-currency totals
+
+Revision ID: 008_fx_rates
+Revises: 007_unique_root_segments
+Create Date: 2026-10-18
+
+Load rates with `python -m app.services.fx [--file rates.csv]`.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "008_fx_rates"
+down_revision: Union[str, None] = "007_unique_root_segments"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "fx_rates",
+        sa.Column("base", sa.String(10), primary_key=True),
+        sa.Column("quote", sa.String(10), primary_key=True),
+        sa.Column("date", sa.Date(), primary_key=True),
+        sa.Column("rate", sa.Numeric(20, 10), nullable=False),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.create_index("ix_fx_rates_quote_base_date", "fx_rates", ["quote", "base", "date"])
+    op.create_index("ix_fx_rates_updated_at", "fx_rates", ["updated_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_fx_rates_updated_at", table_name="fx_rates")
+    op.drop_index("ix_fx_rates_quote_base_date", table_name="fx_rates")
+    op.drop_table("fx_rates")
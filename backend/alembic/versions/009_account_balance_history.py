@@ -0,0 +1,49 @@
+"""Append-only account balance history
+
+Revision ID: 009_account_balance_history
+Revises: 008_fx_rates
+Create Date: 2026-10-18
+
+Every existing account starts its history with its current balance,
+stamped with its last update time.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "009_account_balance_history"
+down_revision: Union[str, None] = "008_fx_rates"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "account_balance_history",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("account_id", sa.Integer(), sa.ForeignKey("accounts.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("balance", sa.Numeric(15, 2), nullable=False),
+        sa.Column("recorded_at", sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=False),
+    )
+    op.execute("""
+        INSERT INTO account_balance_history (account_id, user_id, balance, recorded_at)
+        SELECT id, user_id, balance, coalesce(updated_at, created_at, now()) FROM accounts
+        ORDER BY coalesce(updated_at, created_at, now())
+    """)
+    op.create_index(
+        "ix_account_balance_history_account_time", "account_balance_history", ["account_id", "recorded_at"],
+    )
+    op.create_index(
+        "ix_account_balance_history_recorded_brin", "account_balance_history", ["recorded_at"],
+        postgresql_using="brin",
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_account_balance_history_recorded_brin", table_name="account_balance_history")
+    op.drop_index("ix_account_balance_history_account_time", table_name="account_balance_history")
+    op.drop_table("account_balance_history")
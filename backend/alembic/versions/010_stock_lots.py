@@ -0,0 +1,67 @@
+"""Tax lots and trades for stock holdings
+
+Revision ID: 010_stock_lots
+Revises: 009_account_balance_history
+Create Date: 2026-10-18
+
+Each existing holding gets one open lot of its current shares at its
+average cost, acquired when the holding was created.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "010_stock_lots"
+down_revision: Union[str, None] = "009_account_balance_history"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("stock_holdings", sa.Column("cost_method", sa.String(10), server_default="fifo", nullable=False))
+    op.add_column("stock_holdings", sa.Column("cost_basis", sa.Numeric(18, 4), server_default="0", nullable=False))
+    op.add_column("stock_holdings", sa.Column("realized_gain", sa.Numeric(15, 2), server_default="0", nullable=False))
+    op.execute("UPDATE stock_holdings SET cost_basis = shares * avg_cost")
+
+    op.create_table(
+        "stock_lots",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("holding_id", sa.Integer(), sa.ForeignKey("stock_holdings.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("acquired_at", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("shares", sa.Numeric(15, 4), nullable=False),
+        sa.Column("shares_open", sa.Numeric(15, 4), nullable=False),
+        sa.Column("cost_per_share", sa.Numeric(15, 4), nullable=False),
+    )
+    op.execute("""
+        INSERT INTO stock_lots (holding_id, acquired_at, shares, shares_open, cost_per_share)
+        SELECT id, coalesce(created_at, now()), shares, shares, avg_cost FROM stock_holdings WHERE shares > 0
+    """)
+    op.create_index(
+        "ix_stock_lots_holding_open", "stock_lots", ["holding_id", "acquired_at", "id"],
+        postgresql_where=sa.text("shares_open > 0"),
+    )
+
+    op.create_table(
+        "stock_trades",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("holding_id", sa.Integer(), sa.ForeignKey("stock_holdings.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("side", sa.String(4), nullable=False),
+        sa.Column("shares", sa.Numeric(15, 4), nullable=False),
+        sa.Column("price", sa.Numeric(15, 4), nullable=False),
+        sa.Column("realized_gain", sa.Numeric(15, 2), nullable=False),
+        sa.Column("traded_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.create_index("ix_stock_trades_holding_time", "stock_trades", ["holding_id", "traded_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stock_trades_holding_time", table_name="stock_trades")
+    op.drop_table("stock_trades")
+    op.drop_index("ix_stock_lots_holding_open", table_name="stock_lots")
+    op.drop_table("stock_lots")
+    op.drop_column("stock_holdings", "realized_gain")
+    op.drop_column("stock_holdings", "cost_basis")
+    op.drop_column("stock_holdings", "cost_method")
@@ -0,0 +1,55 @@
+"""Holding flows for performance returns
+
+Revision ID: 011_holding_flows
+Revises: 010_stock_lots
+Create Date: 2026-10-18
+
+Backfilled from what survives: each mirror account's first recorded
+balance stands for its holding's creation, and every stock trade is a
+flow. Holdings deleted before this revision are not recoverable.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision: str = "011_holding_flows"
+down_revision: Union[str, None] = "010_stock_lots"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "holding_flows",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+        sa.Column("source_type", sa.String(20), nullable=False),
+        sa.Column("source_id", sa.Integer(), nullable=False),
+        sa.Column("amount", sa.Numeric(15, 2), nullable=False),
+        sa.Column("flowed_at", sa.DateTime(timezone=True), nullable=False),
+    )
+    op.execute("""
+        INSERT INTO holding_flows (user_id, source_type, source_id, amount, flowed_at)
+        SELECT user_id, source_type, source_id, balance, recorded_at FROM (
+            SELECT DISTINCT ON (a.id) a.user_id, a.source_type, a.source_id, h.balance, h.recorded_at
+            FROM accounts a JOIN account_balance_history h ON h.account_id = a.id
+            WHERE a.source_type IN ('stock', 'real_estate', 'business', 'gold')
+            ORDER BY a.id, h.recorded_at, h.id
+        ) AS opened
+        WHERE balance <> 0
+    """)
+    op.execute("""
+        INSERT INTO holding_flows (user_id, source_type, source_id, amount, flowed_at)
+        SELECT s.user_id, 'stock', t.holding_id,
+               round(CASE WHEN t.side = 'buy' THEN 1 ELSE -1 END * t.shares * t.price, 2), t.traded_at
+        FROM stock_trades t JOIN stock_holdings s ON s.id = t.holding_id
+    """)
+    op.create_index("ix_holding_flows_user_time", "holding_flows", ["user_id", "flowed_at"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_holding_flows_user_time", table_name="holding_flows")
+    op.drop_table("holding_flows")
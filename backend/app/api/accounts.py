@@ -1,16 +1,48 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+import csv
+import io
+import json
+from collections import defaultdict
+from datetime import date, datetime
+from typing import Literal
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from pydantic import ValidationError
+from sqlalchemy import Integer, Numeric, column, exists, insert, select, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
+from app.core.cache import cached_response, report_cache, segment_ids
+from app.core.config import settings
 from app.core.database import get_db
+from app.core.etag import conditional_get
 from app.core.security import get_current_user
-from app.models.account import Account
+from app.models.account import Account, AccountClosure
+from app.models.fx import FxRate
 from app.models.user import User
-from app.schemas.account import AccountCreate, AccountUpdate, AccountResponse, SegmentSummary
+from app.schemas.account import (
+    AccountBalanceAt,
+    AccountBalanceHistoryResponse,
+    AccountBulkError,
+    AccountBulkResult,
+    AccountCreate,
+    AccountResponse,
+    AccountUpdate,
+    BalancePoint,
+    SegmentSummary,
+)
+from app.services.balance_history import get_balance_at, get_balance_history, record_balances, recorded
+from app.services.fx import fx_cache
+from app.services.hierarchy import (
+    ancestor_chain, ancestor_deltas, is_in_subtree, link_account, link_accounts, move_subtree,
+)
 
 router = APIRouter(prefix="/accounts", tags=["accounts"])
 
+BULK_MAX_ROWS = 10_000
+
 
 DEFAULT_SEGMENTS = [
     {"name": "Cash & Bank", "type": "asset", "category": "cash"},
@@ -24,79 +56,226 @@ DEFAULT_SEGMENTS = [
 ]
 
 
-async def ensure_segments(user_id: int, db: AsyncSession) -> list[Account]:
+# Account categories without a segment of their own
+SEGMENT_FOR_CATEGORY = {
+    "bank": "cash",
+    "crypto": "investment",
+    "equipment": "business",
+    "loan": "liability",
+    "credit_card": "liability",
+    "mortgage": "liability",
+}
+SEGMENT_CATEGORIES = {seg["category"] for seg in DEFAULT_SEGMENTS}
+
+
+def segment_category(category: str) -> str:
+    if category in SEGMENT_CATEGORIES:
+        return category
+    return SEGMENT_FOR_CATEGORY.get(category, "other")
+
+
+async def load_segments(user_id: int, db: AsyncSession) -> dict[str, int]:
+    """{category: id} of the user's root segments; refreshes `segment_ids`."""
     result = await db.execute(
-        select(Account).where(Account.user_id == user_id, Account.is_segment == True, Account.parent_id == None)
+        select(Account.category, Account.id).where(
+            Account.user_id == user_id, Account.is_segment == True, Account.parent_id == None,
+        )
     )
-    segments = list(result.scalars().all())
-    if segments:
-        return segments
-
-    for seg in DEFAULT_SEGMENTS:
-        account = Account(user_id=user_id, is_segment=True, balance=0, **seg)
-        db.add(account)
-        segments.append(account)
-    await db.commit()
-    for s in segments:
-        await db.refresh(s)
+    segments = dict(result.all())
+    for category, segment_id in segments.items():
+        segment_ids.put(user_id, category, segment_id)
     return segments
 
 
-async def get_or_create_segment(user_id: int, category: str, db: AsyncSession) -> Account:
-    result = await db.execute(
-        select(Account).where(
-            Account.user_id == user_id, Account.is_segment == True,
-            Account.parent_id == None, Account.category == category,
+async def ensure_segments(user_id: int, db: AsyncSession) -> dict[str, int]:
+    """Create any missing default segments and return {category: id} for all of them.
+
+    Creation is one INSERT ... ON CONFLICT DO NOTHING against the unique root
+    segment index, so concurrent first requests can't create duplicates. It
+    runs and commits in its own transaction, so the ids are safe to cache and
+    whatever the caller has staged in `db` is left uncommitted.
+    """
+    async with AsyncSession(db.bind) as own:
+        result = await own.execute(
+            pg_insert(Account)
+            .values([{"user_id": user_id, "is_segment": True, "balance": 0, **seg} for seg in DEFAULT_SEGMENTS])
+            .on_conflict_do_nothing(
+                index_elements=["user_id", "category"],
+                index_where=(Account.is_segment == True) & (Account.parent_id == None),
+            )
+            .returning(Account.id)
         )
+        created = list(result.scalars().all())
+        await link_accounts(own, created)
+        await record_balances(own, created)
+        await own.commit()
+    return await load_segments(user_id, db)
+
+
+async def get_segment_id(user_id: int, category: str, db: AsyncSession) -> int:
+    """Id of the root segment an account of `category` belongs under, creating segments if needed."""
+    category = segment_category(category)
+    segment_id = segment_ids.get(user_id, category)
+    if segment_id is not None:
+        return segment_id
+    segments = await load_segments(user_id, db)
+    if category not in segments:
+        segments = await ensure_segments(user_id, db)
+    return segments[category]
+
+
+def _is_fk_violation(exc: IntegrityError) -> bool:
+    # asyncpg's error sits behind SQLAlchemy's DBAPI adapter as its __cause__
+    sqlstate = getattr(exc.orig, "sqlstate", None) or getattr(getattr(exc.orig, "__cause__", None), "sqlstate", None)
+    return sqlstate == "23503"
+
+
+async def add_to_segment(db: AsyncSession, account: Account, category: str):
+    """Add `account` under the user's root segment for `category`, flushed and linked.
+
+    `segment_ids` is per process, so a cached id can name a segment another
+    worker has deleted. A cached id is tried in a savepoint; if the insert
+    fails its foreign key, the entry is evicted and the insert retried once
+    with the id reloaded from the database.
+    """
+    category = segment_category(category)
+    cached = segment_ids.get(account.user_id, category)
+    if cached is not None:
+        account.parent_id = cached
+        try:
+            async with db.begin_nested():
+                db.add(account)
+                await link_account(db, account)
+            return
+        except IntegrityError as exc:
+            if not _is_fk_violation(exc):
+                raise
+            segment_ids.discard(account.user_id, category)
+    account.parent_id = await get_segment_id(account.user_id, category, db)
+    db.add(account)
+    await link_account(db, account)
+
+
+def balance_share(account: Account) -> float:
+    """What an account contributes to its parent's balance."""
+    return float(account.balance) if account.is_active else 0.0
+
+
+async def apply_balance_delta(parent_id: int | None, delta: float, db: AsyncSession):
+    """Add `delta` to a parent's balance, and its ancestors', in the caller's transaction.
+
+    The increment happens in the UPDATE itself, so concurrent writers queue
+    on the parents' row locks instead of overwriting each other's totals.
+    Callers lock the child row they are changing (SELECT ... FOR UPDATE)
+    before reading its old balance.
+    """
+    if parent_id is None or not delta:
+        return
+    await db.execute(
+        recorded(
+            update(Account)
+            .where(Account.id.in_(ancestor_chain(parent_id)))
+            .values(balance=Account.balance + delta)
+        ),
+        execution_options={"synchronize_session": False},
     )
-    seg = result.scalar_one_or_none()
-    if seg:
-        return seg
-    segments = await ensure_segments(user_id, db)
-    for s in segments:
-        if s.category == category:
-            return s
-    seg_info = next((s for s in DEFAULT_SEGMENTS if s["category"] == category), DEFAULT_SEGMENTS[0])
-    seg = Account(user_id=user_id, is_segment=True, balance=0, **seg_info)
-    db.add(seg)
-    await db.commit()
-    await db.refresh(seg)
-    return seg
 
 
-async def recalculate_segment_balance(segment_id: int, db: AsyncSession):
+async def apply_balance_deltas(deltas: dict[int, float], db: AsyncSession):
+    """`apply_balance_delta` for many parents at once, in one UPDATE.
+
+    Parents that share ancestors have their deltas summed before the update.
+    """
+    deltas = {parent_id: delta for parent_id, delta in deltas.items() if parent_id is not None and delta}
+    if not deltas:
+        return
+    changes = values(
+        column("parent_id", Integer), column("delta", Numeric), name="changes",
+    ).data(list(deltas.items()))
+    totals = ancestor_deltas(changes).subquery()
+    await db.execute(
+        recorded(
+            update(Account)
+            .where(Account.id == totals.c.id)
+            .values(balance=Account.balance + totals.c.delta)
+        ),
+        execution_options={"synchronize_session": False},
+    )
+
+
+async def move_balance(
+    old_parent_id: int | None, old_share: float,
+    new_parent_id: int | None, new_share: float,
+    db: AsyncSession,
+):
+    """Shift an account's contribution between parents (or within one) after a write."""
+    if old_parent_id == new_parent_id:
+        await apply_balance_delta(new_parent_id, new_share - old_share, db)
+    else:
+        await apply_balance_delta(old_parent_id, -old_share, db)
+        await apply_balance_delta(new_parent_id, new_share, db)
+
+
+def build_account_tree(accounts: list[Account]) -> list[Account]:
+    """Populate `children` from an already-loaded list of accounts; returns the roots."""
+    by_parent: dict[int | None, list[Account]] = defaultdict(list)
+    for account in accounts:
+        by_parent[account.parent_id].append(account)
+    for account in accounts:
+        set_committed_value(account, "children", by_parent.get(account.id, []))
+    return by_parent[None]
+
+
+async def load_account_tree(user_id: int, db: AsyncSession) -> list[Account]:
+    """All of a user's accounts in one query, newest first, with children attached."""
     result = await db.execute(
-        select(Account).where(Account.parent_id == segment_id, Account.is_active == True)
+        select(Account).where(Account.user_id == user_id).order_by(Account.created_at.desc(), Account.id.desc())
     )
-    children = result.scalars().all()
-    total = sum(float(c.balance) for c in children)
-    seg_result = await db.execute(select(Account).where(Account.id == segment_id))
-    seg = seg_result.scalar_one_or_none()
-    if seg:
-        seg.balance = total
-        await db.commit()
+    accounts = list(result.scalars().all())
+    build_account_tree(accounts)
+    return accounts
+
+
+async def load_account_subtree(account_id: int, user_id: int, db: AsyncSession) -> Account | None:
+    """One account with its whole subtree attached as `children`, in one query."""
+    result = await db.execute(
+        select(Account)
+        .join(AccountClosure, AccountClosure.descendant_id == Account.id)
+        .where(AccountClosure.ancestor_id == account_id, Account.user_id == user_id)
+        .order_by(Account.created_at.desc(), Account.id.desc())
+        .execution_options(populate_existing=True)
+    )
+    accounts = list(result.scalars().all())
+    build_account_tree(accounts)
+    return next((a for a in accounts if a.id == account_id), None)
 
 
 @router.get("/purse", response_model=list[SegmentSummary])
+@conditional_get(Account, FxRate)
+@cached_response("accounts:purse")
 async def get_purse(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    segments = await ensure_segments(current_user.id, db)
+    accounts = await load_account_tree(current_user.id, db)
+    segments = sorted((a for a in accounts if a.is_segment and a.parent_id is None), key=lambda a: a.id)
+    if not segments:
+        await ensure_segments(current_user.id, db)
+        accounts = await load_account_tree(current_user.id, db)
+        segments = sorted((a for a in accounts if a.is_segment and a.parent_id is None), key=lambda a: a.id)
+
+    active = {seg.id: [c for c in seg.children if c.is_active] for seg in segments}
+    balances = iter(await fx_cache.convert_many(
+        db, [(float(c.balance), c.currency) for seg in segments for c in active[seg.id]], current_user.currency,
+    ))
     result = []
     for seg in segments:
-        children_result = await db.execute(
-            select(Account).where(Account.parent_id == seg.id, Account.is_active == True)
-            .options(selectinload(Account.children))
-            .order_by(Account.created_at.desc())
-        )
-        children = list(children_result.scalars().all())
-        total = sum(float(c.balance) for c in children)
+        children = active[seg.id]
         result.append(SegmentSummary(
             id=seg.id,
             name=seg.name,
             category=seg.category,
-            total_balance=total,
+            total_balance=sum(next(balances) for _ in children),
             currency=current_user.currency,
             sub_segments=[AccountResponse.model_validate(c) for c in children],
         ))
@@ -108,12 +287,13 @@ async def list_accounts(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(
-        select(Account).where(Account.user_id == current_user.id)
-        .options(selectinload(Account.children))
-        .order_by(Account.created_at.desc())
-    )
-    return result.scalars().all()
+    return await load_account_tree(current_user.id, db)
+
+
+async def _check_parent_owned(parent_id: int, user: User, db: AsyncSession):
+    owned = await db.scalar(select(exists().where(Account.id == parent_id, Account.user_id == user.id)))
+    if not owned:
+        raise HTTPException(status_code=404, detail="Parent account not found")
 
 
 @router.post("", response_model=AccountResponse, status_code=201)
@@ -122,35 +302,138 @@ async def create_account(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    parent_id = data.parent_id
-    if not parent_id:
-        segment = await get_or_create_segment(current_user.id, data.category, db)
-        parent_id = segment.id
-
     account = Account(
         user_id=current_user.id,
-        parent_id=parent_id,
+        parent_id=data.parent_id,
         name=data.name,
         type=data.type,
         category=data.category,
         balance=data.balance,
         currency=data.currency or current_user.currency,
     )
-    db.add(account)
+    if data.parent_id:
+        await _check_parent_owned(data.parent_id, current_user, db)
+        db.add(account)
+        await link_account(db, account)
+    else:
+        await add_to_segment(db, account, data.category)
+    await record_balances(db, [account.id])
+    await apply_balance_delta(account.parent_id, data.balance, db)
     await db.commit()
     await db.refresh(account)
-    await recalculate_segment_balance(parent_id, db)
+    await report_cache.invalidate(current_user.id)
     return account
 
 
+async def _read_bulk_rows(request: Request) -> list:
+    """Rows from a JSON array, a text/csv body or a multipart upload named `file`."""
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("multipart/form-data"):
+        upload = (await request.form()).get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(status_code=400, detail="Expected a CSV file in the 'file' field")
+        text = (await upload.read()).decode("utf-8-sig")
+    elif content_type.startswith("text/csv"):
+        text = (await request.body()).decode("utf-8-sig")
+    else:
+        try:
+            rows = json.loads(await request.body())
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid JSON body")
+        if not isinstance(rows, list):
+            raise HTTPException(status_code=400, detail="Expected a JSON array of accounts")
+        return rows
+    # Blank cells fall back to the field defaults
+    return [{k: v for k, v in row.items() if v not in ("", None)} for row in csv.DictReader(io.StringIO(text))]
+
+
+def _validation_message(exc: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(p) for p in err['loc']) or 'row'}: {err['msg']}" for err in exc.errors())
+
+
+@router.post("/bulk", response_model=AccountBulkResult)
+async def bulk_create_accounts(
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Create many accounts in one transaction; invalid rows are reported and skipped."""
+    rows = await _read_bulk_rows(request)
+    if len(rows) > BULK_MAX_ROWS:
+        raise HTTPException(status_code=413, detail=f"At most {BULK_MAX_ROWS} rows per import")
+
+    errors: list[AccountBulkError] = []
+    valid: list[tuple[int, AccountCreate]] = []
+    for row_number, row in enumerate(rows, start=1):
+        try:
+            valid.append((row_number, AccountCreate.model_validate(row)))
+        except ValidationError as exc:
+            errors.append(AccountBulkError(row=row_number, error=_validation_message(exc)))
+
+    parent_ids = {data.parent_id for _, data in valid if data.parent_id}
+    if parent_ids:
+        result = await db.execute(
+            select(Account.id).where(Account.id.in_(parent_ids), Account.user_id == current_user.id)
+        )
+        owned = set(result.scalars().all())
+        for row_number, data in valid:
+            if data.parent_id and data.parent_id not in owned:
+                errors.append(AccountBulkError(row=row_number, error="parent_id: account not found"))
+        valid = [(n, data) for n, data in valid if not data.parent_id or data.parent_id in owned]
+
+    # Looked up rather than taken from `segment_ids`, which may be stale in this worker
+    categories = {segment_category(data.category) for _, data in valid if not data.parent_id}
+    segments = await load_segments(current_user.id, db) if categories else {}
+    if not categories <= segments.keys():
+        segments = await ensure_segments(current_user.id, db)
+
+    values = [
+        {
+            "user_id": current_user.id,
+            "parent_id": data.parent_id or segments[segment_category(data.category)],
+            "name": data.name,
+            "type": data.type,
+            "category": data.category,
+            "balance": data.balance,
+            "currency": data.currency or current_user.currency,
+        }
+        for _, data in valid
+    ]
+    account_ids: list[int] = []
+    if values:
+        result = await db.execute(
+            insert(Account).returning(Account.id, sort_by_parameter_order=True), values,
+        )
+        account_ids = list(result.scalars().all())
+        await link_accounts(db, account_ids)
+        await record_balances(db, account_ids)
+
+        deltas: dict[int, float] = defaultdict(float)
+        for row in values:
+            deltas[row["parent_id"]] += row["balance"]
+        await apply_balance_deltas(deltas, db)
+        await db.commit()
+        await report_cache.invalidate(current_user.id)
+
+    errors.sort(key=lambda e: e.row)
+    return AccountBulkResult(created=len(account_ids), account_ids=account_ids, errors=errors)
+
+
 @router.get("/{account_id}", response_model=AccountResponse)
 async def get_account(
     account_id: int,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
+    account = await load_account_subtree(account_id, current_user.id, db)
+    if not account:
+        raise HTTPException(status_code=404, detail="Account not found")
+    return account
+
+
+async def _owned_account(account_id: int, user: User, db: AsyncSession) -> Account:
     result = await db.execute(
-        select(Account).where(Account.id == account_id, Account.user_id == current_user.id)
+        select(Account).where(Account.id == account_id, Account.user_id == user.id)
     )
     account = result.scalar_one_or_none()
     if not account:
@@ -158,6 +441,43 @@ async def get_account(
     return account
 
 
+@router.get("/{account_id}/history", response_model=AccountBalanceHistoryResponse)
+async def get_account_history(
+    account_id: int,
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    resolution: Literal["daily", "weekly", "monthly"] = "daily",
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    account = await _owned_account(account_id, current_user, db)
+    rows = await get_balance_history(
+        db, account.id, date_from, date_to, resolution, settings.BALANCE_HISTORY_MAX_POINTS,
+    )
+    return AccountBalanceHistoryResponse(
+        account_id=account.id,
+        currency=account.currency,
+        points=[BalancePoint(recorded_at=at, balance=balance) for at, balance in rows],
+    )
+
+
+@router.get("/{account_id}/balance-at", response_model=AccountBalanceAt)
+async def get_account_balance_at(
+    account_id: int,
+    at: datetime,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    account = await _owned_account(account_id, current_user, db)
+    found = await get_balance_at(db, account.id, at)
+    if found is None:
+        raise HTTPException(status_code=404, detail="No balance recorded at or before that time")
+    recorded_at, balance = found
+    return AccountBalanceAt(
+        account_id=account.id, at=at, recorded_at=recorded_at, balance=balance, currency=account.currency,
+    )
+
+
 @router.put("/{account_id}", response_model=AccountResponse)
 async def update_account(
     account_id: int,
@@ -167,19 +487,30 @@ async def update_account(
 ):
     result = await db.execute(
         select(Account).where(Account.id == account_id, Account.user_id == current_user.id)
+        .with_for_update()
     )
     account = result.scalar_one_or_none()
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
 
+    old_parent_id, old_share, old_balance = account.parent_id, balance_share(account), account.balance
+    if account.is_segment and account.parent_id is None:
+        segment_ids.discard(current_user.id, account.category)
     for key, value in data.model_dump(exclude_unset=True).items():
         setattr(account, key, value)
+    if account.parent_id != old_parent_id:
+        if account.parent_id is not None:
+            await _check_parent_owned(account.parent_id, current_user, db)
+            if await is_in_subtree(db, account.parent_id, account.id):
+                raise HTTPException(status_code=400, detail="An account cannot be moved under itself")
+        await move_subtree(db, account.id, account.parent_id)
+    await move_balance(old_parent_id, old_share, account.parent_id, balance_share(account), db)
+    if account.balance != old_balance:
+        await record_balances(db, [account.id])
 
     await db.commit()
-    await db.refresh(account)
-    if account.parent_id:
-        await recalculate_segment_balance(account.parent_id, db)
-    return account
+    await report_cache.invalidate(current_user.id)
+    return await load_account_subtree(account.id, current_user.id, db)
 
 
 @router.delete("/{account_id}", status_code=204)
@@ -190,12 +521,17 @@ async def delete_account(
 ):
     result = await db.execute(
         select(Account).where(Account.id == account_id, Account.user_id == current_user.id)
+        .with_for_update()
+        .options(selectinload(Account.children))  # so the unit of work detaches them
     )
     account = result.scalar_one_or_none()
     if not account:
         raise HTTPException(status_code=404, detail="Account not found")
-    parent_id = account.parent_id
+    if account.is_segment and account.parent_id is None:
+        segment_ids.discard(current_user.id, account.category)
+    await apply_balance_delta(account.parent_id, -balance_share(account), db)
+    # Its children become top-level accounts; their subtrees stay intact
+    await move_subtree(db, account.id, None)
     await db.delete(account)
     await db.commit()
-    if parent_id:
-        await recalculate_segment_balance(parent_id, db)
+    await report_cache.invalidate(current_user.id)
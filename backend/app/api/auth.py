@@ -2,6 +2,7 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import report_cache
 from app.core.database import get_db
 from app.core.security import (
     create_access_token,
@@ -93,4 +94,5 @@ async def update_me(
         setattr(current_user, key, value)
     await db.commit()
     await db.refresh(current_user)
+    await report_cache.invalidate(current_user.id)
     return current_user
@@ -1,5 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.database import get_db
@@ -9,7 +9,7 @@ from app.models.user import User
 from app.schemas.investment import (
     GoldHoldingCreate, GoldHoldingUpdate, GoldHoldingResponse, GRAMS_PER_VORI,
 )
-from app.api.investments import sync_investment_account, remove_investment_account
+from app.services.ledger_sync import LedgerSync
 
 router = APIRouter(prefix="/investments/gold", tags=["gold"])
 
@@ -32,8 +32,18 @@ async def list_gold(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(GoldHolding).where(GoldHolding.user_id == current_user.id))
-    return [_build_response(h) for h in result.scalars().all()]
+    current_value = GoldHolding.weight_vori * GoldHolding.current_price_per_vori
+    result = await db.execute(
+        select(
+            GoldHolding.id, GoldHolding.user_id, GoldHolding.name, GoldHolding.weight_vori,
+            func.round(GoldHolding.weight_vori * GRAMS_PER_VORI, 4).label("weight_grams"),
+            GoldHolding.purchase_price_per_vori, GoldHolding.current_price_per_vori,
+            current_value.label("current_value"),
+            (current_value - GoldHolding.weight_vori * GoldHolding.purchase_price_per_vori).label("gain_loss"),
+            GoldHolding.created_at,
+        ).where(GoldHolding.user_id == current_user.id).order_by(GoldHolding.id)
+    )
+    return result.all()
 
 
 @router.post("", response_model=GoldHoldingResponse, status_code=201)
@@ -50,14 +60,11 @@ async def create_gold(
         purchase_price_per_vori=data.purchase_price_per_vori,
         current_price_per_vori=data.current_price_per_vori,
     )
-    db.add(holding)
-    await db.commit()
-    await db.refresh(holding)
-
     cv = weight_vori * data.current_price_per_vori
-    await sync_investment_account(
-        current_user.id, "gold", holding.id, holding.name, cv, "gold", db
-    )
+    ledger = LedgerSync(db, current_user.id)
+    ledger.add(holding)
+    await ledger.mirror("gold", holding, holding.name, cv, "gold")
+    await ledger.commit()
 
     return _build_response(holding)
 
@@ -76,7 +83,8 @@ async def update_gold(
     if not holding:
         raise HTTPException(status_code=404, detail="Gold holding not found")
 
-    new_vori = data.weight_in_vori(float(holding.weight_vori))
+    old_vori = float(holding.weight_vori)
+    new_vori = data.weight_in_vori(old_vori)
     holding.weight_vori = new_vori
     if data.purchase_price_per_vori is not None:
         holding.purchase_price_per_vori = data.purchase_price_per_vori
@@ -84,13 +92,11 @@ async def update_gold(
         holding.current_price_per_vori = data.current_price_per_vori
     if data.name is not None:
         holding.name = data.name
-    await db.commit()
-    await db.refresh(holding)
-
     cv = float(holding.weight_vori) * float(holding.current_price_per_vori)
-    await sync_investment_account(
-        current_user.id, "gold", holding.id, holding.name, cv, "gold", db
-    )
+    ledger = LedgerSync(db, current_user.id)
+    ledger.flow("gold", holding.id, (float(new_vori) - old_vori) * float(holding.current_price_per_vori))
+    await ledger.mirror("gold", holding, holding.name, cv, "gold")
+    await ledger.commit()
 
     return _build_response(holding)
 
@@ -107,6 +113,7 @@ async def delete_gold(
     holding = result.scalar_one_or_none()
     if not holding:
         raise HTTPException(status_code=404, detail="Gold holding not found")
-    await remove_investment_account(current_user.id, "gold", holding.id, db)
-    await db.delete(holding)
-    await db.commit()
+    ledger = LedgerSync(db, current_user.id)
+    await ledger.unmirror("gold", holding.id)
+    await ledger.delete(holding)
+    await ledger.commit()
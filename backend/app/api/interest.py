@@ -5,7 +5,6 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.interest import InterestEntry
-from app.models.account import Account
 from app.models.user import User
 from app.schemas.interest import (
     InterestEntryCreate,
@@ -14,60 +13,10 @@ from app.schemas.interest import (
     InterestFundSummary,
     FiscalYearSummary,
 )
-from app.api.accounts import get_or_create_segment, recalculate_segment_balance
+from app.services.ledger_sync import LedgerSync
 
 router = APIRouter(prefix="/interest", tags=["interest"])
 
-INTEREST_FUND_NAME = "Interest Fund (Liability)"
-
-
-async def get_or_create_interest_fund(user_id: int, db: AsyncSession) -> Account:
-    """Get or create the interest fund liability account."""
-    result = await db.execute(
-        select(Account).where(
-            Account.user_id == user_id,
-            Account.name == INTEREST_FUND_NAME,
-            Account.type == "liability",
-            Account.category == "liability",
-            Account.is_segment == False,
-        )
-    )
-    fund = result.scalar_one_or_none()
-    if fund:
-        return fund
-
-    segment = await get_or_create_segment(user_id, "liability", db)
-    fund = Account(
-        user_id=user_id,
-        parent_id=segment.id,
-        name=INTEREST_FUND_NAME,
-        type="liability",
-        category="liability",
-        balance=0,
-        currency="USD",
-    )
-    db.add(fund)
-    await db.commit()
-    await db.refresh(fund)
-    return fund
-
-
-async def sync_fund_balance(user_id: int, db: AsyncSession):
-    """Recalculate interest fund balance = sum of undistributed entries."""
-    undistributed = await db.execute(
-        select(func.coalesce(func.sum(InterestEntry.amount), 0)).where(
-            InterestEntry.user_id == user_id,
-            InterestEntry.status == "received",
-        )
-    )
-    fund = await get_or_create_interest_fund(user_id, db)
-    fund.balance = float(undistributed.scalar())
-    await db.commit()
-
-    if fund.parent_id:
-        await recalculate_segment_balance(fund.parent_id, db)
-
-
 @router.get("", response_model=list[InterestEntryResponse])
 async def list_interest_entries(
     fiscal_year: int | None = None,
@@ -100,10 +49,10 @@ async def create_interest_entry(
         status="received",
         fiscal_year=data.fiscal_year,
     )
-    db.add(entry)
-    await db.commit()
-    await db.refresh(entry)
-    await sync_fund_balance(current_user.id, db)
+    ledger = LedgerSync(db, current_user.id)
+    ledger.add(entry)
+    await ledger.sync_interest_fund()
+    await ledger.commit()
     return entry
 
 
@@ -112,20 +61,13 @@ async def get_fund_summary(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    all_total = await db.execute(
-        select(func.coalesce(func.sum(InterestEntry.amount), 0)).where(
-            InterestEntry.user_id == current_user.id,
-        )
-    )
-    total_received = float(all_total.scalar())
-
-    distributed = await db.execute(
-        select(func.coalesce(func.sum(InterestEntry.amount), 0)).where(
-            InterestEntry.user_id == current_user.id,
-            InterestEntry.status == "distributed",
-        )
+    result = await db.execute(
+        select(
+            func.coalesce(func.sum(InterestEntry.amount), 0),
+            func.coalesce(func.sum(InterestEntry.amount).filter(InterestEntry.status == "distributed"), 0),
+        ).where(InterestEntry.user_id == current_user.id)
     )
-    total_distributed = float(distributed.scalar())
+    total_received, total_distributed = (float(v) for v in result.one())
 
     return InterestFundSummary(
         total_received=total_received,
@@ -140,30 +82,18 @@ async def get_fiscal_year_summary(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    all_total = await db.execute(
-        select(func.coalesce(func.sum(InterestEntry.amount), 0)).where(
-            InterestEntry.user_id == current_user.id,
-            InterestEntry.fiscal_year == year,
-        )
-    )
-    total_received = float(all_total.scalar())
-
-    distributed = await db.execute(
-        select(func.coalesce(func.sum(InterestEntry.amount), 0)).where(
-            InterestEntry.user_id == current_user.id,
-            InterestEntry.fiscal_year == year,
-            InterestEntry.status == "distributed",
-        )
-    )
-    total_distributed = float(distributed.scalar())
-
-    count = await db.execute(
-        select(func.count(InterestEntry.id)).where(
+    result = await db.execute(
+        select(
+            func.coalesce(func.sum(InterestEntry.amount), 0),
+            func.coalesce(func.sum(InterestEntry.amount).filter(InterestEntry.status == "distributed"), 0),
+            func.count(InterestEntry.id),
+        ).where(
             InterestEntry.user_id == current_user.id,
             InterestEntry.fiscal_year == year,
         )
     )
-    entry_count = count.scalar()
+    total_received, total_distributed, entry_count = result.one()
+    total_received, total_distributed = float(total_received), float(total_distributed)
 
     return FiscalYearSummary(
         fiscal_year=year,
@@ -212,9 +142,9 @@ async def update_interest_entry(
     for key, value in data.model_dump(exclude_unset=True).items():
         setattr(entry, key, value)
 
-    await db.commit()
-    await db.refresh(entry)
-    await sync_fund_balance(current_user.id, db)
+    ledger = LedgerSync(db, current_user.id)
+    await ledger.sync_interest_fund()
+    await ledger.commit()
     return entry
 
 
@@ -234,6 +164,7 @@ async def delete_interest_entry(
     if not entry:
         raise HTTPException(status_code=404, detail="Interest entry not found")
 
-    await db.delete(entry)
-    await db.commit()
-    await sync_fund_balance(current_user.id, db)
+    ledger = LedgerSync(db, current_user.id)
+    await ledger.delete(entry)
+    await ledger.sync_interest_fund()
+    await ledger.commit()
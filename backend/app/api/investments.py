@@ -1,72 +1,35 @@
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy import select
+from datetime import date
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import cached_response, report_cache
 from app.core.database import get_db
+from app.core.etag import conditional_get
+from app.core.fanout import FanOut
 from app.core.security import get_current_user
-from app.models.account import Account
-from app.models.investment import StockHolding, RealEstateProperty, BusinessInterest, GoldHolding
+from app.models.investment import (
+    StockHolding, StockLot, StockTrade, RealEstateProperty, BusinessInterest, GoldHolding,
+)
 from app.models.user import User
 from app.schemas.investment import (
-    StockHoldingCreate, StockHoldingUpdate, StockHoldingResponse,
+    StockHoldingCreate, StockHoldingUpdate, StockHoldingResponse, StockRevaluationResponse,
+    StockTradeCreate, StockTradeResponse, StockLotResponse,
     RealEstateCreate, RealEstateUpdate, RealEstateResponse,
     BusinessInterestCreate, BusinessInterestUpdate, BusinessInterestResponse,
-    PortfolioSummary,
+    PortfolioSummary, PerformanceReport, ReturnMetrics,
 )
-from app.api.accounts import get_or_create_segment, recalculate_segment_balance
+from app.services import lots
+from app.services.ledger_sync import LedgerSync
+from app.services.performance import OVERALL, compute_returns, load_performance_inputs, run_in_pool
+from app.services.revaluation import revalue_stocks
 
 router = APIRouter(prefix="/investments", tags=["investments"])
 
 
-async def sync_investment_account(
-    user_id: int, source_type: str, source_id: int,
-    name: str, value: float, category: str, db: AsyncSession,
-):
-    result = await db.execute(
-        select(Account).where(
-            Account.user_id == user_id,
-            Account.source_type == source_type,
-            Account.source_id == source_id,
-        )
-    )
-    acct = result.scalar_one_or_none()
-    segment = await get_or_create_segment(user_id, category, db)
-
-    if acct:
-        acct.name = name
-        acct.balance = value
-    else:
-        acct = Account(
-            user_id=user_id,
-            parent_id=segment.id,
-            name=name,
-            type="asset",
-            category=category,
-            balance=value,
-            source_type=source_type,
-            source_id=source_id,
-        )
-        db.add(acct)
-    await db.commit()
-    await recalculate_segment_balance(segment.id, db)
-
-
-async def remove_investment_account(user_id: int, source_type: str, source_id: int, db: AsyncSession):
-    result = await db.execute(
-        select(Account).where(
-            Account.user_id == user_id,
-            Account.source_type == source_type,
-            Account.source_id == source_id,
-        )
-    )
-    acct = result.scalar_one_or_none()
-    if acct:
-        parent_id = acct.parent_id
-        await db.delete(acct)
-        await db.commit()
-        if parent_id:
-            await recalculate_segment_balance(parent_id, db)
-
+# List endpoints compute derived fields in the SELECT and return the rows
+# as they are, so the response model is built once per row from plain tuples.
 
 # --- Stocks ---
 
@@ -75,19 +38,20 @@ async def list_stocks(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(StockHolding).where(StockHolding.user_id == current_user.id))
-    out = []
-    for h in result.scalars().all():
-        mv = float(h.shares) * float(h.current_price)
-        cost = float(h.shares) * float(h.avg_cost)
-        gl = mv - cost
-        gl_pct = (gl / cost * 100) if cost else 0
-        resp = StockHoldingResponse.model_validate(h)
-        resp.market_value = mv
-        resp.gain_loss = gl
-        resp.gain_loss_pct = round(gl_pct, 2)
-        out.append(resp)
-    return out
+    cost = StockHolding.shares * StockHolding.avg_cost
+    market_value = StockHolding.shares * StockHolding.current_price
+    gain_loss = market_value - cost
+    result = await db.execute(
+        select(
+            StockHolding.id, StockHolding.user_id, StockHolding.ticker, StockHolding.name,
+            StockHolding.shares, StockHolding.avg_cost, StockHolding.current_price, StockHolding.sector,
+            StockHolding.cost_method, StockHolding.realized_gain, StockHolding.created_at,
+            market_value.label("market_value"),
+            gain_loss.label("gain_loss"),
+            func.coalesce(func.round(gain_loss / func.nullif(cost, 0) * 100, 2), 0).label("gain_loss_pct"),
+        ).where(StockHolding.user_id == current_user.id).order_by(StockHolding.id)
+    )
+    return result.all()
 
 
 @router.post("/stocks", response_model=StockHoldingResponse, status_code=201)
@@ -97,15 +61,13 @@ async def create_stock(
     db: AsyncSession = Depends(get_db),
 ):
     stock = StockHolding(user_id=current_user.id, **data.model_dump())
-    db.add(stock)
-    await db.commit()
-    await db.refresh(stock)
-
     mv = float(stock.shares) * float(stock.current_price)
     cost = float(stock.shares) * float(stock.avg_cost)
-    await sync_investment_account(
-        current_user.id, "stock", stock.id, f"{stock.ticker} - {stock.name}", mv, "investment", db
-    )
+    ledger = LedgerSync(db, current_user.id)
+    ledger.add(stock)
+    await lots.open_position(db, stock)
+    await ledger.mirror("stock", stock, f"{stock.ticker} - {stock.name}", mv, "investment")
+    await ledger.commit()
 
     resp = StockHoldingResponse.model_validate(stock)
     resp.market_value = mv
@@ -114,6 +76,20 @@ async def create_stock(
     return resp
 
 
+@router.put("/stocks/prices", response_model=StockRevaluationResponse)
+async def revalue_stock_prices(
+    prices: dict[str, float],
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Set current prices for many holdings at once from a {ticker: price} map."""
+    revaluation = await revalue_stocks(db, prices, current_user.id)
+    await db.commit()
+    if revaluation.updated:
+        await report_cache.invalidate(current_user.id)
+    return StockRevaluationResponse(updated=revaluation.updated, unknown_tickers=revaluation.unknown_tickers)
+
+
 @router.put("/stocks/{stock_id}", response_model=StockHoldingResponse)
 async def update_stock(
     stock_id: int,
@@ -122,21 +98,26 @@ async def update_stock(
     db: AsyncSession = Depends(get_db),
 ):
     result = await db.execute(
-        select(StockHolding).where(StockHolding.id == stock_id, StockHolding.user_id == current_user.id)
+        select(StockHolding)
+        .where(StockHolding.id == stock_id, StockHolding.user_id == current_user.id)
+        .with_for_update()
     )
     stock = result.scalar_one_or_none()
     if not stock:
         raise HTTPException(status_code=404, detail="Stock not found")
-    for k, v in data.model_dump(exclude_unset=True).items():
+    old_shares = float(stock.shares)
+    changes = data.model_dump(exclude_unset=True)
+    for k, v in changes.items():
         setattr(stock, k, v)
-    await db.commit()
-    await db.refresh(stock)
-
+    if "shares" in changes or "avg_cost" in changes:
+        # A hand-edited position can't be matched to trades; restart it as one lot
+        await lots.open_position(db, stock)
     mv = float(stock.shares) * float(stock.current_price)
     cost = float(stock.shares) * float(stock.avg_cost)
-    await sync_investment_account(
-        current_user.id, "stock", stock.id, f"{stock.ticker} - {stock.name}", mv, "investment", db
-    )
+    ledger = LedgerSync(db, current_user.id)
+    ledger.flow("stock", stock.id, (float(stock.shares) - old_shares) * float(stock.current_price))
+    await ledger.mirror("stock", stock, f"{stock.ticker} - {stock.name}", mv, "investment")
+    await ledger.commit()
 
     resp = StockHoldingResponse.model_validate(stock)
     resp.market_value = mv
@@ -145,6 +126,70 @@ async def update_stock(
     return resp
 
 
+@router.post("/stocks/{stock_id}/trades", response_model=StockTradeResponse, status_code=201)
+async def post_stock_trade(
+    stock_id: int,
+    data: StockTradeCreate,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    result = await db.execute(
+        select(StockHolding)
+        .where(StockHolding.id == stock_id, StockHolding.user_id == current_user.id)
+        .with_for_update()
+    )
+    stock = result.scalar_one_or_none()
+    if not stock:
+        raise HTTPException(status_code=404, detail="Stock not found")
+    post = lots.buy if data.side == "buy" else lots.sell
+    try:
+        trade = await post(db, stock, data.shares, data.price, data.traded_at)
+    except lots.InsufficientShares as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+    mv = float(stock.shares) * float(stock.current_price)
+    ledger = LedgerSync(db, current_user.id)
+    signed = 1 if trade.side == "buy" else -1
+    ledger.flow("stock", stock.id, signed * float(trade.shares) * float(trade.price), trade.traded_at)
+    await ledger.mirror("stock", stock, f"{stock.ticker} - {stock.name}", mv, "investment")
+    await ledger.commit()
+    return trade
+
+
+@router.get("/stocks/{stock_id}/trades", response_model=list[StockTradeResponse])
+async def list_stock_trades(
+    stock_id: int,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    result = await db.execute(
+        select(StockTrade)
+        .join(StockHolding, StockHolding.id == StockTrade.holding_id)
+        .where(StockHolding.id == stock_id, StockHolding.user_id == current_user.id)
+        .order_by(StockTrade.traded_at.desc(), StockTrade.id.desc())
+    )
+    return result.scalars().all()
+
+
+@router.get("/stocks/{stock_id}/lots", response_model=list[StockLotResponse])
+async def list_stock_lots(
+    stock_id: int,
+    open_only: bool = True,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    query = (
+        select(StockLot)
+        .join(StockHolding, StockHolding.id == StockLot.holding_id)
+        .where(StockHolding.id == stock_id, StockHolding.user_id == current_user.id)
+        .order_by(StockLot.acquired_at, StockLot.id)
+    )
+    if open_only:
+        query = query.where(StockLot.shares_open > 0)
+    result = await db.execute(query)
+    return result.scalars().all()
+
+
 @router.delete("/stocks/{stock_id}", status_code=204)
 async def delete_stock(
     stock_id: int,
@@ -152,14 +197,17 @@ async def delete_stock(
     db: AsyncSession = Depends(get_db),
 ):
     result = await db.execute(
-        select(StockHolding).where(StockHolding.id == stock_id, StockHolding.user_id == current_user.id)
+        select(StockHolding)
+        .where(StockHolding.id == stock_id, StockHolding.user_id == current_user.id)
+        .with_for_update()
     )
     stock = result.scalar_one_or_none()
     if not stock:
         raise HTTPException(status_code=404, detail="Stock not found")
-    await remove_investment_account(current_user.id, "stock", stock.id, db)
-    await db.delete(stock)
-    await db.commit()
+    ledger = LedgerSync(db, current_user.id)
+    await ledger.unmirror("stock", stock.id)
+    await ledger.delete(stock)
+    await ledger.commit()
 
 
 # --- Real Estate ---
@@ -169,13 +217,15 @@ async def list_real_estate(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(RealEstateProperty).where(RealEstateProperty.user_id == current_user.id))
-    out = []
-    for p in result.scalars().all():
-        resp = RealEstateResponse.model_validate(p)
-        resp.annual_rent = float(p.monthly_rent) * 12
-        out.append(resp)
-    return out
+    result = await db.execute(
+        select(
+            RealEstateProperty.id, RealEstateProperty.user_id, RealEstateProperty.name,
+            RealEstateProperty.location, RealEstateProperty.property_type,
+            RealEstateProperty.estimated_value, RealEstateProperty.monthly_rent, RealEstateProperty.created_at,
+            (RealEstateProperty.monthly_rent * 12).label("annual_rent"),
+        ).where(RealEstateProperty.user_id == current_user.id).order_by(RealEstateProperty.id)
+    )
+    return result.all()
 
 
 @router.post("/real-estate", response_model=RealEstateResponse, status_code=201)
@@ -185,13 +235,10 @@ async def create_real_estate(
     db: AsyncSession = Depends(get_db),
 ):
     prop = RealEstateProperty(user_id=current_user.id, **data.model_dump())
-    db.add(prop)
-    await db.commit()
-    await db.refresh(prop)
-
-    await sync_investment_account(
-        current_user.id, "real_estate", prop.id, prop.name, float(prop.estimated_value), "property", db
-    )
+    ledger = LedgerSync(db, current_user.id)
+    ledger.add(prop)
+    await ledger.mirror("real_estate", prop, prop.name, float(prop.estimated_value), "property")
+    await ledger.commit()
 
     resp = RealEstateResponse.model_validate(prop)
     resp.annual_rent = float(prop.monthly_rent) * 12
@@ -213,12 +260,9 @@ async def update_real_estate(
         raise HTTPException(status_code=404, detail="Property not found")
     for k, v in data.model_dump(exclude_unset=True).items():
         setattr(prop, k, v)
-    await db.commit()
-    await db.refresh(prop)
-
-    await sync_investment_account(
-        current_user.id, "real_estate", prop.id, prop.name, float(prop.estimated_value), "property", db
-    )
+    ledger = LedgerSync(db, current_user.id)
+    await ledger.mirror("real_estate", prop, prop.name, float(prop.estimated_value), "property")
+    await ledger.commit()
 
     resp = RealEstateResponse.model_validate(prop)
     resp.annual_rent = float(prop.monthly_rent) * 12
@@ -237,9 +281,10 @@ async def delete_real_estate(
     prop = result.scalar_one_or_none()
     if not prop:
         raise HTTPException(status_code=404, detail="Property not found")
-    await remove_investment_account(current_user.id, "real_estate", prop.id, db)
-    await db.delete(prop)
-    await db.commit()
+    ledger = LedgerSync(db, current_user.id)
+    await ledger.unmirror("real_estate", prop.id)
+    await ledger.delete(prop)
+    await ledger.commit()
 
 
 # --- Business Interests ---
@@ -249,13 +294,15 @@ async def list_business(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    result = await db.execute(select(BusinessInterest).where(BusinessInterest.user_id == current_user.id))
-    out = []
-    for b in result.scalars().all():
-        resp = BusinessInterestResponse.model_validate(b)
-        resp.gain_loss = float(b.current_value) - float(b.invested_value)
-        out.append(resp)
-    return out
+    result = await db.execute(
+        select(
+            BusinessInterest.id, BusinessInterest.user_id, BusinessInterest.name,
+            BusinessInterest.equity_percent, BusinessInterest.invested_value, BusinessInterest.current_value,
+            BusinessInterest.annual_income, BusinessInterest.created_at,
+            (BusinessInterest.current_value - BusinessInterest.invested_value).label("gain_loss"),
+        ).where(BusinessInterest.user_id == current_user.id).order_by(BusinessInterest.id)
+    )
+    return result.all()
 
 
 @router.post("/business", response_model=BusinessInterestResponse, status_code=201)
@@ -265,13 +312,10 @@ async def create_business(
     db: AsyncSession = Depends(get_db),
 ):
     biz = BusinessInterest(user_id=current_user.id, **data.model_dump())
-    db.add(biz)
-    await db.commit()
-    await db.refresh(biz)
-
-    await sync_investment_account(
-        current_user.id, "business", biz.id, biz.name, float(biz.current_value), "business", db
-    )
+    ledger = LedgerSync(db, current_user.id)
+    ledger.add(biz)
+    await ledger.mirror("business", biz, biz.name, float(biz.current_value), "business")
+    await ledger.commit()
 
     resp = BusinessInterestResponse.model_validate(biz)
     resp.gain_loss = float(biz.current_value) - float(biz.invested_value)
@@ -291,14 +335,13 @@ async def update_business(
     biz = result.scalar_one_or_none()
     if not biz:
         raise HTTPException(status_code=404, detail="Business interest not found")
+    old_invested = float(biz.invested_value)
     for k, v in data.model_dump(exclude_unset=True).items():
         setattr(biz, k, v)
-    await db.commit()
-    await db.refresh(biz)
-
-    await sync_investment_account(
-        current_user.id, "business", biz.id, biz.name, float(biz.current_value), "business", db
-    )
+    ledger = LedgerSync(db, current_user.id)
+    ledger.flow("business", biz.id, float(biz.invested_value) - old_invested)
+    await ledger.mirror("business", biz, biz.name, float(biz.current_value), "business")
+    await ledger.commit()
 
     resp = BusinessInterestResponse.model_validate(biz)
     resp.gain_loss = float(biz.current_value) - float(biz.invested_value)
@@ -317,35 +360,41 @@ async def delete_business(
     biz = result.scalar_one_or_none()
     if not biz:
         raise HTTPException(status_code=404, detail="Business interest not found")
-    await remove_investment_account(current_user.id, "business", biz.id, db)
-    await db.delete(biz)
-    await db.commit()
+    ledger = LedgerSync(db, current_user.id)
+    await ledger.unmirror("business", biz.id)
+    await ledger.delete(biz)
+    await ledger.commit()
 
 
 # --- Portfolio Summary ---
 
 @router.get("/portfolio", response_model=PortfolioSummary)
+@conditional_get(StockHolding, RealEstateProperty, BusinessInterest, GoldHolding)
+@cached_response("investments:portfolio")
 async def portfolio_summary(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    stocks = await db.execute(select(StockHolding).where(StockHolding.user_id == current_user.id))
-    all_stocks = stocks.scalars().all()
-    total_stocks = sum(float(s.shares) * float(s.current_price) for s in all_stocks)
-    stocks_cost = sum(float(s.shares) * float(s.avg_cost) for s in all_stocks)
-
-    props = await db.execute(select(RealEstateProperty).where(RealEstateProperty.user_id == current_user.id))
-    total_re = sum(float(p.estimated_value) for p in props.scalars().all())
-
-    biz = await db.execute(select(BusinessInterest).where(BusinessInterest.user_id == current_user.id))
-    all_biz = biz.scalars().all()
-    total_biz = sum(float(b.current_value) for b in all_biz)
-    biz_cost = sum(float(b.invested_value) for b in all_biz)
-
-    golds = await db.execute(select(GoldHolding).where(GoldHolding.user_id == current_user.id))
-    all_gold = golds.scalars().all()
-    total_gold = sum(float(g.weight_vori) * float(g.current_price_per_vori) for g in all_gold)
-    gold_cost = sum(float(g.weight_vori) * float(g.purchase_price_per_vori) for g in all_gold)
+    def total(*values):
+        return [func.coalesce(func.sum(v), 0) for v in values]
+
+    stocks, props, biz, gold = await FanOut(db).first(
+        select(*total(
+            StockHolding.shares * StockHolding.current_price, StockHolding.shares * StockHolding.avg_cost,
+        )).where(StockHolding.user_id == current_user.id),
+        select(*total(RealEstateProperty.estimated_value)).where(RealEstateProperty.user_id == current_user.id),
+        select(*total(
+            BusinessInterest.current_value, BusinessInterest.invested_value,
+        )).where(BusinessInterest.user_id == current_user.id),
+        select(*total(
+            GoldHolding.weight_vori * GoldHolding.current_price_per_vori,
+            GoldHolding.weight_vori * GoldHolding.purchase_price_per_vori,
+        )).where(GoldHolding.user_id == current_user.id),
+    )
+    total_stocks, stocks_cost = float(stocks[0]), float(stocks[1])
+    total_re = float(props[0])
+    total_biz, biz_cost = float(biz[0]), float(biz[1])
+    total_gold, gold_cost = float(gold[0]), float(gold[1])
 
     total = total_stocks + total_re + total_biz + total_gold
     total_gl = (total_stocks - stocks_cost) + (total_biz - biz_cost) + (total_gold - gold_cost)
@@ -358,3 +407,39 @@ async def portfolio_summary(
         total_portfolio_value=total,
         total_gain_loss=total_gl,
     )
+
+
+# --- Performance ---
+
+def _pct(rate: float | None) -> float | None:
+    return None if rate is None else round(rate * 100, 2)
+
+
+@router.get("/performance", response_model=PerformanceReport)
+@cached_response("investments:performance")
+async def performance(
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """Time-weighted and money-weighted (XIRR) returns per asset class over the snapshot history."""
+    inputs = await load_performance_inputs(db, current_user.id, date_from, date_to)
+    metrics = [
+        ReturnMetrics(
+            asset_class=r.asset_class,
+            start_value=round(r.start_value, 2),
+            end_value=round(r.end_value, 2),
+            net_flows=round(r.net_flows, 2),
+            twr_pct=_pct(r.twr),
+            xirr_pct=_pct(r.xirr),
+        )
+        for r in await run_in_pool(compute_returns, inputs)
+    ]
+    dates = inputs.dates.tolist()
+    return PerformanceReport(
+        start=dates[0] if dates else None,
+        end=dates[-1] if dates else None,
+        overall=next(m for m in metrics if m.asset_class == OVERALL),
+        asset_classes=[m for m in metrics if m.asset_class != OVERALL],
+    )
@@ -1,11 +1,18 @@
-from datetime import date, timedelta
+from datetime import date
+from typing import Literal
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import cached_response
+from app.core.config import settings
+from app.core.etag import conditional_get
+from app.core.fanout import FanOut
 from app.core.database import get_db
 from app.core.security import get_current_user
+from app.models.account import Account
+from app.models.fx import FxRate
 from app.models.transaction import Transaction
 from app.models.user import User
 from app.schemas.report import (
@@ -14,46 +21,61 @@ from app.schemas.report import (
     CashFlowReport, CashFlowPoint,
     DashboardSummary,
     NetWorthReport, NetWorthPoint,
+    TrendReport,
 )
 from app.services.calculations import (
-    get_leaf_accounts, get_net_worth,
-    get_monthly_income_expense,
-    get_asset_allocation, get_liability_allocation,
+    get_leaf_balances, get_net_worth, get_net_worth_history,
+    get_monthly_category_totals, month_window_start,
 )
+from app.services.analytics import SAVINGS_LOOKBACK_MONTHS, compute_trends, load_transaction_columns
+from app.services.dashboard import DashboardAggregator
 
 router = APIRouter(prefix="/reports", tags=["reports"])
 
 
 @router.get("/net-worth", response_model=NetWorthReport)
+@cached_response("reports:net-worth")
 async def net_worth(
+    date_from: date | None = Query(None, alias="from"),
+    date_to: date | None = Query(None, alias="to"),
+    resolution: Literal["daily", "weekly", "monthly"] = "daily",
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    nw, assets, liabilities = await get_net_worth(current_user.id, db)
-
-    return NetWorthReport(
-        current_net_worth=nw,
-        history=[NetWorthPoint(date=date.today().isoformat(), assets=assets, liabilities=liabilities, net_worth=nw)],
+    (nw, assets, liabilities), rows = await FanOut(db).run(
+        lambda session: get_net_worth(current_user.id, session, current_user.currency),
+        lambda session: get_net_worth_history(
+            current_user.id, session, date_from, date_to, resolution, settings.NET_WORTH_MAX_POINTS,
+        ),
     )
+    history = [
+        NetWorthPoint(date=d.isoformat(), assets=a, liabilities=l, net_worth=n)
+        for d, a, l, n in rows
+    ]
+    if not history and (date_to is None or date_to >= date.today()):
+        history = [NetWorthPoint(date=date.today().isoformat(), assets=assets, liabilities=liabilities, net_worth=nw)]
+
+    return NetWorthReport(current_net_worth=nw, history=history)
 
 
 @router.get("/balance-sheet", response_model=BalanceSheetReport)
+@cached_response("reports:balance-sheet")
 async def balance_sheet(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    accounts = await get_leaf_accounts(current_user.id, db)
+    accounts = await get_leaf_balances(current_user.id, db, current_user.currency)
 
     asset_cats: dict[str, list] = {}
     liability_cats: dict[str, list] = {}
 
-    for a in accounts:
-        bucket = asset_cats if a.type == "asset" else liability_cats if a.type == "liability" else None
+    for name, type_, category, balance in accounts:
+        bucket = asset_cats if type_ == "asset" else liability_cats if type_ == "liability" else None
         if bucket is not None:
-            bucket.setdefault(a.category, []).append({"name": a.name, "balance": float(a.balance)})
+            bucket.setdefault(category, []).append({"name": name, "balance": balance})
 
-    total_assets = sum(float(a.balance) for a in accounts if a.type == "asset")
-    total_liabilities = sum(float(a.balance) for a in accounts if a.type == "liability")
+    total_assets = sum(balance for _, type_, _, balance in accounts if type_ == "asset")
+    total_liabilities = sum(balance for _, type_, _, balance in accounts if type_ == "liability")
 
     return BalanceSheetReport(
         total_assets=total_assets,
@@ -65,29 +87,24 @@ async def balance_sheet(
 
 
 @router.get("/income-expense", response_model=IncomeExpenseReport)
+@cached_response("reports:income-expense")
 async def income_expense(
     months: int = 1,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    start = date.today() - timedelta(days=months * 30)
-    result = await db.execute(
-        select(Transaction).where(
-            Transaction.user_id == current_user.id,
-            Transaction.date >= start,
-        )
-    )
-    txns = result.scalars().all()
-    income = sum(float(t.amount) for t in txns if t.type == "income")
-    expense = sum(float(t.amount) for t in txns if t.type == "expense")
+    start = month_window_start(months)
+    rows = await get_monthly_category_totals(current_user.id, db, start)
 
+    income = expense = 0.0
     cats: dict[str, dict] = {}
-    for t in txns:
-        cats.setdefault(t.category, {"category": t.category, "income": 0, "expense": 0})
-        if t.type == "income":
-            cats[t.category]["income"] += float(t.amount)
-        elif t.type == "expense":
-            cats[t.category]["expense"] += float(t.amount)
+    for _, type_, category, total in rows:
+        cats.setdefault(category, {"category": category, "income": 0, "expense": 0})
+        cats[category][type_] += total
+        if type_ == "income":
+            income += total
+        else:
+            expense += total
 
     return IncomeExpenseReport(
         period=f"Last {months} month(s)",
@@ -99,28 +116,20 @@ async def income_expense(
 
 
 @router.get("/cash-flow", response_model=CashFlowReport)
+@cached_response("reports:cash-flow")
 async def cash_flow(
     months: int = 6,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    start = date.today() - timedelta(days=months * 30)
-    result = await db.execute(
-        select(Transaction).where(
-            Transaction.user_id == current_user.id,
-            Transaction.date >= start,
-        ).order_by(Transaction.date)
-    )
-    txns = result.scalars().all()
+    start = month_window_start(months)
+    rows = await get_monthly_category_totals(current_user.id, db, start)
 
     monthly: dict[str, dict] = {}
-    for t in txns:
-        key = t.date.strftime("%Y-%m")
+    for month, type_, _, total in rows:
+        key = month.strftime("%Y-%m")
         monthly.setdefault(key, {"inflow": 0, "outflow": 0})
-        if t.type == "income":
-            monthly[key]["inflow"] += float(t.amount)
-        elif t.type == "expense":
-            monthly[key]["outflow"] += float(t.amount)
+        monthly[key]["inflow" if type_ == "income" else "outflow"] += total
 
     data = [
         CashFlowPoint(period=k, inflow=v["inflow"], outflow=v["outflow"], net=v["inflow"] - v["outflow"])
@@ -131,42 +140,57 @@ async def cash_flow(
 
 
 @router.get("/dashboard", response_model=DashboardSummary)
+@conditional_get(Account, Transaction, FxRate)
+@cached_response("reports:dashboard")
 async def dashboard_summary(
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    nw, total_assets, total_liabilities = await get_net_worth(current_user.id, db)
-    monthly_income, monthly_expense = await get_monthly_income_expense(current_user.id, db)
+    recent_query = (
+        select(Transaction).where(Transaction.user_id == current_user.id)
+        .order_by(Transaction.date.desc()).limit(5)
+    )
+    totals, recent = await FanOut(db).run(
+        lambda session: DashboardAggregator(session).aggregate(current_user.id, current_user.currency),
+        lambda session: session.scalars(recent_query),
+    )
 
     savings_rate = 0.0
-    if monthly_income > 0:
-        savings_rate = round((monthly_income - monthly_expense) / monthly_income * 100, 2)
+    if totals.monthly_income > 0:
+        savings_rate = round((totals.monthly_income - totals.monthly_expense) / totals.monthly_income * 100, 2)
 
     debt_to_asset_ratio = 0.0
-    if total_assets > 0:
-        debt_to_asset_ratio = round(total_liabilities / total_assets * 100, 2)
+    if totals.total_assets > 0:
+        debt_to_asset_ratio = round(totals.total_liabilities / totals.total_assets * 100, 2)
 
-    recent = await db.execute(
-        select(Transaction).where(Transaction.user_id == current_user.id)
-        .order_by(Transaction.date.desc()).limit(5)
-    )
     recent_txns = [
         {"id": t.id, "amount": float(t.amount), "type": t.type, "category": t.category, "date": t.date.isoformat(), "description": t.description}
-        for t in recent.scalars().all()
+        for t in recent.all()
     ]
 
-    asset_alloc = await get_asset_allocation(current_user.id, db)
-    liability_alloc = await get_liability_allocation(current_user.id, db)
-
     return DashboardSummary(
-        net_worth=nw,
-        total_assets=total_assets,
-        total_liabilities=total_liabilities,
-        monthly_income=monthly_income,
-        monthly_expense=monthly_expense,
+        net_worth=totals.net_worth,
+        total_assets=totals.total_assets,
+        total_liabilities=totals.total_liabilities,
+        monthly_income=totals.monthly_income,
+        monthly_expense=totals.monthly_expense,
         savings_rate=savings_rate,
         debt_to_asset_ratio=debt_to_asset_ratio,
         recent_transactions=recent_txns,
-        asset_allocation=asset_alloc,
-        liability_allocation=liability_alloc,
+        asset_allocation=totals.asset_allocation,
+        liability_allocation=totals.liability_allocation,
+    )
+
+
+@router.get("/trends", response_model=TrendReport)
+@cached_response("reports:trends")
+async def trends(
+    months: int = Query(12, ge=1, le=240),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    start = month_window_start(months)
+    cols = await load_transaction_columns(
+        current_user.id, db, month_window_start(months + SAVINGS_LOOKBACK_MONTHS),
     )
+    return TrendReport(**compute_trends(cols, start, months))
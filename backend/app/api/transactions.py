@@ -1,31 +1,42 @@
+import base64
+import csv
+import io
+import json
 from datetime import date
+from decimal import Decimal
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import report_cache
 from app.core.database import get_db
 from app.core.security import get_current_user
 from app.models.transaction import Transaction
 from app.models.user import User
 from app.schemas.transaction import TransactionCreate, TransactionUpdate, TransactionResponse
+from app.services.rollups import apply_transaction
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
 
-@router.get("", response_model=list[TransactionResponse])
-async def list_transactions(
+EXPORT_COLUMNS = [
+    "id", "date", "type", "category", "amount", "account_id", "to_account_id", "description", "tags",
+]
+EXPORT_CHUNK_SIZE = 1000
+
+
+def filter_transactions(
+    user_id: int,
     account_id: int | None = None,
     type: str | None = None,
     category: str | None = None,
     date_from: date | None = None,
     date_to: date | None = None,
-    page: int = Query(1, ge=1),
-    per_page: int = Query(20, ge=1, le=100),
-    current_user: User = Depends(get_current_user),
-    db: AsyncSession = Depends(get_db),
 ):
-    query = select(Transaction).where(Transaction.user_id == current_user.id)
+    query = select(Transaction).where(Transaction.user_id == user_id)
     if account_id:
         query = query.where(Transaction.account_id == account_id)
     if type:
@@ -36,10 +47,119 @@ async def list_transactions(
         query = query.where(Transaction.date >= date_from)
     if date_to:
         query = query.where(Transaction.date <= date_to)
+    return query
+
 
-    query = query.order_by(Transaction.date.desc()).offset((page - 1) * per_page).limit(per_page)
+def encode_cursor(txn_date: date, txn_id: int) -> str:
+    raw = json.dumps([txn_date.isoformat(), txn_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[date, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        txn_date, txn_id = json.loads(raw)
+        return date.fromisoformat(txn_date), int(txn_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+@router.get("", response_model=list[TransactionResponse])
+async def list_transactions(
+    response: Response,
+    account_id: int | None = None,
+    type: str | None = None,
+    category: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=100),
+    cursor: str | None = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    """List transactions, newest first.
+
+    Pass the `X-Next-Cursor` response header back as `cursor` to fetch the
+    following page by keyset, which costs the same at any depth. Without a
+    cursor the legacy page/per_page offset paging applies.
+    """
+    query = filter_transactions(current_user.id, account_id, type, category, date_from, date_to)
+    if cursor:
+        query = query.where(tuple_(Transaction.date, Transaction.id) < decode_cursor(cursor))
+    else:
+        query = query.offset((page - 1) * per_page)
+    query = query.order_by(Transaction.date.desc(), Transaction.id.desc()).limit(per_page)
     result = await db.execute(query)
-    return result.scalars().all()
+    txns = result.scalars().all()
+    if len(txns) == per_page:
+        response.headers["X-Next-Cursor"] = encode_cursor(txns[-1].date, txns[-1].id)
+    return txns
+
+
+async def _export_chunks(db: AsyncSession, query):
+    """Yield lists of plain row tuples from a server-side cursor."""
+    result = await db.stream(query.execution_options(yield_per=EXPORT_CHUNK_SIZE))
+    async for rows in result.partitions():
+        yield rows
+
+
+async def _csv_body(chunks):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    writer.writerow(EXPORT_COLUMNS)
+    async for rows in chunks:
+        for row in rows:
+            *head, tags = row
+            writer.writerow([*head, ";".join(tags or [])])
+        yield buf.getvalue()
+        buf.seek(0)
+        buf.truncate()
+    if buf.tell():
+        yield buf.getvalue()
+
+
+async def _ndjson_body(chunks):
+    async for rows in chunks:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, row)), default=_json_default) + "\n" for row in rows
+        )
+
+
+def _json_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, date):
+        return value.isoformat()
+    raise TypeError(f"Unserializable value: {value!r}")
+
+
+@router.get("/export")
+async def export_transactions(
+    format: Literal["csv", "ndjson"] = "csv",
+    account_id: int | None = None,
+    type: str | None = None,
+    category: str | None = None,
+    date_from: date | None = None,
+    date_to: date | None = None,
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_db),
+):
+    filtered = filter_transactions(current_user.id, account_id, type, category, date_from, date_to)
+    query = filtered.with_only_columns(
+        *(getattr(Transaction, c) for c in EXPORT_COLUMNS)
+    ).order_by(Transaction.date.desc(), Transaction.id.desc())
+    chunks = _export_chunks(db, query)
+
+    if format == "csv":
+        body, media_type = _csv_body(chunks), "text/csv"
+    else:
+        body, media_type = _ndjson_body(chunks), "application/x-ndjson"
+    return StreamingResponse(
+        body,
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'},
+    )
 
 
 @router.post("", response_model=TransactionResponse, status_code=201)
@@ -50,8 +170,10 @@ async def create_transaction(
 ):
     txn = Transaction(user_id=current_user.id, **data.model_dump())
     db.add(txn)
+    await apply_transaction(db, txn)
     await db.commit()
     await db.refresh(txn)
+    await report_cache.invalidate(current_user.id)
     return txn
 
 
@@ -84,11 +206,14 @@ async def update_transaction(
     if not txn:
         raise HTTPException(status_code=404, detail="Transaction not found")
 
+    await apply_transaction(db, txn, sign=-1)
     for key, value in data.model_dump(exclude_unset=True).items():
         setattr(txn, key, value)
+    await apply_transaction(db, txn)
 
     await db.commit()
     await db.refresh(txn)
+    await report_cache.invalidate(current_user.id)
     return txn
 
 
@@ -104,5 +229,7 @@ async def delete_transaction(
     txn = result.scalar_one_or_none()
     if not txn:
         raise HTTPException(status_code=404, detail="Transaction not found")
+    await apply_transaction(db, txn, sign=-1)
     await db.delete(txn)
     await db.commit()
+    await report_cache.invalidate(current_user.id)
@@ -1,13 +1,17 @@
 from fastapi import APIRouter, Depends
-from sqlalchemy import select
+from sqlalchemy import func, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
+from app.core.cache import cached_response
 from app.core.database import get_db
+from app.core.fanout import FanOut
 from app.core.security import get_current_user
 from app.models.account import Account
 from app.models.investment import StockHolding, RealEstateProperty, BusinessInterest
 from app.models.user import User
 from app.schemas.zakat import ZakatRequest, ZakatResponse, ZakatBreakdown
+from app.services.fx import converted, latest_rates, unconverted, warn_unconverted
+from app.services.hierarchy import counted_leaf
 
 router = APIRouter(prefix="/zakat", tags=["zakat"])
 
@@ -16,34 +20,35 @@ SILVER_NISAB_GRAMS = 612.36
 
 
 @router.post("/calculate", response_model=ZakatResponse)
+@cached_response("zakat:calculate")
 async def calculate_zakat(
     data: ZakatRequest,
     current_user: User = Depends(get_current_user),
     db: AsyncSession = Depends(get_db),
 ):
-    # Cash & bank accounts (exclude segments to avoid double-counting)
-    accts = await db.execute(
-        select(Account).where(
+    # Cash & bank accounts (leaves only, to avoid double-counting parents)
+    rates = latest_rates(current_user.currency)
+    totals = await FanOut(db).first(
+        select(func.coalesce(func.sum(converted(Account.balance, rates)), 0), unconverted(Account.currency, rates))
+        .outerjoin(rates, rates.c.currency == Account.currency)
+        .where(
             Account.user_id == current_user.id,
-            Account.is_active == True,
-            Account.is_segment == False,
+            counted_leaf(),
             Account.type == "asset",
             Account.category.in_(["cash", "bank"]),
-        )
+        ),
+        # Investments (stocks)
+        select(func.coalesce(func.sum(StockHolding.shares * StockHolding.current_price), 0))
+        .where(StockHolding.user_id == current_user.id),
+        # Real estate rental income (annual)
+        select(func.coalesce(func.sum(RealEstateProperty.monthly_rent * 12), 0))
+        .where(RealEstateProperty.user_id == current_user.id),
+        # Business interests
+        select(func.coalesce(func.sum(BusinessInterest.current_value), 0))
+        .where(BusinessInterest.user_id == current_user.id),
     )
-    cash_and_bank = sum(float(a.balance) for a in accts.scalars().all())
-
-    # Investments (stocks)
-    stocks = await db.execute(select(StockHolding).where(StockHolding.user_id == current_user.id))
-    investments = sum(float(s.shares) * float(s.current_price) for s in stocks.scalars().all())
-
-    # Real estate rental income (annual)
-    props = await db.execute(select(RealEstateProperty).where(RealEstateProperty.user_id == current_user.id))
-    re_income = sum(float(p.monthly_rent) * 12 for p in props.scalars().all())
-
-    # Business interests
-    biz = await db.execute(select(BusinessInterest).where(BusinessInterest.user_id == current_user.id))
-    biz_value = sum(float(b.current_value) for b in biz.scalars().all())
+    warn_unconverted(totals[0][1], current_user.currency)
+    cash_and_bank, investments, re_income, biz_value = (float(row[0]) for row in totals)
 
     total_zakatable = cash_and_bank + investments + re_income + biz_value
 
@@ -0,0 +1,214 @@
+"""Per-user response cache for read-heavy endpoints.
+
+Entries are keyed by user, by a per-user data version and by a global FX
+version. Mutating endpoints call `report_cache.invalidate(user_id)` after
+committing, which bumps the user's version so every cached entry for that
+user is skipped and left to expire. Loading exchange rates calls
+`invalidate_fx()`, which does the same for every user, and tells each
+process's in-memory rate cache to reload.
+When Redis is unreachable the cache steps aside and endpoints compute their
+results directly.
+
+`segment_ids` is a separate in-process LRU of users' root segment ids.
+"""
+import functools
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable
+
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+try:
+    from redis import asyncio as aioredis
+    from redis.exceptions import RedisError
+except ImportError:  # pragma: no cover - redis is optional at runtime
+    aioredis = None
+    RedisError = OSError
+
+
+class MemoryCacheBackend:
+    """In-process stand-in for Redis, used by tests and single-process setups."""
+
+    def __init__(self):
+        self._data: dict[str, tuple[float | None, str]] = {}
+
+    async def get(self, key: str) -> str | None:
+        item = self._data.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._data[key]
+            return None
+        return value
+
+    async def get_many(self, keys: list[str]) -> list[str | None]:
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: str, ttl: int):
+        self._data[key] = (time.monotonic() + ttl, value)
+
+    async def incr(self, key: str) -> int:
+        _, value = self._data.get(key, (None, "0"))
+        value = str(int(value) + 1)
+        self._data[key] = (None, value)
+        return int(value)
+
+
+class RedisCacheBackend:
+    def __init__(self, url: str):
+        self._client = aioredis.from_url(url, decode_responses=True, socket_timeout=1)
+
+    async def get(self, key: str) -> str | None:
+        return await self._client.get(key)
+
+    async def get_many(self, keys: list[str]) -> list[str | None]:
+        return await self._client.mget(keys)
+
+    async def set(self, key: str, value: str, ttl: int):
+        await self._client.set(key, value, ex=ttl)
+
+    async def incr(self, key: str) -> int:
+        return await self._client.incr(key)
+
+
+def create_backend():
+    if settings.CACHE_BACKEND == "memory":
+        return MemoryCacheBackend()
+    if settings.CACHE_BACKEND == "redis" and aioredis is not None:
+        return RedisCacheBackend(settings.REDIS_URL)
+    return None
+
+
+FX_VERSION_KEY = "assetflow:fx:version"
+
+
+class ReportCache:
+    def __init__(self, backend, ttl: int, retry_after: int = 30):
+        self.backend = backend
+        self.ttl = ttl
+        self.retry_after = retry_after
+        self._down_until = 0.0
+
+    def _available(self) -> bool:
+        return self.backend is not None and time.monotonic() >= self._down_until
+
+    def _mark_down(self, exc: Exception):
+        logger.warning("Cache unavailable, serving uncached for %ss: %s", self.retry_after, exc)
+        self._down_until = time.monotonic() + self.retry_after
+
+    async def get_or_compute(
+        self, user_id: int, name: str, compute: Callable[[], Awaitable[Any]], params: dict | None = None,
+    ) -> Any:
+        if not self._available():
+            return await compute()
+        try:
+            version, fx_version = await self.backend.get_many([f"assetflow:{user_id}:version", FX_VERSION_KEY])
+            key = (
+                f"assetflow:{user_id}:v{version or 0}.{fx_version or 0}:{name}:"
+                f"{json.dumps(jsonable_encoder(params or {}), sort_keys=True)}"
+            )
+            hit = await self.backend.get(key)
+        except (RedisError, OSError) as exc:
+            self._mark_down(exc)
+            return await compute()
+        if hit is not None:
+            return json.loads(hit)
+
+        result = await compute()
+        try:
+            await self.backend.set(key, json.dumps(jsonable_encoder(result)), self.ttl)
+        except (RedisError, OSError) as exc:
+            self._mark_down(exc)
+        return result
+
+    async def _bump(self, key: str):
+        # Tried even while marked down: a missed bump would let other workers
+        # serve the stale entry until it expires
+        if self.backend is None:
+            return
+        try:
+            await self.backend.incr(key)
+        except (RedisError, OSError) as exc:
+            self._mark_down(exc)
+
+    async def invalidate(self, user_id: int):
+        await self._bump(f"assetflow:{user_id}:version")
+
+    async def invalidate_fx(self):
+        """Skip every user's cached entries after exchange rates change."""
+        await self._bump(FX_VERSION_KEY)
+
+    async def fx_version(self) -> str | None:
+        """The global FX version, or None while the cache is unavailable."""
+        if not self._available():
+            return None
+        try:
+            return await self.backend.get(FX_VERSION_KEY) or "0"
+        except (RedisError, OSError) as exc:
+            self._mark_down(exc)
+            return None
+
+
+report_cache = ReportCache(create_backend(), settings.CACHE_TTL_SECONDS)
+
+
+def cached_response(name: str):
+    """Serve an endpoint's result from `report_cache`.
+
+    The endpoint must take `current_user`; its other arguments, apart from
+    the DB session and request/response objects, become part of the key.
+    """
+    def decorator(endpoint):
+        @functools.wraps(endpoint)
+        async def wrapper(*args, **kwargs):
+            user = kwargs["current_user"]
+            params = {
+                k: v for k, v in kwargs.items()
+                if k not in ("current_user", "db", "request", "response")
+            }
+            return await report_cache.get_or_compute(
+                user.id, name, lambda: endpoint(*args, **kwargs), params,
+            )
+        return wrapper
+    return decorator
+
+
+class SegmentIdCache:
+    """Bounded per-process LRU of (user_id, category) -> root segment id.
+
+    Root segments are created once per user and almost never deleted, so
+    writers can skip looking them up. Deleting a segment must call `discard`.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._data: OrderedDict[tuple[int, str], int] = OrderedDict()
+
+    def get(self, user_id: int, category: str) -> int | None:
+        key = (user_id, category)
+        segment_id = self._data.get(key)
+        if segment_id is not None:
+            self._data.move_to_end(key)
+        return segment_id
+
+    def put(self, user_id: int, category: str, segment_id: int):
+        self._data[(user_id, category)] = segment_id
+        self._data.move_to_end((user_id, category))
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def discard(self, user_id: int, category: str):
+        self._data.pop((user_id, category), None)
+
+    def clear(self):
+        self._data.clear()
+
+
+segment_ids = SegmentIdCache(settings.SEGMENT_CACHE_SIZE)
@@ -0,0 +1,48 @@
+"""Run independent read queries concurrently on separate pooled connections.
+
+An AsyncSession runs one statement at a time, so aggregates that don't
+depend on each other are sent through `FanOut` instead: each one gets a
+short-lived session on the request session's engine, and they are awaited
+together. Endpoint latency becomes the slowest query rather than the sum.
+The request session's transaction is committed first, returning its
+connection to the pool, so a request holds at most `limit` connections and
+never waits for more while holding one.
+
+Each query sees its own snapshot, so only use this for reads that don't
+need to agree with each other to the transaction.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable
+
+from sqlalchemy import Executable, Row
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+
+
+class FanOut:
+    def __init__(self, db: AsyncSession, limit: int | None = None):
+        self.db = db
+        self.bind = db.bind
+        self._slots = asyncio.Semaphore(limit or settings.FANOUT_CONCURRENCY)
+
+    async def _call(self, job: Callable[[AsyncSession], Awaitable[Any]]):
+        async with self._slots:
+            async with AsyncSession(self.bind, expire_on_commit=False) as session:
+                return await job(session)
+
+    async def run(self, *jobs: Callable[[AsyncSession], Awaitable[Any]]) -> list[Any]:
+        """Await `job(session)` for each job concurrently; results come back in order."""
+        await self.db.commit()
+        return list(await asyncio.gather(*(self._call(job) for job in jobs)))
+
+    async def execute(self, *statements: Executable) -> list[list[Row]]:
+        """The rows of each statement, in order."""
+        async def rows(statement, session: AsyncSession):
+            return (await session.execute(statement)).all()
+
+        return await self.run(*(lambda session, s=s: rows(s, session) for s in statements))
+
+    async def first(self, *statements: Executable) -> list[Row]:
+        """The single row of each aggregate statement, in order."""
+        return [rows[0] for rows in await self.execute(*statements)]
@@ -1,10 +1,26 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.api import auth, accounts, transactions, investments, gold, reports, zakat, interest
+from app.services.performance import shutdown_pool
+from app.services.prices import create_price_feed
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    price_feed = create_price_feed()
+    if price_feed:
+        price_feed.start()
+    yield
+    if price_feed:
+        await price_feed.stop()
+    shutdown_pool()
+
 
-app = FastAPI(title=settings.APP_NAME, version="1.0.0")
+app = FastAPI(title=settings.APP_NAME, version="1.0.0", lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -12,6 +28,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
 app.include_router(auth.router)
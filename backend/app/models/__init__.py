@@ -1,8 +1,11 @@
 from app.models.user import User
-from app.models.account import Account
-from app.models.transaction import Transaction
+from app.models.account import Account, AccountBalanceHistory, AccountClosure
+from app.models.transaction import Transaction, TransactionMonthlyRollup
 from app.models.investment import (
     StockHolding,
+    StockLot,
+    StockTrade,
+    HoldingFlow,
     RealEstateProperty,
     BusinessInterest,
     GoldHolding,
@@ -10,16 +13,24 @@ from app.models.investment import (
     NetWorthSnapshot,
 )
 from app.models.interest import InterestEntry
+from app.models.fx import FxRate
 
 __all__ = [
     "User",
     "Account",
+    "AccountClosure",
+    "AccountBalanceHistory",
     "Transaction",
+    "TransactionMonthlyRollup",
     "StockHolding",
+    "StockLot",
+    "StockTrade",
+    "HoldingFlow",
     "RealEstateProperty",
     "BusinessInterest",
     "GoldHolding",
     "Vehicle",
     "InterestEntry",
     "NetWorthSnapshot",
+    "FxRate",
 ]
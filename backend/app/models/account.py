@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import String, DateTime, ForeignKey, Numeric, Boolean, Integer, Text
+from sqlalchemy import BigInteger, String, DateTime, ForeignKey, Index, Numeric, Boolean, Integer, Text, func, text
 from sqlalchemy.orm import Mapped, mapped_column, relationship
 
 from app.core.database import Base
@@ -8,9 +8,26 @@ from app.core.database import Base
 
 class Account(Base):
     __tablename__ = "accounts"
+    __table_args__ = (
+        Index("ix_accounts_user_updated", "user_id", "updated_at"),
+        # Leaf/segment scans: reports, dashboard, zakat
+        Index("ix_accounts_user_active_segment_type", "user_id", "is_active", "is_segment", "type"),
+        # Mirror-account lookup for investments, gold and vehicles
+        Index(
+            "ix_accounts_user_source", "user_id", "source_type", "source_id",
+            postgresql_where=text("source_type IS NOT NULL"),
+        ),
+        # Active children of a segment
+        Index("ix_accounts_parent_active", "parent_id", postgresql_where=text("is_active")),
+        # One root segment per category; segment creation upserts against it
+        Index(
+            "uq_accounts_user_root_segment", "user_id", "category", unique=True,
+            postgresql_where=text("is_segment AND parent_id IS NULL"),
+        ),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     parent_id: Mapped[int | None] = mapped_column(ForeignKey("accounts.id"), nullable=True, index=True)
     name: Mapped[str] = mapped_column(String(255))
     type: Mapped[str] = mapped_column(String(50))  # asset, liability, equity
@@ -32,5 +49,39 @@ class Account(Base):
         onupdate=lambda: datetime.now(timezone.utc),
     )
 
-    children: Mapped[list["Account"]] = relationship("Account", back_populates="parent", lazy="selectin")
-    parent: Mapped["Account | None"] = relationship("Account", back_populates="children", remote_side=[id], lazy="selectin")
+    # Not loaded implicitly: endpoints that need the tree use selectinload() or
+    # build it from one query with `app.api.accounts.build_account_tree`
+    children: Mapped[list["Account"]] = relationship("Account", back_populates="parent", lazy="noload")
+    parent: Mapped["Account | None"] = relationship("Account", back_populates="children", remote_side=[id], lazy="noload")
+
+
+class AccountClosure(Base):
+    """Every (ancestor, descendant) pair in the account tree, including each
+    account paired with itself at depth 0. Maintained by `app.services.hierarchy`."""
+
+    __tablename__ = "account_closure"
+    __table_args__ = (
+        Index("ix_account_closure_descendant", "descendant_id", "depth"),
+    )
+
+    ancestor_id: Mapped[int] = mapped_column(ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    descendant_id: Mapped[int] = mapped_column(ForeignKey("accounts.id", ondelete="CASCADE"), primary_key=True)
+    depth: Mapped[int] = mapped_column(Integer)
+
+
+class AccountBalanceHistory(Base):
+    """Append-only log of every balance an account has had."""
+
+    __tablename__ = "account_balance_history"
+    __table_args__ = (
+        # Per-account time lookups: history buckets and balance-at
+        Index("ix_account_balance_history_account_time", "account_id", "recorded_at"),
+        # Rows arrive in time order, so a BRIN index keeps time-range scans cheap at any size
+        Index("ix_account_balance_history_recorded_brin", "recorded_at", postgresql_using="brin"),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    account_id: Mapped[int] = mapped_column(ForeignKey("accounts.id", ondelete="CASCADE"))
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    balance: Mapped[float] = mapped_column(Numeric(15, 2))
+    recorded_at: Mapped[datetime] = mapped_column(DateTime(timezone=True), server_default=func.now())
@@ -0,0 +1,27 @@
+from datetime import date, datetime, timezone
+
+from sqlalchemy import Date, DateTime, Index, Numeric, String
+from sqlalchemy.orm import Mapped, mapped_column
+
+from app.core.database import Base
+
+
+class FxRate(Base):
+    """1 unit of `base` is worth `rate` units of `quote` on `date`."""
+
+    __tablename__ = "fx_rates"
+    __table_args__ = (
+        # The primary key serves lookups by base; this one serves lookups by quote
+        Index("ix_fx_rates_quote_base_date", "quote", "base", "date"),
+    )
+
+    base: Mapped[str] = mapped_column(String(10), primary_key=True)
+    quote: Mapped[str] = mapped_column(String(10), primary_key=True)
+    date: Mapped[date] = mapped_column(Date, primary_key=True)
+    rate: Mapped[float] = mapped_column(Numeric(20, 10))
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+        index=True,
+    )
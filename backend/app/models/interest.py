@@ -1,6 +1,6 @@
 from datetime import datetime, timezone
 
-from sqlalchemy import String, DateTime, ForeignKey, Numeric, Integer, Text
+from sqlalchemy import String, DateTime, ForeignKey, Index, Numeric, Integer, Text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.database import Base
@@ -8,9 +8,12 @@ from app.core.database import Base
 
 class InterestEntry(Base):
     __tablename__ = "interest_entries"
+    __table_args__ = (
+        Index("ix_interest_entries_user_year_status", "user_id", "fiscal_year", "status"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
-    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
     amount: Mapped[float] = mapped_column(Numeric(15, 2))
     source: Mapped[str] = mapped_column(String(255))  # e.g. bank name, bond, etc.
     date: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
@@ -1,7 +1,7 @@
 
 from datetime import date, datetime, timezone
 
-from sqlalchemy import String, DateTime, ForeignKey, Numeric, Text, Date
+from sqlalchemy import BigInteger, String, DateTime, ForeignKey, Index, Numeric, Text, Date, text
 from sqlalchemy.orm import Mapped, mapped_column
 
 from app.core.database import Base
@@ -18,9 +18,75 @@ class StockHolding(Base):
     avg_cost: Mapped[float] = mapped_column(Numeric(15, 2))
     current_price: Mapped[float] = mapped_column(Numeric(15, 2))
     sector: Mapped[str | None] = mapped_column(String(100), nullable=True)
+    # Lot matching on sells: fifo, lifo or average
+    cost_method: Mapped[str] = mapped_column(String(10), default="fifo", server_default="fifo")
+    # Total cost of the open shares; avg_cost is this over shares, rounded
+    cost_basis: Mapped[float] = mapped_column(Numeric(18, 4), default=0, server_default="0")
+    realized_gain: Mapped[float] = mapped_column(Numeric(15, 2), default=0, server_default="0")
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+
+class StockLot(Base):
+    """Shares bought in one trade; `shares_open` drops as sells are matched against it."""
+
+    __tablename__ = "stock_lots"
+    __table_args__ = (
+        # Open lots in matching order, for FIFO and (scanned backwards) LIFO
+        Index(
+            "ix_stock_lots_holding_open", "holding_id", "acquired_at", "id",
+            postgresql_where=text("shares_open > 0"),
+        ),
+    )
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    holding_id: Mapped[int] = mapped_column(ForeignKey("stock_holdings.id", ondelete="CASCADE"))
+    acquired_at: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    shares: Mapped[float] = mapped_column(Numeric(15, 4))
+    shares_open: Mapped[float] = mapped_column(Numeric(15, 4))
+    cost_per_share: Mapped[float] = mapped_column(Numeric(15, 4))
+
+
+class StockTrade(Base):
+    __tablename__ = "stock_trades"
+    __table_args__ = (Index("ix_stock_trades_holding_time", "holding_id", "traded_at"),)
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    holding_id: Mapped[int] = mapped_column(ForeignKey("stock_holdings.id", ondelete="CASCADE"))
+    side: Mapped[str] = mapped_column(String(4))  # buy, sell
+    shares: Mapped[float] = mapped_column(Numeric(15, 4))
+    price: Mapped[float] = mapped_column(Numeric(15, 4))
+    realized_gain: Mapped[float] = mapped_column(Numeric(15, 2), default=0)
+    traded_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
+
+
+class HoldingFlow(Base):
+    """Capital moved into (positive) or out of a holding, for performance returns.
+
+    Booked on creation, deletion, trades and hand-edited quantities, never on
+    revaluation. Rows outlive the holding, so a deleted holding's capital still
+    counts as a flow out.
+    """
+
+    __tablename__ = "holding_flows"
+    __table_args__ = (Index("ix_holding_flows_user_time", "user_id", "flowed_at"),)
+
+    id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"))
+    source_type: Mapped[str] = mapped_column(String(20))  # stock, real_estate, business, gold
+    source_id: Mapped[int]
+    amount: Mapped[float] = mapped_column(Numeric(15, 2))
+    flowed_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
+    )
 
 
 class RealEstateProperty(Base):
@@ -39,6 +105,11 @@ class RealEstateProperty(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
 
 
 class BusinessInterest(Base):
@@ -56,6 +127,11 @@ class BusinessInterest(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
 
 
 class GoldHolding(Base):
@@ -70,6 +146,11 @@ class GoldHolding(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
 
 
 class Vehicle(Base):
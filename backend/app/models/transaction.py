@@ -1,7 +1,7 @@
 
 from datetime import datetime, timezone, date
 
-from sqlalchemy import String, DateTime, Date, ForeignKey, Numeric, Text
+from sqlalchemy import String, DateTime, Date, ForeignKey, Index, Numeric, Integer, Text
 from sqlalchemy.orm import Mapped, mapped_column
 from sqlalchemy.dialects.postgresql import ARRAY
 
@@ -10,6 +10,9 @@ from app.core.database import Base
 
 class Transaction(Base):
     __tablename__ = "transactions"
+    __table_args__ = (
+        Index("ix_transactions_user_updated", "user_id", "updated_at"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True)
     user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), index=True)
@@ -24,3 +27,25 @@ class Transaction(Base):
     created_at: Mapped[datetime] = mapped_column(
         DateTime(timezone=True), default=lambda: datetime.now(timezone.utc)
     )
+    updated_at: Mapped[datetime] = mapped_column(
+        DateTime(timezone=True),
+        default=lambda: datetime.now(timezone.utc),
+        onupdate=lambda: datetime.now(timezone.utc),
+    )
+
+
+# Serves list_transactions' (date DESC, id DESC) ordering and keyset cursor
+Index("ix_transactions_user_date_id", Transaction.user_id, Transaction.date.desc(), Transaction.id.desc())
+
+
+class TransactionMonthlyRollup(Base):
+    """Per-user monthly totals by (type, category), kept in step with transactions."""
+
+    __tablename__ = "transaction_monthly_rollups"
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    month: Mapped[date] = mapped_column(Date, primary_key=True)
+    type: Mapped[str] = mapped_column(String(50), primary_key=True)
+    category: Mapped[str] = mapped_column(String(100), primary_key=True)
+    total: Mapped[float] = mapped_column(Numeric(15, 2), default=0)
+    txn_count: Mapped[int] = mapped_column(Integer, default=0)
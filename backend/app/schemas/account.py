@@ -48,3 +48,33 @@ class SegmentSummary(BaseModel):
     total_balance: float
     currency: str
     sub_segments: list[AccountResponse]
+
+
+class AccountBulkError(BaseModel):
+    row: int  # 1-based, not counting a CSV header
+    error: str
+
+
+class AccountBulkResult(BaseModel):
+    created: int
+    account_ids: list[int]
+    errors: list[AccountBulkError]
+
+
+class BalancePoint(BaseModel):
+    recorded_at: datetime
+    balance: float
+
+
+class AccountBalanceHistoryResponse(BaseModel):
+    account_id: int
+    currency: str
+    points: list[BalancePoint]
+
+
+class AccountBalanceAt(BaseModel):
+    account_id: int
+    at: datetime
+    recorded_at: datetime
+    balance: float
+    currency: str
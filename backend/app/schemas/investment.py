@@ -1,6 +1,10 @@
 
-from datetime import datetime
-from pydantic import BaseModel
+from datetime import date, datetime
+from typing import Literal
+
+from pydantic import BaseModel, Field
+
+CostMethod = Literal["fifo", "lifo", "average"]
 
 
 class StockHoldingCreate(BaseModel):
@@ -10,6 +14,7 @@ class StockHoldingCreate(BaseModel):
     avg_cost: float
     current_price: float
     sector: str | None = None
+    cost_method: CostMethod = "fifo"
 
 
 class StockHoldingUpdate(BaseModel):
@@ -19,6 +24,7 @@ class StockHoldingUpdate(BaseModel):
     avg_cost: float | None = None
     current_price: float | None = None
     sector: str | None = None
+    cost_method: CostMethod | None = None
 
 
 class StockHoldingResponse(BaseModel):
@@ -30,14 +36,50 @@ class StockHoldingResponse(BaseModel):
     avg_cost: float
     current_price: float
     sector: str | None
+    cost_method: str = "fifo"
     market_value: float = 0
     gain_loss: float = 0
     gain_loss_pct: float = 0
+    realized_gain: float = 0
     created_at: datetime
 
     model_config = {"from_attributes": True}
 
 
+class StockTradeCreate(BaseModel):
+    side: Literal["buy", "sell"]
+    shares: float = Field(gt=0)
+    price: float = Field(ge=0)
+    traded_at: datetime | None = None
+
+
+class StockTradeResponse(BaseModel):
+    id: int
+    holding_id: int
+    side: str
+    shares: float
+    price: float
+    realized_gain: float
+    traded_at: datetime
+
+    model_config = {"from_attributes": True}
+
+
+class StockLotResponse(BaseModel):
+    id: int
+    acquired_at: datetime
+    shares: float
+    shares_open: float
+    cost_per_share: float
+
+    model_config = {"from_attributes": True}
+
+
+class StockRevaluationResponse(BaseModel):
+    updated: int
+    unknown_tickers: list[str]
+
+
 class RealEstateCreate(BaseModel):
     name: str
     location: str
@@ -152,3 +194,19 @@ class PortfolioSummary(BaseModel):
     total_gold_value: float = 0
     total_portfolio_value: float
     total_gain_loss: float
+
+
+class ReturnMetrics(BaseModel):
+    asset_class: str
+    start_value: float
+    end_value: float
+    net_flows: float
+    twr_pct: float | None = None
+    xirr_pct: float | None = None
+
+
+class PerformanceReport(BaseModel):
+    start: date | None = None
+    end: date | None = None
+    overall: ReturnMetrics
+    asset_classes: list[ReturnMetrics]
@@ -57,3 +57,27 @@ class DashboardSummary(BaseModel):
     recent_transactions: list[dict]
     asset_allocation: list[dict]
     liability_allocation: list[dict] = []
+
+
+class TrendPoint(BaseModel):
+    period: str
+    income: float
+    expense: float
+    income_change: float | None = None
+    expense_change: float | None = None
+    expense_change_pct: float | None = None
+    savings_rate_3m: float | None = None
+    savings_rate_6m: float | None = None
+    savings_rate_12m: float | None = None
+
+
+class CategoryTrend(BaseModel):
+    category: str
+    moving_average: list[float | None]
+
+
+class TrendReport(BaseModel):
+    months: list[str]
+    points: list[TrendPoint]
+    category_moving_average: list[CategoryTrend]
+    spend_percentiles: dict[str, float]
@@ -0,0 +1,139 @@
+"""Vectorized trend analytics over a user's transaction history.
+
+Income/expense rows are fetched once as columns and binned into a dense
+month x category grid with NumPy; every series below is derived from that
+grid with cumulative sums and array arithmetic rather than Python loops.
+Callers load SAVINGS_LOOKBACK_MONTHS of history before the report's first
+month so the rolling savings rates are filled from its first month on.
+"""
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.transaction import Transaction
+
+SAVINGS_WINDOWS = (3, 6, 12)
+SAVINGS_LOOKBACK_MONTHS = max(SAVINGS_WINDOWS) - 1
+SPEND_PERCENTILES = (50, 75, 90, 95)
+
+
+@dataclass
+class TransactionColumns:
+    dates: np.ndarray  # datetime64[D]
+    is_income: np.ndarray  # bool
+    categories: np.ndarray  # int category codes into `category_names`
+    amounts: np.ndarray  # float64
+    category_names: list[str]
+
+
+async def load_transaction_columns(user_id: int, db: AsyncSession, since: date) -> TransactionColumns:
+    result = await db.execute(
+        select(Transaction.date, Transaction.type, Transaction.category, Transaction.amount).where(
+            Transaction.user_id == user_id,
+            Transaction.date >= since,
+            Transaction.type.in_(["income", "expense"]),
+        )
+    )
+    rows = result.all()
+    if not rows:
+        return TransactionColumns(
+            np.array([], dtype="datetime64[D]"), np.array([], dtype=bool),
+            np.array([], dtype=np.int64), np.array([], dtype=np.float64), [],
+        )
+    dates, types, categories, amounts = zip(*rows)
+    names, codes = np.unique(np.array(categories, dtype=object), return_inverse=True)
+    return TransactionColumns(
+        dates=np.array(dates, dtype="datetime64[D]"),
+        is_income=np.array(types, dtype=object) == "income",
+        categories=codes.astype(np.int64),
+        amounts=np.array(amounts, dtype=np.float64),
+        category_names=[str(n) for n in names],
+    )
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    """Trailing sum over `window` items along the last axis; NaN until the window fills."""
+    out = np.full(values.shape, np.nan)
+    if values.shape[-1] < window:
+        return out
+    csum = np.cumsum(values, axis=-1, dtype=np.float64)
+    out[..., window - 1:] = csum[..., window - 1:]
+    out[..., window:] -= csum[..., :-window]
+    return out
+
+
+def _ratio(numerator: np.ndarray, denominator: np.ndarray) -> np.ndarray:
+    out = np.full(numerator.shape, np.nan)
+    np.divide(numerator, denominator, out=out, where=denominator > 0)
+    return out
+
+
+def _clean(values: np.ndarray, digits: int = 2) -> list[float | None]:
+    return [None if np.isnan(v) else round(float(v), digits) for v in values]
+
+
+def compute_trends(cols: TransactionColumns, start: date, months: int, ma_window: int = 3) -> dict:
+    lookback = SAVINGS_LOOKBACK_MONTHS
+    month_axis = np.datetime64(start, "M") + np.arange(months)
+    month_idx = (cols.dates.astype("datetime64[M]") - month_axis[0]).astype(np.int64)
+
+    # Savings rates roll over the lookback months too, then are cut back to the report
+    in_history = (month_idx >= -lookback) & (month_idx < months)
+    history_idx, history_income = month_idx[in_history] + lookback, cols.is_income[in_history]
+    history_amounts = cols.amounts[in_history]
+    income_ext = np.bincount(
+        history_idx, weights=np.where(history_income, history_amounts, 0), minlength=months + lookback,
+    )
+    expense_ext = np.bincount(
+        history_idx, weights=np.where(history_income, 0, history_amounts), minlength=months + lookback,
+    )
+    savings = {
+        w: _clean((_ratio(rolling_sum(income_ext - expense_ext, w), rolling_sum(income_ext, w)) * 100)[lookback:])
+        for w in SAVINGS_WINDOWS
+    }
+    income, expense = income_ext[lookback:], expense_ext[lookback:]
+
+    in_range = (month_idx >= 0) & (month_idx < months)
+    month_idx, is_income = month_idx[in_range], cols.is_income[in_range]
+    categories, amounts = cols.categories[in_range], cols.amounts[in_range]
+
+    income_change = _clean(np.concatenate([[np.nan], np.diff(income)]))
+    expense_change = _clean(np.concatenate([[np.nan], np.diff(expense)]))
+    expense_change_pct = _clean(np.concatenate([[np.nan], _ratio(np.diff(expense), expense[:-1]) * 100]))
+
+    n_cats = len(cols.category_names)
+    spend = np.bincount(
+        categories[~is_income] * months + month_idx[~is_income],
+        weights=amounts[~is_income], minlength=n_cats * months,
+    ).reshape(n_cats, months)
+    window = min(ma_window, months)
+    spend_ma = rolling_sum(spend, window) / window
+    spent_categories = np.flatnonzero(spend.sum(axis=1) > 0)
+
+    expenses = amounts[~is_income]
+    percentiles = np.percentile(expenses, SPEND_PERCENTILES) if expenses.size else np.zeros(len(SPEND_PERCENTILES))
+
+    periods = [str(m) for m in month_axis]
+    return {
+        "months": periods,
+        "points": [
+            {
+                "period": periods[i],
+                "income": float(income[i]),
+                "expense": float(expense[i]),
+                "income_change": income_change[i],
+                "expense_change": expense_change[i],
+                "expense_change_pct": expense_change_pct[i],
+                **{f"savings_rate_{w}m": savings[w][i] for w in SAVINGS_WINDOWS},
+            }
+            for i in range(months)
+        ],
+        "category_moving_average": [
+            {"category": cols.category_names[c], "moving_average": _clean(spend_ma[c])}
+            for c in spent_categories
+        ],
+        "spend_percentiles": {f"p{p}": round(float(v), 2) for p, v in zip(SPEND_PERCENTILES, percentiles)},
+    }
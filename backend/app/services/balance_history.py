@@ -0,0 +1,90 @@
+"""Append-only balance history for accounts.
+
+Writes that set a balance directly call `record_balances` in the same
+transaction. `apply_balance_delta` records the parents it updates in the
+same statement, through `recorded`. Reads are bucketed in SQL and served by
+the (account_id, recorded_at) index, so they stay cheap however long the
+history grows.
+"""
+from datetime import date, datetime, time, timedelta, timezone
+
+from sqlalchemy import insert, literal, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.account import Account, AccountBalanceHistory
+from app.services.calculations import history_bucket, thin_buckets
+
+
+async def record_balances(db: AsyncSession, account_ids: list[int]):
+    """Append the current balance of each account."""
+    if not account_ids:
+        return
+    await db.execute(
+        insert(AccountBalanceHistory).from_select(
+            ["account_id", "user_id", "balance"],
+            select(Account.id, Account.user_id, Account.balance).where(Account.id.in_(account_ids)),
+        )
+    )
+
+
+def recorded(update_stmt):
+    """Turn an UPDATE of accounts into one statement that also appends the new balances."""
+    updated = update_stmt.returning(Account.id, Account.user_id, Account.balance).cte("updated")
+    return insert(AccountBalanceHistory).from_select(
+        ["account_id", "user_id", "balance"], select(updated),
+    )
+
+
+def _as_utc(value: datetime) -> datetime:
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def get_balance_history(
+    db: AsyncSession, account_id: int, date_from: date | None, date_to: date | None,
+    resolution: str, max_points: int,
+) -> list[tuple[datetime, float]]:
+    """Last balance per resolution bucket as (recorded_at, balance), thinned to `max_points`.
+
+    With `date_from`, the balance carried in from before it opens the series.
+    """
+    query = select(
+        AccountBalanceHistory.id, AccountBalanceHistory.recorded_at, AccountBalanceHistory.balance,
+    ).where(AccountBalanceHistory.account_id == account_id)
+    if date_to:
+        end = datetime.combine(date_to + timedelta(days=1), time.min, timezone.utc)
+        query = query.where(AccountBalanceHistory.recorded_at < end)
+    if date_from:
+        start = datetime.combine(date_from, time.min, timezone.utc)
+        opening = (
+            select(AccountBalanceHistory.id, literal(start).label("recorded_at"), AccountBalanceHistory.balance)
+            .where(AccountBalanceHistory.account_id == account_id, AccountBalanceHistory.recorded_at < start)
+            .order_by(AccountBalanceHistory.recorded_at.desc(), AccountBalanceHistory.id.desc())
+            .limit(1)
+        )
+        query = union_all(opening, query.where(AccountBalanceHistory.recorded_at >= start))
+    rows = query.subquery()
+
+    bucket = history_bucket(resolution, rows.c.recorded_at)
+    last_per_bucket = (
+        select(bucket, rows.c.recorded_at, rows.c.balance)
+        .distinct(bucket)
+        .order_by(bucket, rows.c.recorded_at.desc(), rows.c.id.desc())
+        .subquery()
+    )
+    thinned = thin_buckets(last_per_bucket, max_points)
+    result = await db.execute(
+        select(thinned.c.recorded_at, thinned.c.balance).order_by(thinned.c.bucket)
+    )
+    return [(at, float(balance)) for at, balance in result.all()]
+
+
+async def get_balance_at(db: AsyncSession, account_id: int, at: datetime) -> tuple[datetime, float] | None:
+    """The latest recorded (recorded_at, balance) at or before `at`, if any."""
+    result = await db.execute(
+        select(AccountBalanceHistory.recorded_at, AccountBalanceHistory.balance)
+        .where(AccountBalanceHistory.account_id == account_id, AccountBalanceHistory.recorded_at <= _as_utc(at))
+        .order_by(AccountBalanceHistory.recorded_at.desc(), AccountBalanceHistory.id.desc())
+        .limit(1)
+    )
+    row = result.first()
+    return (row[0], float(row[1])) if row else None
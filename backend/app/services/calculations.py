@@ -1,72 +1,136 @@
-from datetime import date, timedelta
+from datetime import date
 
-from sqlalchemy import select
+from sqlalchemy import func, literal_column, select
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.models.account import Account
-from app.models.transaction import Transaction
+from app.models.investment import NetWorthSnapshot
+from app.models.transaction import TransactionMonthlyRollup
+from app.services.fx import converted, latest_rates, unconverted, warn_unconverted
+from app.services.hierarchy import counted_leaf
 
+HISTORY_RESOLUTIONS = {"daily": "day", "weekly": "week", "monthly": "month"}
 
-async def get_leaf_accounts(user_id: int, db: AsyncSession) -> list[Account]:
-    """Get all active, non-segment (leaf) accounts for a user."""
-    result = await db.execute(
-        select(Account).where(
-            Account.user_id == user_id,
-            Account.is_active == True,
-            Account.is_segment == False,
-        )
-    )
-    return list(result.scalars().all())
+
+def month_window_start(months: int) -> date:
+    """First day of the calendar month `months - 1` months before the current one."""
+    today = date.today()
+    index = today.year * 12 + today.month - months
+    return date(index // 12, index % 12 + 1, 1)
 
 
-async def get_total_assets(user_id: int, db: AsyncSession) -> float:
-    accounts = await get_leaf_accounts(user_id, db)
-    return sum(float(a.balance) for a in accounts if a.type == "asset")
+async def get_leaf_balances(user_id: int, db: AsyncSession, currency: str) -> list[tuple[str, str, str, float]]:
+    """(name, type, category, balance) of counted leaf accounts, balances converted to `currency` in SQL.
+
+    Accounts in a currency without a rate are left out.
+    """
+    rates = latest_rates(currency)
+    result = await db.execute(
+        select(Account.name, Account.type, Account.category, converted(Account.balance, rates), Account.currency)
+        .outerjoin(rates, rates.c.currency == Account.currency)
+        .where(Account.user_id == user_id, counted_leaf())
+        .order_by(Account.id)
+    )
+    rows = result.all()
+    warn_unconverted((row.currency for row in rows if row[3] is None), currency)
+    return [(name, type_, category, float(balance)) for name, type_, category, balance, _ in rows if balance is not None]
 
 
-async def get_total_liabilities(user_id: int, db: AsyncSession) -> float:
-    accounts = await get_leaf_accounts(user_id, db)
-    return sum(float(a.balance) for a in accounts if a.type == "liability")
+async def get_leaf_totals(user_id: int, db: AsyncSession, currency: str) -> dict[tuple[str, str], float]:
+    """{(type, category): total} over counted leaf accounts, converted to `currency` in SQL."""
+    rates = latest_rates(currency)
+    result = await db.execute(
+        select(
+            Account.type, Account.category,
+            func.sum(converted(Account.balance, rates)), unconverted(Account.currency, rates),
+        )
+        .outerjoin(rates, rates.c.currency == Account.currency)
+        .where(Account.user_id == user_id, counted_leaf())
+        .group_by(Account.type, Account.category)
+    )
+    rows = result.all()
+    warn_unconverted((c for *_, missing in rows for c in missing or ()), currency)
+    return {(type_, category): float(total or 0) for type_, category, total, _ in rows}
 
 
-async def get_net_worth(user_id: int, db: AsyncSession) -> tuple[float, float, float]:
-    """Returns (net_worth, total_assets, total_liabilities)."""
-    accounts = await get_leaf_accounts(user_id, db)
-    assets = sum(float(a.balance) for a in accounts if a.type == "asset")
-    liabilities = sum(float(a.balance) for a in accounts if a.type == "liability")
+async def get_net_worth(user_id: int, db: AsyncSession, currency: str) -> tuple[float, float, float]:
+    """Returns (net_worth, total_assets, total_liabilities) in `currency`."""
+    totals = await get_leaf_totals(user_id, db, currency)
+    assets = sum(v for (type_, _), v in totals.items() if type_ == "asset")
+    liabilities = sum(v for (type_, _), v in totals.items() if type_ == "liability")
     return assets - liabilities, assets, liabilities
 
 
-async def get_monthly_income_expense(
-    user_id: int, db: AsyncSession, months: int = 1
-) -> tuple[float, float]:
-    """Returns (monthly_income, monthly_expense)."""
-    start = date.today() - timedelta(days=months * 30)
+async def get_monthly_category_totals(
+    user_id: int, db: AsyncSession, start: date
+) -> list[tuple[date, str, str, float]]:
+    """Returns (month, type, category, total) rows for income/expense from the month of `start`.
+
+    Reads the transaction_monthly_rollups table, so the cost depends on the
+    number of months and categories rather than on transaction volume.
+    """
     result = await db.execute(
-        select(Transaction).where(
-            Transaction.user_id == user_id,
-            Transaction.date >= start,
+        select(
+            TransactionMonthlyRollup.month, TransactionMonthlyRollup.type,
+            TransactionMonthlyRollup.category, TransactionMonthlyRollup.total,
         )
+        .where(
+            TransactionMonthlyRollup.user_id == user_id,
+            TransactionMonthlyRollup.month >= start.replace(day=1),
+            TransactionMonthlyRollup.type.in_(["income", "expense"]),
+            TransactionMonthlyRollup.txn_count > 0,
+        )
+        .order_by(TransactionMonthlyRollup.month)
+    )
+    return [(month, type_, category, float(total)) for month, type_, category, total in result.all()]
+
+
+def history_bucket(resolution: str, column):
+    """date_trunc of `column` to a HISTORY_RESOLUTIONS bucket, labelled "bucket"."""
+    unit = literal_column(f"'{HISTORY_RESOLUTIONS[resolution]}'")
+    return func.date_trunc(unit, column).label("bucket")
+
+
+def thin_buckets(last_per_bucket, max_points: int):
+    """Keep every n-th row of a subquery with a `bucket` column so at most `max_points` remain.
+
+    Counts back from the most recent bucket so the latest value is always kept.
+    A `max_points` below 1 keeps just that one.
+    """
+    max_points = max(max_points, 1)
+    numbered = select(
+        last_per_bucket,
+        func.row_number().over(order_by=last_per_bucket.c.bucket).label("rn"),
+        func.count().over().label("n"),
+    ).subquery()
+    stride = (numbered.c.n + max_points - 1) // max_points
+    return select(numbered).where((numbered.c.n - numbered.c.rn) % stride == 0).subquery()
+
+
+async def get_net_worth_history(
+    user_id: int, db: AsyncSession, date_from: date | None, date_to: date | None,
+    resolution: str, max_points: int,
+) -> list[tuple[date, float, float, float]]:
+    """Last snapshot per resolution bucket, thinned in SQL to at most `max_points` rows.
+
+    Returns (date, total_assets, total_liabilities, net_worth) rows. When there are
+    more buckets than `max_points`, every n-th bucket is kept, counting back
+    from the most recent one so the latest value is always present.
+    """
+    bucket = history_bucket(resolution, NetWorthSnapshot.date)
+    query = select(
+        bucket, NetWorthSnapshot.date, NetWorthSnapshot.total_assets,
+        NetWorthSnapshot.total_liabilities, NetWorthSnapshot.net_worth,
+    ).where(NetWorthSnapshot.user_id == user_id)
+    if date_from:
+        query = query.where(NetWorthSnapshot.date >= date_from)
+    if date_to:
+        query = query.where(NetWorthSnapshot.date <= date_to)
+    last_per_bucket = query.distinct(bucket).order_by(bucket, NetWorthSnapshot.date.desc()).subquery()
+
+    thinned = thin_buckets(last_per_bucket, max_points)
+    result = await db.execute(
+        select(thinned.c.date, thinned.c.total_assets, thinned.c.total_liabilities, thinned.c.net_worth)
+        .order_by(thinned.c.bucket)
     )
-    txns = result.scalars().all()
-    income = sum(float(t.amount) for t in txns if t.type == "income")
-    expense = sum(float(t.amount) for t in txns if t.type == "expense")
-    return income, expense
-
-
-async def get_asset_allocation(user_id: int, db: AsyncSession) -> list[dict]:
-    accounts = await get_leaf_accounts(user_id, db)
-    allocation: dict[str, float] = {}
-    for a in accounts:
-        if a.type == "asset":
-            allocation[a.category] = allocation.get(a.category, 0) + float(a.balance)
-    return [{"category": k, "value": v} for k, v in allocation.items()]
-
-
-async def get_liability_allocation(user_id: int, db: AsyncSession) -> list[dict]:
-    accounts = await get_leaf_accounts(user_id, db)
-    allocation: dict[str, float] = {}
-    for a in accounts:
-        if a.type == "liability":
-            allocation[a.category] = allocation.get(a.category, 0) + float(a.balance)
-    return [{"category": k, "value": v} for k, v in allocation.items()]
+    return [(d, float(a), float(l), float(nw)) for d, a, l, nw in result.all()]
@@ -0,0 +1,88 @@
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+
+from sqlalchemy import ARRAY, String, cast, func, literal, null, select, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.account import Account
+from app.models.transaction import Transaction
+from app.services.fx import converted, latest_rates, unconverted, warn_unconverted
+from app.services.hierarchy import counted_leaf
+
+
+@dataclass
+class DashboardTotals:
+    total_assets: float = 0.0
+    total_liabilities: float = 0.0
+    monthly_income: float = 0.0
+    monthly_expense: float = 0.0
+    asset_allocation: list[dict] = field(default_factory=list)
+    liability_allocation: list[dict] = field(default_factory=list)
+
+    @property
+    def net_worth(self) -> float:
+        return self.total_assets - self.total_liabilities
+
+
+class DashboardAggregator:
+    """Computes the dashboard figures with a single grouped query.
+
+    Leaf account balances are converted to the user's currency and summed per
+    (type, category), and the month's transactions per type; both halves are
+    combined with UNION ALL so the whole dashboard costs one round trip
+    however many accounts a user has.
+    """
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    def _query(self, user_id: int, currency: str, since: date):
+        rates = latest_rates(currency)
+        balances = select(
+            literal("account").label("source"),
+            Account.type.label("type"),
+            Account.category.label("category"),
+            func.sum(converted(Account.balance, rates)).label("total"),
+            unconverted(Account.currency, rates).label("unconverted"),
+        ).outerjoin(rates, rates.c.currency == Account.currency).where(
+            Account.user_id == user_id,
+            counted_leaf(),
+            Account.type.in_(["asset", "liability"]),
+        ).group_by(Account.type, Account.category)
+
+        cash_flow = select(
+            literal("transaction").label("source"),
+            Transaction.type.label("type"),
+            cast(null(), String).label("category"),
+            func.sum(Transaction.amount).label("total"),
+            cast(null(), ARRAY(String)).label("unconverted"),
+        ).where(
+            Transaction.user_id == user_id,
+            Transaction.date >= since,
+            Transaction.type.in_(["income", "expense"]),
+        ).group_by(Transaction.type)
+
+        return union_all(balances, cash_flow)
+
+    async def aggregate(self, user_id: int, currency: str, months: int = 1) -> DashboardTotals:
+        since = date.today() - timedelta(days=months * 30)
+        result = await self.db.execute(self._query(user_id, currency, since))
+
+        rows = result.all()
+        warn_unconverted((c for *_, missing in rows for c in missing or ()), currency)
+
+        totals = DashboardTotals()
+        for source, type_, category, total, _ in rows:
+            value = float(total or 0)
+            if source == "transaction":
+                if type_ == "income":
+                    totals.monthly_income = value
+                else:
+                    totals.monthly_expense = value
+            elif type_ == "asset":
+                totals.total_assets += value
+                totals.asset_allocation.append({"category": category, "value": value})
+            else:
+                totals.total_liabilities += value
+                totals.liability_allocation.append({"category": category, "value": value})
+        return totals
@@ -0,0 +1,207 @@
+"""Currency conversion backed by the fx_rates table.
+
+Aggregations convert inside SQL: they outer-join `latest_rates(quote)` on the
+row's currency and sum `converted(...)`, so totals across BDT, USD, gold and
+so on cost no per-row Python work. Amounts in a currency with no rate are
+left out of those sums; `unconverted(...)` collects such currencies alongside
+so callers can pass them to `warn_unconverted`. Code that already holds rows in memory
+(the purse) uses `fx_cache`, an in-process copy of the same rates.
+
+Rates come from a CSV file with date,base,quote,rate columns, or from a stub
+provider with fixed rates for development:
+
+    python -m app.services.fx [--file rates.csv] [--date YYYY-MM-DD]
+
+Loading rates bumps the global FX version in `report_cache`, so cached
+reports and every process's `fx_cache` pick up the new rates on their next read.
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import time
+from datetime import date
+
+from sqlalchemy import distinct, func, literal, select, union_all
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import report_cache
+from app.core.database import async_session
+from app.models.fx import FxRate
+
+logger = logging.getLogger(__name__)
+
+LOAD_BATCH_SIZE = 1000
+PIVOT_CURRENCY = "USD"
+
+# Units of USD per unit of each currency; XAU is priced per gram
+STUB_RATES_TO_USD = {
+    "BDT": 0.0082,
+    "EUR": 1.08,
+    "GBP": 1.27,
+    "INR": 0.012,
+    "XAU": 75.0,
+}
+
+
+class StubRateProvider:
+    def rates(self, on: date) -> list[dict]:
+        return [
+            {"date": on, "base": currency, "quote": "USD", "rate": rate}
+            for currency, rate in STUB_RATES_TO_USD.items()
+        ]
+
+
+class FileRateProvider:
+    def __init__(self, path: str):
+        self.path = path
+
+    def rates(self, on: date | None = None) -> list[dict]:
+        with open(self.path, newline="") as f:
+            return [
+                {
+                    "date": date.fromisoformat(row["date"]) if row.get("date") else on or date.today(),
+                    "base": row["base"].upper(),
+                    "quote": row["quote"].upper(),
+                    "rate": float(row["rate"]),
+                }
+                for row in csv.DictReader(f)
+            ]
+
+
+async def load_rates(db: AsyncSession, rows: list[dict]) -> int:
+    """Upsert (date, base, quote, rate) rows and commit. Returns the number of rows."""
+    for start in range(0, len(rows), LOAD_BATCH_SIZE):
+        stmt = pg_insert(FxRate).values(rows[start:start + LOAD_BATCH_SIZE])
+        await db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=["base", "quote", "date"],
+                set_={"rate": stmt.excluded.rate, "updated_at": func.now()},
+            )
+        )
+    await db.commit()
+    fx_cache.clear()
+    await report_cache.invalidate_fx()
+    return len(rows)
+
+
+def _rates_into(quote: str, as_of: date):
+    """(currency, rate, date) rows converting into `quote`; reversed pairs are inverted."""
+    direct = select(
+        FxRate.base.label("currency"), FxRate.rate.label("rate"), FxRate.date.label("date"),
+    ).where(FxRate.quote == quote, FxRate.date <= as_of)
+    inverse = select(FxRate.quote, 1 / FxRate.rate, FxRate.date).where(
+        FxRate.base == quote, FxRate.date <= as_of,
+    )
+    return direct, inverse
+
+
+def latest_rates(quote: str, as_of: date | None = None):
+    """Subquery of (currency, rate): the latest rate on or before `as_of` into `quote`.
+
+    `quote` itself has rate 1. Pairs stored the other way round are inverted.
+    Currencies are also crossed through PIVOT_CURRENCY, dated by the older of
+    the two legs; the most recent rate wins, a direct pair only on a tie.
+    """
+    as_of = as_of or date.today()
+    branches = [q.add_columns(literal(0).label("priority")) for q in _rates_into(quote, as_of)]
+    branches.append(select(literal(quote), literal(1), literal(as_of), literal(0)))
+    if quote != PIVOT_CURRENCY:
+        pivot_rows = union_all(
+            *_rates_into(PIVOT_CURRENCY, as_of),
+            select(literal(PIVOT_CURRENCY), literal(1), literal(as_of)),
+        ).subquery()
+        to_pivot = (
+            select(pivot_rows.c.currency, pivot_rows.c.rate, pivot_rows.c.date)
+            .distinct(pivot_rows.c.currency)
+            .order_by(pivot_rows.c.currency, pivot_rows.c.date.desc())
+            .subquery()
+        )
+        quote_leg = select(to_pivot.c.rate, to_pivot.c.date).where(to_pivot.c.currency == quote).subquery()
+        branches.append(select(
+            to_pivot.c.currency, to_pivot.c.rate / quote_leg.c.rate,
+            func.least(to_pivot.c.date, quote_leg.c.date), literal(1),
+        ).join(quote_leg, literal(True)))
+    rows = union_all(*branches).subquery()
+    return (
+        select(rows.c.currency, rows.c.rate)
+        .where(rows.c.rate.isnot(None))
+        .distinct(rows.c.currency)
+        .order_by(rows.c.currency, rows.c.date.desc(), rows.c.priority)
+        .subquery("rates")
+    )
+
+
+def converted(amount, rates):
+    """`amount` in the rates' quote currency, or NULL if its currency has no rate."""
+    return amount * rates.c.rate
+
+
+def unconverted(currency, rates):
+    """Aggregate of the distinct currencies `converted` had no rate for."""
+    return func.array_agg(distinct(currency)).filter(rates.c.rate.is_(None))
+
+
+def warn_unconverted(currencies, quote: str):
+    """Log currencies left out of a total for lack of a rate into `quote`."""
+    missing = sorted({c for c in currencies or () if c})
+    if missing:
+        logger.warning("No %s rate for %s; left out of totals", quote, ", ".join(missing))
+
+
+class RateCache:
+    """In-process {currency: rate} per quote currency.
+
+    Entries are reloaded when the global FX version in `report_cache` moves,
+    or every `ttl` seconds while that cache is unavailable.
+    """
+
+    def __init__(self, ttl: int = 3600):
+        self.ttl = ttl
+        self._data: dict[tuple[str, date], tuple[float, str | None, dict[str, float]]] = {}
+
+    async def rates(self, db: AsyncSession, quote: str) -> dict[str, float]:
+        key = (quote, date.today())
+        version = await report_cache.fx_version()
+        hit = self._data.get(key)
+        if hit is not None and hit[0] > time.monotonic() and hit[1] == version:
+            return hit[2]
+        rates_sq = latest_rates(quote)
+        result = await db.execute(select(rates_sq.c.currency, rates_sq.c.rate))
+        rates = {currency: float(rate) for currency, rate in result.all()}
+        # Entries for earlier days are never read again
+        self._data = {k: v for k, v in self._data.items() if k[1] == key[1]}
+        self._data[key] = (time.monotonic() + self.ttl, version, rates)
+        return rates
+
+    async def convert_many(self, db: AsyncSession, items: list[tuple[float, str]], quote: str) -> list[float]:
+        """Convert (amount, currency) pairs, only touching the rate table if a foreign currency is present.
+
+        Amounts in a currency without a rate convert to 0.
+        """
+        if all(currency == quote for _, currency in items):
+            return [amount for amount, _ in items]
+        rates = await self.rates(db, quote)
+        warn_unconverted((currency for _, currency in items if currency not in rates), quote)
+        return [amount * rates.get(currency, 0.0) for amount, currency in items]
+
+    def clear(self):
+        self._data.clear()
+
+
+fx_cache = RateCache()
+
+
+async def _main(path: str | None, on: date):
+    provider = FileRateProvider(path) if path else StubRateProvider()
+    async with async_session() as db:
+        print(f"Loaded {await load_rates(db, provider.rates(on))} rates")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load FX rates into fx_rates")
+    parser.add_argument("--file", default=None, help="CSV with date,base,quote,rate columns")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today())
+    args = parser.parse_args()
+    asyncio.run(_main(args.file, args.date))
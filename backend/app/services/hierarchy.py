@@ -0,0 +1,153 @@
+"""Closure-table maintenance and rollups for the account hierarchy.
+
+`account_closure` pairs every account with each of its ancestors (and with
+itself at depth 0), so ancestor chains, subtrees and rollups at any depth are
+single joins instead of recursive walks. Writers call `link_accounts` after
+inserting accounts, `move_subtree` when an account changes parent, and
+`move_subtree(db, id, None)` before deleting one that may have children.
+
+An account contributes to an ancestor only if it and every account between
+them is active, which is the same rule the delta-maintained balances follow.
+"""
+from sqlalchemy import and_, delete, exists, func, insert, literal, select, true, union_all
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.models.account import Account, AccountClosure
+
+
+async def link_accounts(db: AsyncSession, account_ids: list[int]):
+    """Add closure rows for newly inserted accounts.
+
+    Their parents must already be linked, so when a batch nests new accounts
+    under each other, link it one level at a time.
+    """
+    if not account_ids:
+        return
+    new = select(Account.id, Account.parent_id).where(Account.id.in_(account_ids)).subquery()
+    rows = union_all(
+        select(new.c.id, new.c.id, literal(0)),
+        select(AccountClosure.ancestor_id, new.c.id, AccountClosure.depth + 1)
+        .join(new, AccountClosure.descendant_id == new.c.parent_id),
+    )
+    await db.execute(
+        insert(AccountClosure).from_select(["ancestor_id", "descendant_id", "depth"], rows)
+    )
+
+
+async def link_account(db: AsyncSession, account: Account):
+    """Flush a pending account and add its closure rows."""
+    await db.flush([account])
+    await link_accounts(db, [account.id])
+
+
+async def is_in_subtree(db: AsyncSession, account_id: int, root_id: int) -> bool:
+    """True if `account_id` is `root_id` or one of its descendants."""
+    return bool(await db.scalar(select(exists().where(
+        AccountClosure.ancestor_id == root_id, AccountClosure.descendant_id == account_id,
+    ))))
+
+
+async def move_subtree(db: AsyncSession, account_id: int, new_parent_id: int | None):
+    """Re-link an account and its descendants under `new_parent_id` (None detaches them).
+
+    Callers check `is_in_subtree` first; moving an account under itself
+    would create a cycle.
+    """
+    subtree = select(AccountClosure.descendant_id).where(AccountClosure.ancestor_id == account_id)
+    old_ancestors = select(AccountClosure.ancestor_id).where(
+        AccountClosure.descendant_id == account_id, AccountClosure.depth > 0,
+    )
+    await db.execute(
+        delete(AccountClosure).where(
+            AccountClosure.descendant_id.in_(subtree), AccountClosure.ancestor_id.in_(old_ancestors),
+        )
+    )
+    if new_parent_id is None:
+        return
+    above = aliased(AccountClosure)
+    below = aliased(AccountClosure)
+    await db.execute(
+        insert(AccountClosure).from_select(
+            ["ancestor_id", "descendant_id", "depth"],
+            select(above.ancestor_id, below.descendant_id, above.depth + below.depth + 1)
+            .join(below, true())
+            .where(above.descendant_id == new_parent_id, below.ancestor_id == account_id),
+        )
+    )
+
+
+def _blocked_by_inactive(path: AccountClosure, within_depth):
+    """An inactive account sits on `path.descendant_id`'s chain closer than `within_depth`."""
+    up = aliased(AccountClosure)
+    on_path = aliased(Account)
+    return exists().where(
+        up.descendant_id == path.descendant_id,
+        up.depth < within_depth,
+        on_path.id == up.ancestor_id,
+        on_path.is_active == False,
+    )
+
+
+def ancestor_chain(account_id: int):
+    """Ids of `account_id` and the ancestors its balance rolls up into.
+
+    The chain stops at the first inactive account, which keeps its own
+    balance but contributes nothing further up.
+    """
+    path = aliased(AccountClosure)
+    return select(path.ancestor_id).where(
+        path.descendant_id == account_id,
+        ~_blocked_by_inactive(path, path.depth),
+    )
+
+
+def ancestor_deltas(changes):
+    """(id, delta) summing `changes` (parent_id, delta) rows into every account they roll up into."""
+    path = aliased(AccountClosure)
+    return (
+        select(path.ancestor_id.label("id"), func.sum(changes.c.delta).label("delta"))
+        .join(changes, path.descendant_id == changes.c.parent_id)
+        .where(~_blocked_by_inactive(path, path.depth))
+        .group_by(path.ancestor_id)
+    )
+
+
+def counted_leaf():
+    """Filter for accounts whose balance counts in totals and reports.
+
+    Leaves only, so parents at any depth don't double-count their children,
+    and only when the account and all of its ancestors are active.
+    """
+    child = aliased(Account)
+    path = aliased(AccountClosure)
+    on_path = aliased(Account)
+    return and_(
+        Account.is_active == True,
+        Account.is_segment == False,
+        ~exists().where(child.parent_id == Account.id),
+        ~exists().where(
+            path.descendant_id == Account.id, on_path.id == path.ancestor_id, on_path.is_active == False,
+        ),
+    )
+
+
+def rollup_query(user_id: int | None = None):
+    """(account_id, total) for every account with contributing leaves beneath it."""
+    path = aliased(AccountClosure)
+    leaf = aliased(Account)
+    child = aliased(Account)
+    query = (
+        select(path.ancestor_id.label("id"), func.sum(leaf.balance).label("total"))
+        .join(leaf, leaf.id == path.descendant_id)
+        .where(
+            path.depth > 0,
+            ~exists().where(child.parent_id == leaf.id),
+            ~_blocked_by_inactive(path, path.depth),
+        )
+        .group_by(path.ancestor_id)
+    )
+    if user_id is not None:
+        query = query.where(leaf.user_id == user_id)
+    return query
+
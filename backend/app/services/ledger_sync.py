@@ -0,0 +1,141 @@
+"""Unit of work for writes mirrored into the account ledger.
+
+Investments keep one mirror account per holding, and interest entries keep
+the interest fund in step. `LedgerSync` stages the entity, its mirror account
+and the parent balance deltas in the request's transaction and commits them
+once, so a failure at any step leaves nothing half-synced. Creating or
+removing a mirror also books the holding's value as a `HoldingFlow`; callers
+add flows for trades and hand-edited quantities with `flow`:
+
+    ledger = LedgerSync(db, user.id)
+    ledger.add(stock)
+    await ledger.mirror("stock", stock, name, value, "investment")
+    await ledger.commit()
+"""
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.accounts import add_to_segment, apply_balance_delta, balance_share, move_balance
+from app.core.cache import report_cache
+from app.models.account import Account
+from app.models.interest import InterestEntry
+from app.models.investment import HoldingFlow
+from app.services.balance_history import record_balances
+
+INTEREST_FUND_NAME = "Interest Fund (Liability)"
+
+
+class LedgerSync:
+    def __init__(self, db: AsyncSession, user_id: int):
+        self.db = db
+        self.user_id = user_id
+
+    def add(self, entity):
+        self.db.add(entity)
+
+    async def delete(self, entity):
+        await self.db.delete(entity)
+
+    def flow(self, source_type: str, source_id: int, amount: float, at: datetime | None = None):
+        """Book capital moving into (positive) or out of a holding."""
+        amount = round(float(amount), 2)
+        if amount:
+            self.db.add(HoldingFlow(
+                user_id=self.user_id, source_type=source_type, source_id=source_id,
+                amount=amount, flowed_at=at or datetime.now(timezone.utc),
+            ))
+
+    async def _mirror_account(self, source_type: str, source_id: int) -> Account | None:
+        result = await self.db.execute(
+            select(Account).where(
+                Account.user_id == self.user_id,
+                Account.source_type == source_type,
+                Account.source_id == source_id,
+            ).with_for_update()
+        )
+        return result.scalar_one_or_none()
+
+    async def mirror(self, source_type: str, entity, name: str, value: float, category: str):
+        """Create or update the account mirroring `entity`, flushing it first if it is new."""
+        if entity.id is None:
+            await self.db.flush([entity])
+        acct = await self._mirror_account(source_type, entity.id)
+
+        if acct:
+            old_share, old_value = balance_share(acct), float(acct.balance)
+            acct.name = name
+            acct.balance = value
+            await move_balance(acct.parent_id, old_share, acct.parent_id, balance_share(acct), self.db)
+            if value != old_value:
+                await record_balances(self.db, [acct.id])
+            return
+        acct = Account(
+            user_id=self.user_id,
+            name=name,
+            type="asset",
+            category=category,
+            balance=value,
+            source_type=source_type,
+            source_id=entity.id,
+        )
+        await add_to_segment(self.db, acct, category)
+        await record_balances(self.db, [acct.id])
+        await apply_balance_delta(acct.parent_id, value, self.db)
+        self.flow(source_type, entity.id, value)
+
+    async def unmirror(self, source_type: str, source_id: int):
+        """Remove the account mirroring an entity and take its balance out of the parents."""
+        acct = await self._mirror_account(source_type, source_id)
+        if acct:
+            await apply_balance_delta(acct.parent_id, -balance_share(acct), self.db)
+            self.flow(source_type, source_id, -float(acct.balance))
+            await self.db.delete(acct)
+
+    async def interest_fund(self) -> Account:
+        """The interest fund liability account, locked; created if missing."""
+        result = await self.db.execute(
+            select(Account).where(
+                Account.user_id == self.user_id,
+                Account.name == INTEREST_FUND_NAME,
+                Account.type == "liability",
+                Account.category == "liability",
+                Account.is_segment == False,
+            ).with_for_update()
+        )
+        fund = result.scalar_one_or_none()
+        if fund:
+            return fund
+        fund = Account(
+            user_id=self.user_id,
+            name=INTEREST_FUND_NAME,
+            type="liability",
+            category="liability",
+            balance=0,
+            currency="USD",
+        )
+        await add_to_segment(self.db, fund, "liability")
+        await record_balances(self.db, [fund.id])
+        return fund
+
+    async def sync_interest_fund(self):
+        """Set the interest fund balance to the sum of undistributed entries."""
+        # Lock the fund first so the sum below sees every committed entry
+        fund = await self.interest_fund()
+        undistributed = await self.db.execute(
+            select(func.coalesce(func.sum(InterestEntry.amount), 0)).where(
+                InterestEntry.user_id == self.user_id,
+                InterestEntry.status == "received",
+            )
+        )
+        balance = float(undistributed.scalar())
+        if balance != float(fund.balance):
+            await apply_balance_delta(fund.parent_id, balance - float(fund.balance), self.db)
+            fund.balance = balance
+            await record_balances(self.db, [fund.id])
+
+    async def commit(self):
+        """Commit everything staged, then drop the user's cached reports."""
+        await self.db.commit()
+        await report_cache.invalidate(self.user_id)
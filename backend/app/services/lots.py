@@ -0,0 +1,121 @@
+"""Tax-lot matching for stock holdings.
+
+Every buy opens a lot. A sell closes shares from the open lots in FIFO or
+LIFO order, or under average cost at the holding's average basis (lots are
+still drawn down oldest first so the open quantities stay right). Open
+lots are read a page at a time from a partial index in matching order, so
+a sell touches only the lots it closes, however long the history is.
+
+The holding's shares, cost_basis, avg_cost and realized_gain are updated as
+each trade posts; unrealized gain is shares * current_price - cost_basis.
+Callers lock the holding row first and sync its mirror account afterwards.
+"""
+from datetime import datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import delete, select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.investment import StockHolding, StockLot, StockTrade
+
+COST_METHODS = ("fifo", "lifo", "average")
+LOT_PAGE_SIZE = 100
+
+
+class InsufficientShares(ValueError):
+    pass
+
+
+def _dec(value) -> Decimal:
+    return value if isinstance(value, Decimal) else Decimal(str(value))
+
+
+def _set_position(holding: StockHolding, shares: Decimal, cost_basis: Decimal):
+    holding.shares = shares
+    holding.cost_basis = cost_basis
+    holding.avg_cost = round(cost_basis / shares, 2) if shares else Decimal(0)
+
+
+async def open_position(db: AsyncSession, holding: StockHolding, at: datetime | None = None):
+    """Replace a holding's open lots with a single lot of its current shares at avg_cost.
+
+    Used when a holding is created, or its shares or average cost are edited directly.
+    """
+    shares, avg_cost = _dec(holding.shares), _dec(holding.avg_cost)
+    if holding.id is None:
+        await db.flush([holding])
+    else:
+        await db.execute(delete(StockLot).where(StockLot.holding_id == holding.id, StockLot.shares_open > 0))
+    if shares > 0:
+        db.add(StockLot(
+            holding_id=holding.id, acquired_at=at or datetime.now(timezone.utc),
+            shares=shares, shares_open=shares, cost_per_share=avg_cost,
+        ))
+    _set_position(holding, shares, shares * avg_cost)
+
+
+async def buy(db: AsyncSession, holding: StockHolding, shares, price, at: datetime | None = None) -> StockTrade:
+    shares, price = _dec(shares), _dec(price)
+    at = at or datetime.now(timezone.utc)
+    db.add(StockLot(holding_id=holding.id, acquired_at=at, shares=shares, shares_open=shares, cost_per_share=price))
+    _set_position(holding, _dec(holding.shares) + shares, _dec(holding.cost_basis) + shares * price)
+    trade = StockTrade(holding_id=holding.id, side="buy", shares=shares, price=price, realized_gain=0, traded_at=at)
+    db.add(trade)
+    return trade
+
+
+async def _open_lots(db: AsyncSession, holding_id: int, newest_first: bool):
+    """Open lots in matching order, locked, fetched a page at a time."""
+    order = (StockLot.acquired_at.desc(), StockLot.id.desc()) if newest_first else (StockLot.acquired_at, StockLot.id)
+    after = None
+    while True:
+        query = (
+            select(StockLot)
+            .where(StockLot.holding_id == holding_id, StockLot.shares_open > 0)
+            .order_by(*order)
+            .limit(LOT_PAGE_SIZE)
+            .with_for_update()
+        )
+        if after is not None:
+            key = tuple_(StockLot.acquired_at, StockLot.id)
+            query = query.where(key < after if newest_first else key > after)
+        lots = (await db.scalars(query)).all()
+        for lot in lots:
+            yield lot
+        if len(lots) < LOT_PAGE_SIZE:
+            return
+        after = tuple_(lots[-1].acquired_at, lots[-1].id)
+
+
+async def sell(db: AsyncSession, holding: StockHolding, shares, price, at: datetime | None = None) -> StockTrade:
+    """Close `shares` against the open lots and book the realized gain.
+
+    Raises InsufficientShares when the holding has fewer shares open.
+    """
+    shares, price = _dec(shares), _dec(price)
+    held, cost_basis = _dec(holding.shares), _dec(holding.cost_basis)
+    if shares > held:
+        raise InsufficientShares(f"Only {held} shares of {holding.ticker} are held")
+
+    remaining, lot_cost = shares, Decimal(0)
+    async for lot in _open_lots(db, holding.id, newest_first=holding.cost_method == "lifo"):
+        taken = min(remaining, _dec(lot.shares_open))
+        lot.shares_open = _dec(lot.shares_open) - taken
+        lot_cost += taken * _dec(lot.cost_per_share)
+        remaining -= taken
+        if not remaining:
+            break
+
+    if holding.cost_method == "average":
+        closed_cost = cost_basis * shares / held
+    else:
+        closed_cost = lot_cost
+    realized = round(shares * price - closed_cost, 2)
+    _set_position(holding, held - shares, cost_basis - closed_cost if shares < held else Decimal(0))
+    holding.realized_gain = _dec(holding.realized_gain) + realized
+    trade = StockTrade(
+        holding_id=holding.id, side="sell", shares=shares, price=price, realized_gain=realized,
+        traded_at=at or datetime.now(timezone.utc),
+    )
+    db.add(trade)
+    return trade
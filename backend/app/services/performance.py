@@ -0,0 +1,237 @@
+"""Time-weighted and money-weighted returns per asset class.
+
+Values come from the per-segment `breakdown` of daily net worth snapshots,
+extracted in SQL into a dense (asset class x day) matrix. External cash
+flows are transfers into or out of an asset class's accounts, plus the
+holding flows booked when holdings are created, deleted, traded or have
+their quantity edited; each is booked on the first snapshot on or after its
+date, whose value is taken to include it.
+
+TWR chains the daily returns (V_t - F_t) / V_{t-1} over the whole matrix at
+once. XIRR solves for the rate that zeroes the dated cash flows (the
+opening value in, contributions in, the closing value out) with Newton's
+method, falling back to bisection when Newton leaves the bracket. The math
+runs in a process pool so long histories don't block the event loop.
+"""
+import asyncio
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+
+import numpy as np
+from sqlalchemy import Numeric, case, cast, func, select
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.api.accounts import SEGMENT_FOR_CATEGORY
+from app.core.config import settings
+from app.models.account import Account
+from app.models.investment import HoldingFlow, NetWorthSnapshot
+from app.models.transaction import Transaction
+
+# Asset class -> the segment category its accounts roll up into
+ASSET_CLASSES = {
+    "stocks": "investment",
+    "real_estate": "property",
+    "business": "business",
+    "gold": "gold",
+}
+# Mirror account source type -> asset class
+SOURCE_CLASSES = {
+    "stock": "stocks",
+    "real_estate": "real_estate",
+    "business": "business",
+    "gold": "gold",
+}
+OVERALL = "overall"
+DAYS_PER_YEAR = 365.0
+
+
+@dataclass
+class PerformanceInputs:
+    dates: np.ndarray  # datetime64[D], one per snapshot
+    values: np.ndarray  # float64 (asset class, snapshot)
+    flow_dates: np.ndarray  # datetime64[D]
+    flow_classes: np.ndarray  # int index into ASSET_CLASSES
+    flow_amounts: np.ndarray  # float64, positive into the asset class
+
+
+@dataclass
+class ClassReturn:
+    asset_class: str
+    start_value: float
+    end_value: float
+    net_flows: float
+    twr: float | None
+    xirr: float | None
+
+
+def _class_index(category_column):
+    """Index into ASSET_CLASSES of an account category, or -1 for other categories."""
+    whens = []
+    for i, segment in enumerate(ASSET_CLASSES.values()):
+        categories = [segment] + [c for c, s in SEGMENT_FOR_CATEGORY.items() if s == segment]
+        whens.append((category_column.in_(categories), i))
+    return case(*whens, else_=-1)
+
+
+async def load_performance_inputs(
+    db: AsyncSession, user_id: int, date_from: date | None, date_to: date | None,
+) -> PerformanceInputs:
+    breakdown = cast(NetWorthSnapshot.breakdown, JSONB)
+    snapshots = select(
+        NetWorthSnapshot.date,
+        *(
+            func.coalesce(cast(breakdown[segment].astext, Numeric), 0)
+            for segment in ASSET_CLASSES.values()
+        ),
+    ).where(NetWorthSnapshot.user_id == user_id).order_by(NetWorthSnapshot.date)
+    if date_from:
+        snapshots = snapshots.where(NetWorthSnapshot.date >= date_from)
+    if date_to:
+        snapshots = snapshots.where(NetWorthSnapshot.date <= date_to)
+    rows = (await db.execute(snapshots)).all()
+
+    source, target = aliased(Account), aliased(Account)
+    out_of, into = _class_index(source.category), _class_index(target.category)
+    transfers = (
+        select(Transaction.date, Transaction.amount, out_of, into)
+        .join(source, source.id == Transaction.account_id)
+        .join(target, target.id == Transaction.to_account_id)
+        .where(Transaction.user_id == user_id, Transaction.type == "transfer", out_of != into)
+    )
+    transfer_rows = (await db.execute(transfers)).all()
+    classes = list(ASSET_CLASSES)
+    holding_flows = select(
+        func.date(HoldingFlow.flowed_at),
+        HoldingFlow.amount,
+        case(*((HoldingFlow.source_type == s, classes.index(c)) for s, c in SOURCE_CLASSES.items())),
+    ).where(HoldingFlow.user_id == user_id, HoldingFlow.source_type.in_(SOURCE_CLASSES))
+    flow_rows = (await db.execute(holding_flows)).all()
+
+    days = np.array([r[0] for r in transfer_rows], dtype="datetime64[D]")
+    amounts = np.array([r[1] for r in transfer_rows], dtype=np.float64)
+    sources = np.array([r[2] for r in transfer_rows], dtype=np.int64)
+    targets = np.array([r[3] for r in transfer_rows], dtype=np.int64)
+    # A transfer between two asset classes is a flow out of one and into the other
+    leaving, arriving = sources >= 0, targets >= 0
+    return PerformanceInputs(
+        dates=np.array([r[0] for r in rows], dtype="datetime64[D]"),
+        values=np.array([r[1:] for r in rows], dtype=np.float64).reshape(len(rows), len(ASSET_CLASSES)).T,
+        flow_dates=np.concatenate([
+            days[leaving], days[arriving], np.array([r[0] for r in flow_rows], dtype="datetime64[D]"),
+        ]),
+        flow_classes=np.concatenate([
+            sources[leaving], targets[arriving], np.array([r[2] for r in flow_rows], dtype=np.int64),
+        ]),
+        flow_amounts=np.concatenate([
+            -amounts[leaving], amounts[arriving], np.array([r[1] for r in flow_rows], dtype=np.float64),
+        ]),
+    )
+
+
+def time_weighted_returns(values: np.ndarray, flows: np.ndarray) -> np.ndarray:
+    """Cumulative TWR for each row of (row, day) values and flows; NaN where nothing was held."""
+    prev, cur, flow = values[:, :-1], values[:, 1:], flows[:, 1:]
+    held = prev > 0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        growth = np.where(held, (cur - flow) / prev, 1.0)
+    twr = np.prod(growth, axis=1) - 1
+    return np.where(held.any(axis=1), twr, np.nan)
+
+
+def xirr(years: np.ndarray, amounts: np.ndarray, tol: float = 1e-9, max_iter: int = 100) -> float | None:
+    """Annual rate at which the dated `amounts` have zero net present value."""
+    if not (amounts > 0).any() or not (amounts < 0).any():
+        return None
+
+    def npv(rate: float) -> float:
+        return float(np.sum(amounts * (1 + rate) ** -years))
+
+    rate = 0.1
+    for _ in range(max_iter):
+        slope = float(np.sum(-years * amounts * (1 + rate) ** (-years - 1)))
+        if slope == 0 or not np.isfinite(slope):
+            break
+        step = npv(rate) / slope
+        if not np.isfinite(step) or rate - step <= -1:
+            break
+        rate -= step
+        if abs(step) < tol:
+            return rate
+
+    low, high = -0.9999, 1.0
+    while npv(low) * npv(high) > 0 and high < 1e6:
+        high *= 10
+    if npv(low) * npv(high) > 0:
+        return None
+    for _ in range(200):
+        mid = (low + high) / 2
+        if npv(low) * npv(mid) <= 0:
+            high = mid
+        else:
+            low = mid
+        if high - low < tol:
+            break
+    return (low + high) / 2
+
+
+def compute_returns(inputs: PerformanceInputs) -> list[ClassReturn]:
+    """Returns for each asset class and then overall. Pure, so it can run in a worker process."""
+    names = list(ASSET_CLASSES) + [OVERALL]
+    days = len(inputs.dates)
+    if days == 0:
+        return [ClassReturn(name, 0.0, 0.0, 0.0, None, None) for name in names]
+
+    flows = np.zeros((len(ASSET_CLASSES), days))
+    slot = np.searchsorted(inputs.dates, inputs.flow_dates, side="left")
+    # Flows on or before the first snapshot are already in its value
+    inside = (slot > 0) & (slot < days)
+    np.add.at(flows, (inputs.flow_classes[inside], slot[inside]), inputs.flow_amounts[inside])
+
+    values = np.vstack([inputs.values, inputs.values.sum(axis=0)])
+    flows = np.vstack([flows, flows.sum(axis=0)])
+    twr = time_weighted_returns(values, flows) if days > 1 else np.full(len(names), np.nan)
+
+    years = (inputs.dates - inputs.dates[0]).astype(np.float64) / DAYS_PER_YEAR
+    results = []
+    for i, name in enumerate(names):
+        # Investor's view: the opening value and contributions go in, the closing value comes out
+        cash = -flows[i].copy()
+        cash[0] -= values[i, 0]
+        cash[-1] += values[i, -1]
+        rate = xirr(years, cash) if days > 1 else None
+        results.append(ClassReturn(
+            asset_class=name,
+            start_value=float(values[i, 0]),
+            end_value=float(values[i, -1]),
+            net_flows=float(flows[i].sum()),
+            twr=None if np.isnan(twr[i]) else float(twr[i]),
+            xirr=rate,
+        ))
+    return results
+
+
+_pool: ProcessPoolExecutor | None = None
+
+
+def _executor() -> ProcessPoolExecutor:
+    global _pool
+    if _pool is None:
+        _pool = ProcessPoolExecutor(
+            max_workers=settings.PERFORMANCE_WORKERS, mp_context=multiprocessing.get_context("spawn"),
+        )
+    return _pool
+
+
+async def run_in_pool(fn, *args):
+    return await asyncio.get_running_loop().run_in_executor(_executor(), fn, *args)
+
+
+def shutdown_pool():
+    global _pool
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
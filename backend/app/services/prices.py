@@ -0,0 +1,152 @@
+"""Market price ingestion for stock and gold holdings.
+
+A price provider returns {symbol: price}: stock tickers, plus GOLD_SYMBOL
+priced per vori. `PriceFeed` reads it through a TTL cache and revalues
+every matching holding and mirror account across all users in set-based
+batches of holdings, one transaction per batch, dropping the affected
+users' cached reports as each batch commits. It runs on a schedule inside the app
+when PRICE_FEED_PROVIDER is set, or once from the command line:
+
+    python -m app.services.prices --file prices.csv
+"""
+import argparse
+import asyncio
+import csv
+import logging
+import time
+from functools import partial
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.cache import report_cache
+from app.core.config import settings
+from app.core.database import async_session
+from app.services.revaluation import GOLD_SYMBOL, Revaluation, revalue_gold, revalue_stocks
+
+logger = logging.getLogger(__name__)
+
+REVALUE_BATCH_SIZE = 1000
+
+
+class FilePriceProvider:
+    """Prices from a CSV file with symbol,price columns."""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def prices(self) -> dict[str, float]:
+        with open(self.path, newline="") as f:
+            return {row["symbol"].strip().upper(): float(row["price"]) for row in csv.DictReader(f)}
+
+
+class FakePriceProvider:
+    """In-process prices for tests and local development."""
+
+    def __init__(self, prices: dict[str, float] | None = None):
+        self._prices = {symbol.upper(): price for symbol, price in (prices or {}).items()}
+        self.calls = 0
+
+    def set_price(self, symbol: str, price: float):
+        self._prices[symbol.upper()] = price
+
+    def prices(self) -> dict[str, float]:
+        self.calls += 1
+        return dict(self._prices)
+
+
+class PriceCache:
+    """The provider's latest prices, fetched again at most every `ttl` seconds."""
+
+    def __init__(self, provider, ttl: int):
+        self.provider = provider
+        self.ttl = ttl
+        self._expires = 0.0
+        self._prices: dict[str, float] = {}
+
+    def prices(self) -> dict[str, float]:
+        if time.monotonic() >= self._expires:
+            self._prices = self.provider.prices()
+            self._expires = time.monotonic() + self.ttl
+        return self._prices
+
+    def clear(self):
+        self._expires = 0.0
+
+
+class PriceFeed:
+    def __init__(
+        self, provider, ttl: int | None = None, interval: int | None = None,
+        session_factory: async_sessionmaker[AsyncSession] = async_session,
+    ):
+        self.cache = PriceCache(provider, settings.PRICE_CACHE_TTL_SECONDS if ttl is None else ttl)
+        self.interval = interval or settings.PRICE_FEED_INTERVAL_SECONDS
+        self.session_factory = session_factory
+        self._task: asyncio.Task | None = None
+
+    async def refresh(self) -> Revaluation:
+        """Revalue every holding with a current price and drop the affected users' cached reports."""
+        # The provider may read a file or the network, so keep it off the event loop
+        prices = dict(await asyncio.to_thread(self.cache.prices))
+        gold_price = prices.pop(GOLD_SYMBOL, None)
+        total = Revaluation()
+        async with self.session_factory() as db:
+            if prices:
+                await self._revalue(db, total, partial(revalue_stocks, db, prices))
+            if gold_price is not None:
+                await self._revalue(db, total, partial(revalue_gold, db, gold_price))
+        return total
+
+    async def _revalue(self, db: AsyncSession, total: Revaluation, revalue):
+        """Run `revalue` over REVALUE_BATCH_SIZE holdings at a time, committing each batch."""
+        after_id = None
+        while True:
+            batch = await revalue(after_id=after_id, limit=REVALUE_BATCH_SIZE)
+            await db.commit()
+            for user_id in batch.user_ids:
+                await report_cache.invalidate(user_id)
+            total.updated += batch.updated
+            total.user_ids |= batch.user_ids
+            if batch.last_id is None:
+                return
+            after_id = batch.last_id
+
+    async def _run(self):
+        while True:
+            try:
+                result = await self.refresh()
+                logger.info("Revalued %s holdings for %s users", result.updated, len(result.user_ids))
+            except Exception:
+                logger.exception("Price refresh failed")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+def create_price_feed() -> PriceFeed | None:
+    """The feed configured by PRICE_FEED_PROVIDER (none, file), if any."""
+    if settings.PRICE_FEED_PROVIDER == "file":
+        return PriceFeed(FilePriceProvider(settings.PRICE_FEED_FILE))
+    return None
+
+
+async def _main(path: str):
+    result = await PriceFeed(FilePriceProvider(path), ttl=0).refresh()
+    print(f"Revalued {result.updated} holdings for {len(result.user_ids)} users")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Revalue stock and gold holdings from a price file")
+    parser.add_argument("--file", default=settings.PRICE_FEED_FILE, help="CSV with symbol,price columns")
+    args = parser.parse_args()
+    asyncio.run(_main(args.file))
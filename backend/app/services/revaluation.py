@@ -0,0 +1,170 @@
+"""Set-based price revaluation for stock and gold holdings.
+
+`revalue_stocks` applies a {ticker: price} map to every matching holding, and
+`revalue_gold` a price per vori to every gold holding, either for one user
+or across all of them. Each locks the matching holdings and then their
+mirror accounts, and rewrites only the holdings whose price changes, the
+accounts whose balance changes and the balances above them, with a fixed
+number of statements however many holdings match. The caller commits, so a
+whole portfolio is revalued in one transaction; with `limit`, only that many
+holdings after `after_id` are taken, and `last_id` says where to resume.
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field
+
+from sqlalchemy import Numeric, String, cast, column, func, literal, select, update, values
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.api.accounts import apply_balance_deltas
+from app.models.account import Account
+from app.models.investment import GoldHolding, StockHolding
+from app.services.balance_history import record_balances
+
+GOLD_SYMBOL = "GOLD"
+
+
+@dataclass
+class Revaluation:
+    updated: int = 0
+    unknown_tickers: list[str] = field(default_factory=list)
+    # Users whose holdings were repriced, for cache invalidation
+    user_ids: set[int] = field(default_factory=set)
+    # Last holding id taken when `limit` was reached; None once all are done
+    last_id: int | None = None
+
+
+async def _lock_changed(
+    db: AsyncSession, holding, matching, changed, after_id: int | None, limit: int | None,
+) -> tuple[list, int | None]:
+    """Lock the `matching` holdings in id order and return (id, user_id, symbol, changed) rows.
+
+    Holdings are locked before their mirror accounts, the same order user
+    writes take them in, so the feed can't deadlock against a request. With
+    `limit`, at most that many holdings after `after_id` are locked, and the
+    last id is returned alongside when the batch is full.
+    """
+    if after_id is not None:
+        matching = matching.where(holding.id > after_id)
+    result = await db.execute(
+        matching.add_columns(changed).order_by(holding.id).limit(limit).with_for_update(of=holding)
+    )
+    rows = result.all()
+    return rows, rows[-1][0] if limit is not None and len(rows) == limit else None
+
+
+async def _sync_mirrors(db: AsyncSession, source_type: str, holding_ids: list[int], revalued):
+    """Set the mirror accounts of the `revalued` (id, user_id, value) CTE to their new values.
+
+    Only accounts whose balance moves are written, and the parent deltas are
+    computed from balances locked beforehand.
+    """
+    locked = await db.execute(
+        select(Account.id, Account.parent_id, Account.is_active, Account.balance)
+        .where(Account.source_type == source_type, Account.source_id.in_(holding_ids))
+        .order_by(Account.id)
+        .with_for_update()
+    )
+    before = {row.id: row for row in locked.all()}
+
+    value = cast(revalued.c.value, Account.balance.type)
+    result = await db.execute(
+        update(Account)
+        .where(
+            Account.source_type == source_type,
+            Account.source_id == revalued.c.id,
+            Account.user_id == revalued.c.user_id,
+            Account.balance.is_distinct_from(value),
+        )
+        .values(balance=value, updated_at=func.now())
+        .returning(Account.id, Account.balance),
+        execution_options={"synchronize_session": False},
+    )
+    rows = result.all()
+
+    deltas: dict[int, float] = defaultdict(float)
+    for account_id, balance in rows:
+        old = before[account_id]
+        if old.is_active:
+            deltas[old.parent_id] += float(balance) - float(old.balance)
+    await record_balances(db, [account_id for account_id, _ in rows])
+    await apply_balance_deltas(deltas, db)
+
+
+async def revalue_stocks(
+    db: AsyncSession, prices: dict[str, float], user_id: int | None = None,
+    after_id: int | None = None, limit: int | None = None,
+) -> Revaluation:
+    """Set `current_price` on holdings by ticker, for one user or all, and sync their accounts.
+
+    Tickers match case-insensitively; every holding of a ticker is updated.
+    Holdings already at their price are left untouched.
+    """
+    prices = {ticker.strip().upper(): price for ticker, price in prices.items()}
+    if not prices:
+        return Revaluation()
+
+    new_prices = values(
+        column("ticker", String), column("price", Numeric), name="new_prices",
+    ).data(list(prices.items()))
+    new_price = cast(new_prices.c.price, StockHolding.current_price.type)
+    symbol = func.upper(StockHolding.ticker)
+    matching = select(StockHolding.id, StockHolding.user_id, symbol).where(symbol == new_prices.c.ticker)
+    if user_id is not None:
+        matching = matching.where(StockHolding.user_id == user_id)
+    rows, last_id = await _lock_changed(
+        db, StockHolding, matching, StockHolding.current_price.is_distinct_from(new_price), after_id, limit,
+    )
+
+    matched = {ticker for _, _, ticker, _ in rows}
+    result = Revaluation(unknown_tickers=sorted(t for t in prices if t not in matched), last_id=last_id)
+    ids = [holding_id for holding_id, _, _, changed in rows if changed]
+    if not ids:
+        return result
+
+    revalued = (
+        update(StockHolding)
+        .where(StockHolding.id.in_(ids), symbol == new_prices.c.ticker)
+        .values(current_price=new_price, updated_at=func.now())
+        .returning(
+            StockHolding.id, StockHolding.user_id,
+            (StockHolding.shares * StockHolding.current_price).label("value"),
+        )
+    )
+    await _sync_mirrors(db, "stock", ids, revalued.cte("revalued"))
+    result.updated = len(ids)
+    result.user_ids = {user for _, user, _, changed in rows if changed}
+    return result
+
+
+async def revalue_gold(
+    db: AsyncSession, price_per_vori: float, user_id: int | None = None,
+    after_id: int | None = None, limit: int | None = None,
+) -> Revaluation:
+    """Set `current_price_per_vori` on gold holdings, for one user or all, and sync their accounts.
+
+    Holdings already at the price are left untouched.
+    """
+    new_price = cast(literal(price_per_vori, Numeric), GoldHolding.current_price_per_vori.type)
+    matching = select(GoldHolding.id, GoldHolding.user_id, literal(GOLD_SYMBOL))
+    if user_id is not None:
+        matching = matching.where(GoldHolding.user_id == user_id)
+    rows, last_id = await _lock_changed(
+        db, GoldHolding, matching, GoldHolding.current_price_per_vori.is_distinct_from(new_price), after_id, limit,
+    )
+    ids = [holding_id for holding_id, _, _, changed in rows if changed]
+    if not ids:
+        return Revaluation(last_id=last_id)
+
+    revalued = (
+        update(GoldHolding)
+        .where(GoldHolding.id.in_(ids))
+        .values(current_price_per_vori=new_price, updated_at=func.now())
+        .returning(
+            GoldHolding.id, GoldHolding.user_id,
+            (GoldHolding.weight_vori * GoldHolding.current_price_per_vori).label("value"),
+        )
+    )
+    await _sync_mirrors(db, "gold", ids, revalued.cte("revalued"))
+    return Revaluation(
+        updated=len(ids), user_ids={user for _, user, _, changed in rows if changed}, last_id=last_id,
+    )
@@ -0,0 +1,84 @@
+"""Incremental maintenance of the transaction_monthly_rollups table.
+
+Writers call `apply_transaction` inside the same DB transaction as the
+change they make, so the rollup never drifts from the transactions table.
+`rebuild_monthly_rollups` recomputes it from scratch for existing data:
+
+    python -m app.services.rollups [--user-id ID]
+"""
+import argparse
+import asyncio
+from datetime import date
+
+from sqlalchemy import delete, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.cache import report_cache
+from app.core.database import async_session
+from app.models.transaction import Transaction, TransactionMonthlyRollup
+
+
+async def apply_rollup_delta(
+    db: AsyncSession, user_id: int, month: date, type: str, category: str,
+    amount: float, count: int,
+):
+    stmt = insert(TransactionMonthlyRollup).values(
+        user_id=user_id, month=month, type=type, category=category,
+        total=amount, txn_count=count,
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["user_id", "month", "type", "category"],
+        set_={
+            "total": TransactionMonthlyRollup.total + stmt.excluded.total,
+            "txn_count": TransactionMonthlyRollup.txn_count + stmt.excluded.txn_count,
+        },
+    )
+    await db.execute(stmt)
+
+
+async def apply_transaction(db: AsyncSession, txn: Transaction, sign: int = 1):
+    """Add (sign=1) or remove (sign=-1) a transaction's contribution to its month."""
+    await apply_rollup_delta(
+        db, txn.user_id, txn.date.replace(day=1), txn.type, txn.category,
+        sign * float(txn.amount), sign,
+    )
+
+
+async def rebuild_monthly_rollups(db: AsyncSession, user_id: int | None = None) -> int:
+    """Recompute rollups from the transactions table. Returns the number of rollup rows."""
+    clear = delete(TransactionMonthlyRollup)
+    month = func.date_trunc("month", Transaction.date).cast(TransactionMonthlyRollup.month.type)
+    source = select(
+        Transaction.user_id, month, Transaction.type, Transaction.category,
+        func.sum(Transaction.amount), func.count(),
+    ).group_by(Transaction.user_id, month, Transaction.type, Transaction.category)
+    if user_id is not None:
+        clear = clear.where(TransactionMonthlyRollup.user_id == user_id)
+        source = source.where(Transaction.user_id == user_id)
+
+    cleared = await db.execute(clear.returning(TransactionMonthlyRollup.user_id))
+    user_ids = set(cleared.scalars().all())
+    result = await db.execute(
+        insert(TransactionMonthlyRollup).from_select(
+            ["user_id", "month", "type", "category", "total", "txn_count"], source
+        ).returning(TransactionMonthlyRollup.user_id)
+    )
+    rebuilt = list(result.scalars().all())
+    await db.commit()
+    for affected in user_ids | set(rebuilt):
+        await report_cache.invalidate(affected)
+    return len(rebuilt)
+
+
+async def _main(user_id: int | None):
+    async with async_session() as db:
+        rows = await rebuild_monthly_rollups(db, user_id)
+    print(f"Rebuilt {rows} rollup rows")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild transaction monthly rollups")
+    parser.add_argument("--user-id", type=int, default=None)
+    args = parser.parse_args()
+    asyncio.run(_main(args.user_id))
@@ -0,0 +1,79 @@
+"""Consistency check and repair for delta-maintained parent balances.
+
+Writers keep each parent's balance in step by applying deltas (see
+`app.api.accounts.apply_balance_delta`). This module compares the stored
+balances, at every depth, with the closure-table rollup of their leaves and
+can rewrite the ones that drifted:
+
+    python -m app.services.segments [--user-id ID] [--repair]
+"""
+import argparse
+import asyncio
+
+from sqlalchemy import exists, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from app.core.cache import report_cache
+from app.core.database import async_session
+from app.models.account import Account, AccountBalanceHistory
+from app.services.balance_history import recorded
+from app.services.hierarchy import rollup_query
+
+
+def _drift_query(user_id: int | None = None):
+    child = aliased(Account)
+    rollup = rollup_query(user_id).subquery()
+    actual = func.coalesce(rollup.c.total, 0)
+    query = (
+        select(Account.id.label("id"), Account.balance.label("stored"), actual.label("actual"))
+        .outerjoin(rollup, rollup.c.id == Account.id)
+        .where(
+            or_(Account.is_segment == True, exists().where(child.parent_id == Account.id)),
+            Account.balance != actual,
+        )
+    )
+    if user_id is not None:
+        query = query.where(Account.user_id == user_id)
+    return query
+
+
+async def find_balance_drift(db: AsyncSession, user_id: int | None = None) -> list[tuple[int, float, float]]:
+    """Returns (account_id, stored_balance, rolled_up_total) for every parent that drifted."""
+    result = await db.execute(_drift_query(user_id))
+    return [(id_, float(stored), float(actual)) for id_, stored, actual in result.all()]
+
+
+async def repair_balance_drift(db: AsyncSession, user_id: int | None = None) -> int:
+    """Rewrite drifted parent balances from their leaves. Returns the number repaired."""
+    drift = _drift_query(user_id).subquery()
+    result = await db.execute(
+        recorded(
+            update(Account).where(Account.id == drift.c.id).values(balance=drift.c.actual)
+        ).returning(AccountBalanceHistory.user_id),
+        execution_options={"synchronize_session": False},
+    )
+    user_ids = list(result.scalars().all())
+    await db.commit()
+    for affected in set(user_ids):
+        await report_cache.invalidate(affected)
+    return len(user_ids)
+
+
+async def _main(user_id: int | None, repair: bool):
+    async with async_session() as db:
+        if repair:
+            print(f"Repaired {await repair_balance_drift(db, user_id)} balances")
+            return
+        drift = await find_balance_drift(db, user_id)
+    for account_id, stored, actual in drift:
+        print(f"account {account_id}: stored {stored:.2f}, rolled up {actual:.2f}")
+    print(f"{len(drift)} drifted balances")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Check or repair parent account balances")
+    parser.add_argument("--user-id", type=int, default=None)
+    parser.add_argument("--repair", action="store_true")
+    args = parser.parse_args()
+    asyncio.run(_main(args.user_id, args.repair))
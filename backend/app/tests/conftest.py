@@ -1,14 +1,19 @@
 import asyncio
+import time
+from contextlib import contextmanager
 from typing import AsyncGenerator
 
 import pytest
 import pytest_asyncio
 from httpx import ASGITransport, AsyncClient
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 
+from app.core.cache import MemoryCacheBackend, report_cache, segment_ids
 from app.core.config import settings
 from app.core.database import Base, get_db
 from app.main import app
+from app.services.fx import fx_cache
 
 # Only replace the last /assetflow (database name), not the username in the URL
 _base = settings.DATABASE_URL.rsplit("/assetflow", 1)
@@ -32,15 +37,66 @@ async def setup_db():
             yield session
 
     app.dependency_overrides[get_db] = override_get_db
+    report_cache.backend = MemoryCacheBackend()
+    segment_ids.clear()
+    fx_cache.clear()
 
     async with engine_test.begin() as conn:
         await conn.run_sync(Base.metadata.create_all)
-    yield
+    yield session_factory
     async with engine_test.begin() as conn:
         await conn.run_sync(Base.metadata.drop_all)
     await engine_test.dispose()
 
 
+@pytest_asyncio.fixture
+async def db(setup_db) -> AsyncGenerator[AsyncSession, None]:
+    async with setup_db() as session:
+        yield session
+
+
+class StatementCounter:
+    """Counts SQL statements and their total DB time on the test engine."""
+
+    def __init__(self, engine):
+        self.engine = engine.sync_engine
+        self.statements: list[str] = []
+        self.seconds = 0.0
+        self._started: list[float] = []
+        self._active = False
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        if self._active:
+            self.statements.append(statement)
+            self._started.append(time.perf_counter())
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        if self._active and self._started:
+            self.seconds += time.perf_counter() - self._started.pop()
+
+    @property
+    def count(self) -> int:
+        return len(self.statements)
+
+    @contextmanager
+    def measure(self):
+        self.statements, self.seconds, self._active = [], 0.0, True
+        try:
+            yield self
+        finally:
+            self._active = False
+
+
+@pytest.fixture
+def sql_counter(setup_db):
+    counter = StatementCounter(setup_db.kw["bind"])
+    event.listen(counter.engine, "before_cursor_execute", counter._before)
+    event.listen(counter.engine, "after_cursor_execute", counter._after)
+    yield counter
+    event.remove(counter.engine, "before_cursor_execute", counter._before)
+    event.remove(counter.engine, "after_cursor_execute", counter._after)
+
+
 @pytest_asyncio.fixture
 async def client() -> AsyncGenerator[AsyncClient, None]:
     transport = ASGITransport(app=app)
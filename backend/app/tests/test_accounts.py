@@ -1,5 +1,13 @@
+import asyncio
+from datetime import datetime, timezone
+
 import pytest
 from httpx import AsyncClient
+from sqlalchemy import update
+
+from app.core.cache import segment_ids
+from app.models.account import Account, AccountBalanceHistory
+from app.services.segments import find_balance_drift, repair_balance_drift
 
 
 @pytest.mark.asyncio
@@ -40,3 +48,286 @@ async def test_delete_account(auth_client: AsyncClient):
     aid = create.json()["id"]
     resp = await auth_client.delete(f"/accounts/{aid}")
     assert resp.status_code == 204
+
+
+@pytest.mark.asyncio
+async def test_purse_conditional_get(auth_client: AsyncClient):
+    await auth_client.post("/accounts", json={
+        "name": "Main", "type": "asset", "category": "bank", "balance": 100,
+    })
+    first = await auth_client.get("/accounts/purse")
+    assert first.status_code == 200
+    resp = await auth_client.get("/accounts/purse", headers={"If-None-Match": first.headers["etag"]})
+    assert resp.status_code == 304
+
+    await auth_client.post("/accounts", json={
+        "name": "Brokerage", "type": "asset", "category": "investment", "balance": 50,
+    })
+    resp = await auth_client.get("/accounts/purse", headers={"If-None-Match": first.headers["etag"]})
+    assert resp.status_code == 200
+
+
+async def _balance(client: AsyncClient, account_id: int) -> float:
+    accounts = (await client.get("/accounts")).json()
+    return next(a["balance"] for a in accounts if a["id"] == account_id)
+
+
+@pytest.mark.asyncio
+async def test_segment_balance_follows_child_writes(auth_client: AsyncClient):
+    a = (await auth_client.post("/accounts", json={
+        "name": "A", "type": "asset", "category": "cash", "balance": 100,
+    })).json()
+    b = (await auth_client.post("/accounts", json={
+        "name": "B", "type": "asset", "category": "cash", "balance": 50,
+    })).json()
+    seg = a["parent_id"]
+    other = (await auth_client.post("/accounts", json={
+        "name": "Gold", "type": "asset", "category": "gold", "balance": 10,
+    })).json()["parent_id"]
+    assert await _balance(auth_client, seg) == 150
+
+    await auth_client.put(f"/accounts/{a['id']}", json={"balance": 300})
+    assert await _balance(auth_client, seg) == 350
+
+    await auth_client.put(f"/accounts/{b['id']}", json={"is_active": False})
+    assert await _balance(auth_client, seg) == 300
+
+    await auth_client.put(f"/accounts/{a['id']}", json={"parent_id": other, "balance": 20})
+    assert await _balance(auth_client, seg) == 0
+    assert await _balance(auth_client, other) == 30
+
+    await auth_client.delete(f"/accounts/{a['id']}")
+    assert await _balance(auth_client, other) == 10
+
+
+@pytest.mark.asyncio
+async def test_concurrent_child_updates_do_not_lose_increments(auth_client: AsyncClient):
+    children = [
+        (await auth_client.post("/accounts", json={
+            "name": f"C{i}", "type": "asset", "category": "cash", "balance": 0,
+        })).json()
+        for i in range(8)
+    ]
+    await asyncio.gather(*(
+        auth_client.put(f"/accounts/{c['id']}", json={"balance": 10 * (i + 1)})
+        for i, c in enumerate(children)
+    ))
+    assert await _balance(auth_client, children[0]["parent_id"]) == 360
+
+
+@pytest.mark.asyncio
+async def test_find_and_repair_balance_drift(auth_client: AsyncClient, db):
+    acct = (await auth_client.post("/accounts", json={
+        "name": "Main", "type": "asset", "category": "cash", "balance": 500,
+    })).json()
+    assert await find_balance_drift(db) == []
+
+    await db.execute(update(Account).where(Account.id == acct["parent_id"]).values(balance=1))
+    await db.commit()
+    assert await find_balance_drift(db) == [(acct["parent_id"], 1.0, 500.0)]
+
+    assert await repair_balance_drift(db) == 1
+    assert await find_balance_drift(db) == []
+
+
+@pytest.mark.asyncio
+async def test_parent_must_belong_to_user(auth_client: AsyncClient):
+    mine = (await auth_client.post("/accounts", json={
+        "name": "Mine", "type": "asset", "category": "cash", "balance": 10,
+    })).json()["id"]
+    await auth_client.post("/auth/register", json={
+        "email": "other@example.com", "password": "otherpass123", "full_name": "Other",
+    })
+    token = (await auth_client.post("/auth/login", json={
+        "email": "other@example.com", "password": "otherpass123",
+    })).json()["access_token"]
+    auth_client.headers["Authorization"] = f"Bearer {token}"
+
+    resp = await auth_client.post("/accounts", json={
+        "name": "Sneaky", "type": "asset", "category": "cash", "balance": 5, "parent_id": mine,
+    })
+    assert resp.status_code == 404
+    theirs = (await auth_client.post("/accounts", json={
+        "name": "Theirs", "type": "asset", "category": "cash", "balance": 5,
+    })).json()
+    assert (await auth_client.put(f"/accounts/{theirs['id']}", json={"parent_id": mine})).status_code == 404
+    assert (await auth_client.get(f"/accounts/{theirs['id']}")).json()["parent_id"] == theirs["parent_id"]
+
+
+@pytest.mark.asyncio
+async def test_purse_and_segment_include_nested_accounts(auth_client: AsyncClient):
+    wallet = (await auth_client.post("/accounts", json={
+        "name": "Wallet", "type": "asset", "category": "cash", "balance": 0,
+    })).json()
+    await auth_client.post("/accounts", json={
+        "name": "Envelope", "type": "asset", "category": "cash", "balance": 25,
+        "parent_id": wallet["id"],
+    })
+
+    purse = (await auth_client.get("/accounts/purse")).json()
+    cash = next(s for s in purse if s["category"] == "cash")
+    assert [a["name"] for a in cash["sub_segments"]] == ["Wallet"]
+    assert [a["name"] for a in cash["sub_segments"][0]["children"]] == ["Envelope"]
+
+    resp = await auth_client.get(f"/accounts/{wallet['parent_id']}")
+    assert resp.status_code == 200
+    assert [a["name"] for a in resp.json()["children"]] == ["Wallet"]
+    assert [a["name"] for a in resp.json()["children"][0]["children"]] == ["Envelope"]
+
+    resp = await auth_client.put(f"/accounts/{wallet['id']}", json={"name": "Purse"})
+    assert (resp.json()["name"], [a["name"] for a in resp.json()["children"]]) == ("Purse", ["Envelope"])
+
+
+@pytest.mark.asyncio
+async def test_deep_hierarchy_rolls_up_at_every_level(auth_client: AsyncClient, db):
+    async def create(name, balance=0, parent_id=None):
+        return (await auth_client.post("/accounts", json={
+            "name": name, "type": "asset", "category": "cash", "balance": balance, "parent_id": parent_id,
+        })).json()
+
+    bank = await create("Bank")
+    segment_id = bank["parent_id"]
+    wallet = await create("Wallet", parent_id=bank["id"])
+    rent = await create("Rent", 300, parent_id=wallet["id"])
+    await create("Food", 200, parent_id=wallet["id"])
+    savings = await create("Savings", parent_id=bank["id"])
+    await create("Deposit", 1000, parent_id=savings["id"])
+
+    assert await _balance(auth_client, segment_id) == 1500
+    assert await _balance(auth_client, bank["id"]) == 1500
+    assert await _balance(auth_client, wallet["id"]) == 500
+    assert await _balance(auth_client, savings["id"]) == 1000
+    dashboard = (await auth_client.get("/reports/dashboard")).json()
+    assert dashboard["total_assets"] == 1500
+
+    # Moving a subtree shifts its total between ancestors
+    await auth_client.put(f"/accounts/{wallet['id']}", json={"parent_id": savings["id"]})
+    assert await _balance(auth_client, bank["id"]) == 1500
+    assert await _balance(auth_client, savings["id"]) == 1500
+
+    # Deactivating a mid-level account drops everything beneath it
+    await auth_client.put(f"/accounts/{wallet['id']}", json={"is_active": False})
+    assert await _balance(auth_client, segment_id) == 1000
+    await auth_client.put(f"/accounts/{rent['id']}", json={"balance": 350})
+    assert await _balance(auth_client, wallet["id"]) == 550
+    assert await _balance(auth_client, segment_id) == 1000
+    assert await find_balance_drift(db) == []
+
+    resp = await auth_client.put(f"/accounts/{bank['id']}", json={"parent_id": rent["id"]})
+    assert resp.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_segments_created_once_under_concurrency(auth_client: AsyncClient):
+    segment_ids.clear()
+    created = await asyncio.gather(*(
+        auth_client.post("/accounts", json={
+            "name": f"A{i}", "type": "asset", "category": category, "balance": 10,
+        })
+        for i, category in enumerate(["cash", "bank", "cash", "loan", "gold", "crypto"])
+    ))
+    assert all(r.status_code == 201 for r in created)
+
+    purse = (await auth_client.get("/accounts/purse")).json()
+    assert len(purse) == len({s["category"] for s in purse}) == 8
+    cash = next(s for s in purse if s["category"] == "cash")
+    assert sorted(a["name"] for a in cash["sub_segments"]) == ["A0", "A1", "A2"]
+    assert segment_ids.get(1, "cash") == cash["id"]
+
+    # A deleted segment is recreated rather than served stale from the cache
+    await auth_client.delete(f"/accounts/{cash['id']}")
+    assert segment_ids.get(1, "cash") is None
+    # Other workers still have the old id cached
+    segment_ids.put(1, "cash", cash["id"])
+    resp = await auth_client.post("/accounts", json={
+        "name": "Fresh", "type": "asset", "category": "cash", "balance": 1,
+    })
+    assert resp.status_code == 201
+    assert resp.json()["parent_id"] not in (None, cash["id"])
+    assert segment_ids.get(1, "cash") == resp.json()["parent_id"]
+
+    gold = next(s for s in purse if s["category"] == "gold")
+    await auth_client.delete(f"/accounts/{gold['id']}")
+    segment_ids.put(1, "gold", gold["id"])
+    resp = await auth_client.post("/investments/gold", json={
+        "name": "Ring", "weight": 1, "purchase_price_per_vori": 100, "current_price_per_vori": 100,
+    })
+    assert resp.status_code == 201
+    purse = (await auth_client.get("/accounts/purse")).json()
+    gold = next(s for s in purse if s["category"] == "gold")
+    assert [a["name"] for a in gold["sub_segments"]] == ["Ring"]
+    assert gold["total_balance"] == 100
+
+
+@pytest.mark.asyncio
+async def test_bulk_import_json_and_csv(auth_client: AsyncClient):
+    wallet = (await auth_client.post("/accounts", json={
+        "name": "Wallet", "type": "asset", "category": "cash", "balance": 0,
+    })).json()
+    rows = [
+        {"name": f"Envelope {i}", "type": "asset", "category": "cash", "balance": 10, "parent_id": wallet["id"]}
+        for i in range(500)
+    ]
+    rows += [
+        {"name": "Card", "type": "liability", "category": "credit_card", "balance": 300},
+        {"name": "No balance", "type": "asset", "category": "bank", "balance": "lots"},
+        {"name": "Orphan", "type": "asset", "category": "cash", "parent_id": 999999},
+    ]
+    resp = await auth_client.post("/accounts/bulk", json=rows)
+    assert resp.status_code == 200
+    body = resp.json()
+    assert body["created"] == len(body["account_ids"]) == 501
+    assert [e["row"] for e in body["errors"]] == [502, 503]
+    assert body["errors"][0]["error"].startswith("balance:")
+    assert await _balance(auth_client, wallet["id"]) == 5000
+    assert await _balance(auth_client, wallet["parent_id"]) == 5000
+
+    csv_body = "name,type,category,balance\nGold coin,asset,gold,250\nLoan,liability,loan,\n,asset,cash,1\n"
+    resp = await auth_client.post(
+        "/accounts/bulk", files={"file": ("accounts.csv", csv_body, "text/csv")},
+    )
+    body = resp.json()
+    assert body["created"] == 2
+    assert [e["row"] for e in body["errors"]] == [3]
+
+    resp = await auth_client.post(
+        "/accounts/bulk", content=csv_body, headers={"Content-Type": "text/csv"},
+    )
+    assert resp.json()["created"] == 2
+    purse = (await auth_client.get("/accounts/purse")).json()
+    gold = next(s for s in purse if s["category"] == "gold")
+    assert gold["total_balance"] == 500
+
+
+@pytest.mark.asyncio
+async def test_balance_history_and_balance_at(auth_client: AsyncClient, db):
+    acct = (await auth_client.post("/accounts", json={
+        "name": "Savings", "type": "asset", "category": "bank", "balance": 100,
+    })).json()
+    await auth_client.put(f"/accounts/{acct['id']}", json={"balance": 150})
+    resp = await auth_client.get(f"/accounts/{acct['id']}/history")
+    assert [p["balance"] for p in resp.json()["points"]] == [150]
+
+    user_id = (await auth_client.get("/auth/me")).json()["id"]
+    db.add_all([
+        AccountBalanceHistory(
+            account_id=acct["id"], user_id=user_id, balance=balance,
+            recorded_at=datetime(2026, month, day, tzinfo=timezone.utc),
+        )
+        # The last two share a timestamp, as writes in one transaction do
+        for month, day, balance in [(1, 5, 10), (1, 20, 20), (2, 3, 30), (3, 9, 40), (3, 28, 50), (3, 28, 55)]
+    ])
+    await db.commit()
+
+    url = f"/accounts/{acct['id']}/history"
+    monthly = (await auth_client.get(url, params={"to": "2026-03-31", "resolution": "monthly"})).json()
+    assert [p["balance"] for p in monthly["points"]] == [20, 30, 55]
+    daily = (await auth_client.get(url, params={"from": "2026-02-01", "to": "2026-03-10"})).json()
+    assert [p["balance"] for p in daily["points"]] == [20, 30, 40]
+
+    at = await auth_client.get(f"/accounts/{acct['id']}/balance-at", params={"at": "2026-03-01T00:00:00Z"})
+    assert at.json()["balance"] == 30
+    at = await auth_client.get(f"/accounts/{acct['id']}/balance-at", params={"at": "2026-03-29T00:00:00Z"})
+    assert at.json()["balance"] == 55
+    before = await auth_client.get(f"/accounts/{acct['id']}/balance-at", params={"at": "2025-12-31T00:00:00Z"})
+    assert before.status_code == 404
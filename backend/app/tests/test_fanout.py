@@ -0,0 +1,44 @@
+import pytest
+from sqlalchemy import func, literal, select
+
+from app.core.fanout import FanOut
+
+
+class ActiveSessions:
+    """Job factory that records how many jobs hold a session at once."""
+
+    def __init__(self):
+        self.active = self.peak = 0
+
+    def job(self):
+        async def run(session):
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            try:
+                return await session.scalar(select(func.pg_backend_pid()).where(func.pg_sleep(0.05).is_not(None)))
+            finally:
+                self.active -= 1
+        return run
+
+
+@pytest.mark.asyncio
+async def test_fanout_runs_queries_concurrently_within_limit(db):
+    sessions = ActiveSessions()
+    pids = await FanOut(db, limit=4).run(*(sessions.job() for _ in range(4)))
+    assert sessions.peak == 4
+    assert len(set(pids)) == 4  # each on its own pooled connection
+
+    sessions = ActiveSessions()
+    await FanOut(db, limit=2).run(*(sessions.job() for _ in range(6)))
+    assert sessions.peak == 2
+
+
+@pytest.mark.asyncio
+async def test_fanout_run_keeps_job_order(db):
+    await db.scalar(select(literal(1)))
+    results = await FanOut(db).run(
+        lambda session: session.scalar(select(literal("a"))),
+        lambda session: session.scalar(select(literal("b"))),
+    )
+    assert results == ["a", "b"]
+    assert not db.in_transaction()  # the request's connection went back to the pool first
@@ -1,6 +1,10 @@
+from datetime import date, timedelta
+
 import pytest
 from httpx import AsyncClient
 
+from app.models.investment import NetWorthSnapshot
+
 
 @pytest.mark.asyncio
 async def test_stock_crud(auth_client: AsyncClient):
@@ -52,3 +56,218 @@ async def test_portfolio_summary(auth_client: AsyncClient):
     resp = await auth_client.get("/investments/portfolio")
     assert resp.status_code == 200
     assert "total_portfolio_value" in resp.json()
+
+
+@pytest.mark.asyncio
+async def test_batch_price_revaluation(auth_client: AsyncClient):
+    for ticker, shares in [("AAPL", 10), ("MSFT", 5), ("aapl", 2), ("GOOG", 1)]:
+        await auth_client.post("/investments/stocks", json={
+            "ticker": ticker, "name": ticker, "shares": shares, "avg_cost": 100, "current_price": 100,
+        })
+    resp = await auth_client.put("/investments/stocks/prices", json={"AAPL": 150, "msft": 80, "TSLA": 1})
+    assert resp.status_code == 200
+    assert resp.json() == {"updated": 3, "unknown_tickers": ["TSLA"]}
+
+    stocks = {(s["ticker"], s["shares"]): s for s in (await auth_client.get("/investments/stocks")).json()}
+    assert stocks[("AAPL", 10)]["market_value"] == 1500
+    assert stocks[("aapl", 2)]["current_price"] == 150
+    assert stocks[("MSFT", 5)]["market_value"] == 400
+    assert stocks[("GOOG", 1)]["current_price"] == 100
+
+    purse = (await auth_client.get("/accounts/purse")).json()
+    investments = next(s for s in purse if s["category"] == "investment")
+    assert investments["total_balance"] == 1500 + 300 + 400 + 100
+
+
+@pytest.mark.asyncio
+async def test_failed_ledger_sync_leaves_nothing_behind(auth_client: AsyncClient, monkeypatch):
+    import app.services.ledger_sync as ledger_sync
+
+    async def fail(*args):
+        raise RuntimeError("history unavailable")
+
+    await auth_client.get("/accounts/purse")
+    monkeypatch.setattr(ledger_sync, "record_balances", fail)
+    with pytest.raises(RuntimeError):
+        await auth_client.post("/investments/stocks", json={
+            "ticker": "AAPL", "name": "Apple", "shares": 1, "avg_cost": 1, "current_price": 1,
+        })
+    monkeypatch.undo()
+
+    assert (await auth_client.get("/investments/stocks")).json() == []
+    purse = (await auth_client.get("/accounts/purse")).json()
+    investments = next(s for s in purse if s["category"] == "investment")
+    assert investments["sub_segments"] == []
+
+
+@pytest.mark.asyncio
+async def test_price_feed_revalues_stocks_and_gold(auth_client: AsyncClient, setup_db, monkeypatch):
+    from app.services import prices
+    from app.services.prices import FakePriceProvider, PriceFeed
+
+    monkeypatch.setattr(prices, "REVALUE_BATCH_SIZE", 1)
+    for ticker in ["AAPL", "MSFT"]:
+        await auth_client.post("/investments/stocks", json={
+            "ticker": ticker, "name": ticker, "shares": 10, "avg_cost": 100, "current_price": 100,
+        })
+    await auth_client.post("/investments/gold", json={
+        "name": "Bar", "weight": 2, "purchase_price_per_vori": 100, "current_price_per_vori": 100,
+    })
+    provider = FakePriceProvider({"AAPL": 120, "MSFT": 110, "GOLD": 150})
+    feed = PriceFeed(provider, ttl=3600, session_factory=setup_db)
+
+    result = await feed.refresh()
+    assert result.updated == 3
+    etag = (await auth_client.get("/investments/portfolio")).headers["etag"]
+    provider.set_price("AAPL", 999)
+    # Served from the price cache, so nothing changes and nothing is rewritten
+    result = await feed.refresh()
+    assert provider.calls == 1
+    assert (result.updated, result.user_ids) == (0, set())
+    resp = await auth_client.get("/investments/portfolio", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+
+    stocks = {s["ticker"]: s for s in (await auth_client.get("/investments/stocks")).json()}
+    assert stocks["AAPL"]["market_value"] == 1200
+    assert stocks["MSFT"]["market_value"] == 1100
+    gold = (await auth_client.get("/investments/gold")).json()[0]
+    assert gold["current_value"] == 300
+    purse = {s["category"]: s for s in (await auth_client.get("/accounts/purse")).json()}
+    assert purse["investment"]["total_balance"] == 2300
+    assert purse["gold"]["total_balance"] == 300
+
+
+@pytest.mark.asyncio
+async def test_list_endpoints_compute_derived_fields(auth_client: AsyncClient):
+    await auth_client.post("/investments/stocks", json={
+        "ticker": "AAPL", "name": "Apple", "shares": 3, "avg_cost": 150, "current_price": 170,
+    })
+    await auth_client.post("/investments/stocks", json={
+        "ticker": "FREE", "name": "Gift", "shares": 1, "avg_cost": 0, "current_price": 10,
+    })
+    await auth_client.post("/investments/real-estate", json={
+        "name": "Flat", "location": "City", "property_type": "apartment",
+        "estimated_value": 1000, "monthly_rent": 25.5,
+    })
+    await auth_client.post("/investments/business", json={
+        "name": "Shop", "equity_percent": 10, "invested_value": 100, "current_value": 80,
+    })
+    await auth_client.post("/investments/gold", json={
+        "name": "Coin", "weight": 2, "purchase_price_per_vori": 100, "current_price_per_vori": 110,
+    })
+
+    aapl, gift = (await auth_client.get("/investments/stocks")).json()
+    assert (aapl["market_value"], aapl["gain_loss"], aapl["gain_loss_pct"]) == (510, 60, 13.33)
+    assert gift["gain_loss_pct"] == 0
+    assert (await auth_client.get("/investments/real-estate")).json()[0]["annual_rent"] == 306
+    assert (await auth_client.get("/investments/business")).json()[0]["gain_loss"] == -20
+    coin = (await auth_client.get("/investments/gold")).json()[0]
+    assert (coin["weight_grams"], coin["current_value"], coin["gain_loss"]) == (23.328, 220, 20)
+
+
+async def _trade(client: AsyncClient, stock_id: int, side: str, shares: float, price: float, day: int):
+    resp = await client.post(f"/investments/stocks/{stock_id}/trades", json={
+        "side": side, "shares": shares, "price": price, "traded_at": f"2026-01-{day:02d}T00:00:00Z",
+    })
+    return resp
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("method,realized,open_lots,avg_cost", [
+    ("fifo", 15 * 30 - (10 * 10 + 5 * 20), [(5, 20), (10, 30)], 26.67),
+    ("lifo", 15 * 30 - (10 * 30 + 5 * 20), [(10, 10), (5, 20)], 13.33),
+    ("average", 15 * 30 - 15 * 20, [(5, 20), (10, 30)], 20),
+])
+async def test_trades_match_lots(auth_client: AsyncClient, monkeypatch, method, realized, open_lots, avg_cost):
+    from app.services import lots as lot_engine
+
+    # Matching has to page through the open lots
+    monkeypatch.setattr(lot_engine, "LOT_PAGE_SIZE", 1)
+    stock = (await auth_client.post("/investments/stocks", json={
+        "ticker": "LOT", "name": "Lots", "shares": 0, "avg_cost": 0, "current_price": 30, "cost_method": method,
+    })).json()
+    for price, day in [(10, 1), (20, 2), (30, 3)]:
+        assert (await _trade(auth_client, stock["id"], "buy", 10, price, day)).status_code == 201
+
+    sold = await _trade(auth_client, stock["id"], "sell", 15, 30, 4)
+    assert sold.status_code == 201
+    assert sold.json()["realized_gain"] == realized
+    assert (await _trade(auth_client, stock["id"], "sell", 100, 30, 5)).status_code == 400
+
+    lots = (await auth_client.get(f"/investments/stocks/{stock['id']}/lots")).json()
+    assert [(lot["shares_open"], lot["cost_per_share"]) for lot in lots] == open_lots
+    holding = (await auth_client.get("/investments/stocks")).json()[0]
+    assert (holding["shares"], holding["avg_cost"], holding["realized_gain"]) == (15, avg_cost, realized)
+    assert holding["market_value"] == 450
+
+    purse = {s["category"]: s for s in (await auth_client.get("/accounts/purse")).json()}
+    assert purse["investment"]["total_balance"] == 450
+    trades = (await auth_client.get(f"/investments/stocks/{stock['id']}/trades")).json()
+    assert [t["side"] for t in trades] == ["sell", "buy", "buy", "buy"]
+
+
+@pytest.mark.asyncio
+async def test_performance_returns(auth_client: AsyncClient, db):
+    user_id = (await auth_client.get("/auth/me")).json()["id"]
+    for day, stocks, gold in [(date(2025, 1, 1), 1000, 500), (date(2025, 7, 2), 1100, 500), (date(2026, 1, 1), 1650, 500)]:
+        db.add(NetWorthSnapshot(
+            user_id=user_id, date=day, total_assets=stocks + gold, total_liabilities=0, net_worth=stocks + gold,
+            breakdown=f'{{"investment": {stocks}, "gold": {gold}, "cash": 20}}',
+        ))
+    await db.commit()
+    stock = (await auth_client.post("/investments/stocks", json={
+        "ticker": "PERF", "name": "Perf", "shares": 0, "avg_cost": 0, "current_price": 50,
+    })).json()
+    # A 500 contribution on the last day; stocks grew 10% then 150 / 1100
+    assert (await auth_client.post(f"/investments/stocks/{stock['id']}/trades", json={
+        "side": "buy", "shares": 10, "price": 50, "traded_at": "2026-01-01T00:00:00Z",
+    })).status_code == 201
+
+    resp = await auth_client.get("/investments/performance")
+    assert resp.status_code == 200
+    report = resp.json()
+    assert (report["start"], report["end"]) == ("2025-01-01", "2026-01-01")
+    classes = {m["asset_class"]: m for m in report["asset_classes"]}
+    assert classes["stocks"] == {
+        "asset_class": "stocks", "start_value": 1000, "end_value": 1650, "net_flows": 500,
+        "twr_pct": 15, "xirr_pct": 15,
+    }
+    assert (classes["gold"]["twr_pct"], classes["gold"]["xirr_pct"]) == (0, 0)
+    assert (classes["real_estate"]["twr_pct"], classes["real_estate"]["xirr_pct"]) == (None, None)
+    overall = report["overall"]
+    assert (overall["start_value"], overall["end_value"], overall["twr_pct"], overall["xirr_pct"]) == (1500, 2150, 10, 10)
+
+    later = (await auth_client.get("/investments/performance", params={"from": "2025-07-01"})).json()
+    assert later["start"] == "2025-07-02"
+    assert {m["asset_class"]: m["twr_pct"] for m in later["asset_classes"]}["stocks"] == 4.55
+
+
+
+@pytest.mark.asyncio
+async def test_performance_counts_holding_writes_as_flows(auth_client: AsyncClient, db):
+    user_id = (await auth_client.get("/auth/me")).json()["id"]
+    today = date.today()
+    for days_ago, value in [(2, 1000), (1, 1100)]:
+        db.add(NetWorthSnapshot(
+            user_id=user_id, date=today - timedelta(days=days_ago), total_assets=value, total_liabilities=0,
+            net_worth=value, breakdown=f'{{"property": {value}}}',
+        ))
+    await db.commit()
+    # Funding a second property is new capital, not a 1000% return
+    await auth_client.post("/investments/real-estate", json={
+        "name": "Flat", "location": "City", "property_type": "apartment", "estimated_value": 10000,
+    })
+    db.add(NetWorthSnapshot(
+        user_id=user_id, date=today, total_assets=11100, total_liabilities=0, net_worth=11100,
+        breakdown='{"property": 11100}',
+    ))
+    await db.commit()
+
+    classes = {m["asset_class"]: m for m in (await auth_client.get("/investments/performance")).json()["asset_classes"]}
+    assert (classes["real_estate"]["net_flows"], classes["real_estate"]["twr_pct"]) == (10000, 10)
+
+    # Deleting one takes it back out
+    flat = (await auth_client.get("/investments/real-estate")).json()[0]
+    await auth_client.delete(f"/investments/real-estate/{flat['id']}")
+    classes = {m["asset_class"]: m for m in (await auth_client.get("/investments/performance")).json()["asset_classes"]}
+    assert classes["real_estate"]["net_flows"] == 0
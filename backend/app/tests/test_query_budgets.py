@@ -0,0 +1,130 @@
+"""Statement-count budgets per endpoint.
+
+Each request runs against a seeded user with a cold report cache, and the
+number of SQL statements it issues must stay within its budget. The count
+doesn't depend on how many rows the user has, so an N+1 loop shows up here
+as soon as it is introduced. Every authenticated request spends one
+statement loading the current user.
+"""
+import pytest
+import pytest_asyncio
+from httpx import AsyncClient
+
+from app.core.cache import MemoryCacheBackend, report_cache
+
+ACCOUNTS = 6
+TRANSACTIONS = 12
+
+
+@pytest_asyncio.fixture
+async def seeded_client(auth_client: AsyncClient) -> AsyncClient:
+    wallet = (await auth_client.post("/accounts", json={
+        "name": "Wallet", "type": "asset", "category": "cash", "balance": 0,
+    })).json()
+    for i in range(ACCOUNTS):
+        acct = (await auth_client.post("/accounts", json={
+            "name": f"Envelope {i}", "type": "asset", "category": "cash",
+            "balance": 100 + i, "parent_id": wallet["id"],
+        })).json()
+    for i in range(TRANSACTIONS):
+        await auth_client.post("/transactions", json={
+            "account_id": acct["id"], "amount": 10 + i, "type": "expense" if i % 3 else "income",
+            "category": f"cat{i % 4}", "date": f"2026-0{1 + i % 9}-15",
+        })
+    for i in range(3):
+        await auth_client.post("/investments/stocks", json={
+            "ticker": f"T{i}", "name": f"Stock {i}", "shares": 10, "avg_cost": 5, "current_price": 6,
+        })
+        await auth_client.post("/investments/gold", json={
+            "name": f"Bar {i}", "weight": 1, "purchase_price_per_vori": 100, "current_price_per_vori": 110,
+        })
+        await auth_client.post("/interest", json={
+            "amount": 5, "source": "bank", "date": "2026-03-01T00:00:00", "fiscal_year": 2026,
+        })
+    await auth_client.post("/investments/real-estate", json={
+        "name": "Flat", "location": "City", "property_type": "residential", "estimated_value": 1000,
+    })
+    await auth_client.post("/investments/business", json={
+        "name": "Shop", "equity_percent": 10, "invested_value": 100, "current_value": 150,
+    })
+    auth_client.account_id = acct["id"]
+    auth_client.segment_id = wallet["parent_id"]
+    return auth_client
+
+
+# (method, path, json body, max statements)
+BUDGETS = [
+    ("GET", "/auth/me", None, 1),
+    ("GET", "/accounts/purse", None, 3),
+    ("GET", "/accounts", None, 2),
+    ("GET", "/accounts/{segment_id}", None, 3),
+    ("GET", "/accounts/{account_id}/history?resolution=weekly", None, 3),
+    ("GET", "/accounts/{account_id}/balance-at?at=2100-01-01T00:00:00Z", None, 3),
+    ("GET", "/transactions", None, 2),
+    ("GET", "/transactions/export", None, 2),
+    ("GET", "/investments/stocks", None, 2),
+    ("GET", "/investments/real-estate", None, 2),
+    ("GET", "/investments/business", None, 2),
+    ("GET", "/investments/gold", None, 2),
+    ("GET", "/investments/portfolio", None, 6),
+    ("GET", "/investments/performance", None, 4),
+    ("GET", "/reports/net-worth", None, 3),
+    ("GET", "/reports/balance-sheet", None, 2),
+    ("GET", "/reports/income-expense", None, 2),
+    ("GET", "/reports/cash-flow", None, 2),
+    ("GET", "/reports/dashboard", None, 4),
+    ("GET", "/reports/trends", None, 2),
+    ("POST", "/zakat/calculate", {}, 5),
+    ("GET", "/interest", None, 2),
+    ("GET", "/interest/fund-summary", None, 2),
+    ("GET", "/interest/fiscal-year/2026", None, 2),
+    # Includes the savepoint around the insert under a cached segment id
+    ("POST", "/accounts", {"name": "New", "type": "asset", "category": "cash", "balance": 5}, 8),
+    ("PUT", "/accounts/{account_id}", {"balance": 500}, 6),
+    ("POST", "/accounts/bulk", [
+        {"name": f"Bulk {i}", "type": "asset", "category": "cash", "balance": i} for i in range(50)
+    ], 6),
+    # Holdings are locked before their mirror accounts
+    ("PUT", "/investments/stocks/prices", {"T0": 7, "T1": 8, "T2": 9, "NOPE": 1}, 6),
+    ("POST", "/transactions", {
+        "account_id": "{account_id}", "amount": 5, "type": "expense", "category": "food", "date": "2026-05-01",
+    }, 4),
+]
+
+
+def _fill(value, client):
+    if isinstance(value, str):
+        return value.format(account_id=client.account_id, segment_id=client.segment_id)
+    if isinstance(value, dict):
+        return {k: _fill(v, client) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_fill(v, client) for v in value]
+    return value
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("method,path,body,budget", BUDGETS, ids=[f"{m} {p}" for m, p, _, _ in BUDGETS])
+async def test_statement_budget(seeded_client: AsyncClient, sql_counter, method, path, body, budget):
+    report_cache.backend = MemoryCacheBackend()
+    body = _fill(body, seeded_client)
+    if isinstance(body, dict) and "account_id" in body:
+        body["account_id"] = int(body["account_id"])
+
+    with sql_counter.measure():
+        resp = await seeded_client.request(method, _fill(path, seeded_client), json=body)
+    assert resp.status_code < 400, resp.text
+    assert sql_counter.count <= budget, (
+        f"{method} {path} issued {sql_counter.count} statements (budget {budget}) "
+        f"in {sql_counter.seconds * 1000:.1f}ms:\n" + "\n".join(sql_counter.statements)
+    )
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("path", ["/accounts/purse", "/reports/dashboard"])
+async def test_warm_cache_budget(seeded_client: AsyncClient, sql_counter, path):
+    await seeded_client.get(path)
+    with sql_counter.measure():
+        resp = await seeded_client.get(path)
+    assert resp.status_code == 200
+    # Current user and change token only
+    assert sql_counter.count <= 2, "\n".join(sql_counter.statements)
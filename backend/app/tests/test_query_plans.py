@@ -0,0 +1,128 @@
+"""EXPLAIN the hot multi-column queries and check they use the composite indexes."""
+import json
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import insert, select, text, tuple_
+from sqlalchemy.dialects import postgresql
+
+from app.models.account import Account
+from app.models.interest import InterestEntry
+from app.models.transaction import Transaction
+from app.models.user import User
+
+USERS = 20
+ACCOUNTS_PER_USER = 150
+TXNS_PER_USER = 500
+INTEREST_PER_USER = 100
+
+
+@pytest_asyncio.fixture
+async def seeded(db):
+    await db.execute(insert(User), [
+        {"id": u, "email": f"user{u}@example.com", "hashed_password": "x", "full_name": f"User {u}", "currency": "USD"}
+        for u in range(1, USERS + 1)
+    ])
+    now = datetime.now(timezone.utc)
+    accounts = []
+    for u in range(1, USERS + 1):
+        for i in range(ACCOUNTS_PER_USER):
+            accounts.append({
+                "id": u * 1000 + i, "user_id": u, "parent_id": None, "name": f"A{i}",
+                "type": "liability" if i % 5 == 0 else "asset", "category": f"seg{i}" if i < 8 else "cash",
+                "balance": i, "currency": "USD", "is_active": i % 10 != 0, "is_segment": i < 8,
+                "source_type": "stock" if i % 3 == 0 else None, "source_id": i if i % 3 == 0 else None,
+                "created_at": now, "updated_at": now,
+            })
+    # First eight accounts of each user are its segments; hang the rest off them
+    for a in accounts:
+        if not a["is_segment"]:
+            a["parent_id"] = a["user_id"] * 1000 + a["id"] % 8
+    await db.execute(insert(Account), [a for a in accounts if a["is_segment"]])
+    await db.execute(insert(Account), [a for a in accounts if not a["is_segment"]])
+    await db.execute(insert(Transaction), [
+        {
+            "user_id": u, "account_id": u * 1000 + 10, "amount": i, "type": "expense",
+            "category": "food", "date": date(2020, 1, 1) + timedelta(days=i * 3),
+            "created_at": now, "updated_at": now,
+        }
+        for u in range(1, USERS + 1) for i in range(TXNS_PER_USER)
+    ])
+    await db.execute(insert(InterestEntry), [
+        {
+            "user_id": u, "amount": i, "source": "bank", "date": now,
+            "status": "distributed" if i % 4 else "received", "fiscal_year": 2015 + i % 10,
+            "created_at": now,
+        }
+        for u in range(1, USERS + 1) for i in range(INTEREST_PER_USER)
+    ])
+    await db.commit()
+    for table in ("accounts", "transactions", "interest_entries"):
+        await db.execute(text(f"ANALYZE {table}"))
+    return db
+
+
+async def index_names(db, stmt) -> set[str]:
+    sql = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    # Rule out sequential scans so the planner shows which index it would use
+    await db.execute(text("SET LOCAL enable_seqscan = off"))
+    result = await db.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))
+    plan = result.scalar()
+    plan = json.loads(plan) if isinstance(plan, str) else plan
+
+    names = set()
+
+    def walk(node):
+        if "Index Name" in node:
+            names.add(node["Index Name"])
+        for child in node.get("Plans", []):
+            walk(child)
+
+    walk(plan[0]["Plan"])
+    await db.rollback()
+    return names
+
+
+@pytest.mark.asyncio
+async def test_leaf_account_scan_uses_composite_index(seeded):
+    stmt = select(Account).where(
+        Account.user_id == 7, Account.is_active == True,
+        Account.is_segment == False, Account.type == "asset",
+    )
+    assert "ix_accounts_user_active_segment_type" in await index_names(seeded, stmt)
+
+
+@pytest.mark.asyncio
+async def test_mirror_account_lookup_uses_source_index(seeded):
+    stmt = select(Account).where(
+        Account.user_id == 7, Account.source_type == "stock", Account.source_id == 30,
+    )
+    assert "ix_accounts_user_source" in await index_names(seeded, stmt)
+
+
+@pytest.mark.asyncio
+async def test_transaction_date_range_and_cursor_use_keyset_index(seeded):
+    by_date = select(Transaction).where(
+        Transaction.user_id == 7, Transaction.date >= date(2021, 1, 1),
+    ).order_by(Transaction.date.desc(), Transaction.id.desc()).limit(20)
+    assert "ix_transactions_user_date_id" in await index_names(seeded, by_date)
+
+    by_cursor = select(Transaction).where(
+        Transaction.user_id == 7, tuple_(Transaction.date, Transaction.id) < (date(2021, 1, 1), 5000),
+    ).order_by(Transaction.date.desc(), Transaction.id.desc()).limit(20)
+    assert "ix_transactions_user_date_id" in await index_names(seeded, by_cursor)
+
+
+@pytest.mark.asyncio
+async def test_interest_fiscal_year_uses_composite_index(seeded):
+    stmt = select(InterestEntry).where(
+        InterestEntry.user_id == 7, InterestEntry.fiscal_year == 2020, InterestEntry.status == "distributed",
+    )
+    assert "ix_interest_entries_user_year_status" in await index_names(seeded, stmt)
+
+
+@pytest.mark.asyncio
+async def test_segment_children_use_partial_parent_index(seeded):
+    stmt = select(Account).where(Account.parent_id == 7003, Account.is_active == True)
+    assert "ix_accounts_parent_active" in await index_names(seeded, stmt)
@@ -0,0 +1,319 @@
+from datetime import date, timedelta
+
+import pytest
+from httpx import AsyncClient
+from sqlalchemy import delete, update
+
+from app.core.cache import RedisCacheBackend, ReportCache, report_cache
+from app.core.config import settings
+from app.models.account import Account
+from app.models.investment import NetWorthSnapshot
+from app.models.transaction import TransactionMonthlyRollup
+from app.services.calculations import month_window_start
+from app.services.fx import fx_cache, load_rates
+from app.services.rollups import rebuild_monthly_rollups
+
+
+@pytest.mark.asyncio
+async def test_dashboard_summary(auth_client: AsyncClient):
+    acct = await auth_client.post("/accounts", json={
+        "name": "Main", "type": "asset", "category": "bank", "balance": 8000,
+    })
+    await auth_client.post("/accounts", json={
+        "name": "Brokerage", "type": "asset", "category": "investment", "balance": 2000,
+    })
+    await auth_client.post("/accounts", json={
+        "name": "Car Loan", "type": "liability", "category": "liability", "balance": 1000,
+    })
+    aid = acct.json()["id"]
+    today = date.today().isoformat()
+    await auth_client.post("/transactions", json={
+        "account_id": aid, "amount": 4000, "type": "income", "category": "salary", "date": today,
+    })
+    await auth_client.post("/transactions", json={
+        "account_id": aid, "amount": 1000, "type": "expense", "category": "food", "date": today,
+    })
+
+    resp = await auth_client.get("/reports/dashboard")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["total_assets"] == 10000
+    assert data["total_liabilities"] == 1000
+    assert data["net_worth"] == 9000
+    assert data["monthly_income"] == 4000
+    assert data["monthly_expense"] == 1000
+    assert data["savings_rate"] == 75
+    assert data["debt_to_asset_ratio"] == 10
+    assert {a["category"]: a["value"] for a in data["asset_allocation"]} == {"bank": 8000, "investment": 2000}
+    assert data["liability_allocation"] == [{"category": "liability", "value": 1000}]
+    assert len(data["recent_transactions"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_income_expense_and_cash_flow(auth_client: AsyncClient):
+    acct = await auth_client.post("/accounts", json={
+        "name": "Main", "type": "asset", "category": "bank", "balance": 0,
+    })
+    aid = acct.json()["id"]
+    today = date.today()
+    for amount, type_, category in [
+        (3000, "income", "salary"),
+        (500, "income", "freelance"),
+        (200, "expense", "food"),
+        (300, "expense", "food"),
+        (1000, "transfer", "savings"),
+    ]:
+        await auth_client.post("/transactions", json={
+            "account_id": aid, "amount": amount, "type": type_,
+            "category": category, "date": today.isoformat(),
+        })
+
+    resp = await auth_client.get("/reports/income-expense")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["total_income"] == 3500
+    assert data["total_expense"] == 500
+    assert data["net"] == 3000
+    by_cat = {c["category"]: c for c in data["by_category"]}
+    assert by_cat["food"] == {"category": "food", "income": 0, "expense": 500}
+    assert "savings" not in by_cat
+
+    resp = await auth_client.get("/reports/cash-flow")
+    assert resp.status_code == 200
+    assert resp.json()["data"] == [
+        {"period": today.strftime("%Y-%m"), "inflow": 3500, "outflow": 500, "net": 3000},
+    ]
+
+
+@pytest.mark.asyncio
+async def test_rollups_follow_transaction_edits(auth_client: AsyncClient):
+    acct = await auth_client.post("/accounts", json={
+        "name": "Main", "type": "asset", "category": "bank", "balance": 0,
+    })
+    aid = acct.json()["id"]
+    today = date.today().isoformat()
+    income = await auth_client.post("/transactions", json={
+        "account_id": aid, "amount": 1000, "type": "income", "category": "salary", "date": today,
+    })
+    expense = await auth_client.post("/transactions", json={
+        "account_id": aid, "amount": 100, "type": "expense", "category": "food", "date": today,
+    })
+
+    await auth_client.put(f"/transactions/{income.json()['id']}", json={"amount": 1500, "category": "bonus"})
+    await auth_client.delete(f"/transactions/{expense.json()['id']}")
+
+    data = (await auth_client.get("/reports/income-expense")).json()
+    assert data["total_income"] == 1500
+    assert data["total_expense"] == 0
+    assert [c["category"] for c in data["by_category"]] == ["bonus"]
+
+
+@pytest.mark.asyncio
+async def test_rebuild_monthly_rollups(auth_client: AsyncClient, db):
+    acct = await auth_client.post("/accounts", json={
+        "name": "Main", "type": "asset", "category": "bank", "balance": 0,
+    })
+    await auth_client.post("/transactions", json={
+        "account_id": acct.json()["id"], "amount": 250, "type": "expense",
+        "category": "rent", "date": date.today().isoformat(),
+    })
+    await db.execute(delete(TransactionMonthlyRollup))
+    await db.commit()
+    assert (await auth_client.get("/reports/income-expense")).json()["total_expense"] == 0
+
+    assert await rebuild_monthly_rollups(db) == 1
+    assert (await auth_client.get("/reports/income-expense")).json()["total_expense"] == 250
+
+
+async def _seed_daily_snapshots(auth_client: AsyncClient, db, start: date, days: int):
+    user_id = (await auth_client.get("/auth/me")).json()["id"]
+    for i in range(days):
+        db.add(NetWorthSnapshot(
+            user_id=user_id, date=start + timedelta(days=i),
+            total_assets=1000 + i, total_liabilities=100, net_worth=900 + i,
+        ))
+    await db.commit()
+
+
+@pytest.mark.asyncio
+async def test_net_worth_history_monthly_buckets(auth_client: AsyncClient, db):
+    await _seed_daily_snapshots(auth_client, db, date(2024, 1, 1), 91)  # Jan 1 .. Mar 31
+
+    resp = await auth_client.get("/reports/net-worth", params={
+        "from": "2024-01-01", "to": "2024-03-31", "resolution": "monthly",
+    })
+    assert resp.status_code == 200
+    history = resp.json()["history"]
+    assert [p["date"] for p in history] == ["2024-01-31", "2024-02-29", "2024-03-31"]
+    assert [p["net_worth"] for p in history] == [930, 959, 990]
+
+    resp = await auth_client.get("/reports/net-worth", params={
+        "from": "2024-02-01", "to": "2024-02-14", "resolution": "weekly",
+    })
+    assert [p["date"] for p in resp.json()["history"]] == ["2024-02-04", "2024-02-11", "2024-02-14"]
+
+
+@pytest.mark.asyncio
+async def test_net_worth_history_is_capped(auth_client: AsyncClient, db, monkeypatch):
+    monkeypatch.setattr(settings, "NET_WORTH_MAX_POINTS", 10)
+    await _seed_daily_snapshots(auth_client, db, date(2024, 1, 1), 95)
+
+    resp = await auth_client.get("/reports/net-worth", params={"to": "2024-12-31"})
+    history = resp.json()["history"]
+    assert len(history) <= 10
+    assert history[-1]["date"] == (date(2024, 1, 1) + timedelta(days=94)).isoformat()
+    assert history == sorted(history, key=lambda p: p["date"])
+
+    # A zero cap still returns the latest point rather than dividing by zero
+    monkeypatch.setattr(settings, "NET_WORTH_MAX_POINTS", 0)
+    resp = await auth_client.get("/reports/net-worth", params={"to": "2024-12-30"})
+    assert [p["date"] for p in resp.json()["history"]] == [history[-1]["date"]]
+
+
+@pytest.mark.asyncio
+async def test_dashboard_cached_until_user_writes(auth_client: AsyncClient, db):
+    acct = await auth_client.post("/accounts", json={
+        "name": "Main", "type": "asset", "category": "bank", "balance": 1000,
+    })
+    assert (await auth_client.get("/reports/dashboard")).json()["total_assets"] == 1000
+
+    # A write that bypasses the API is not seen while the cached entry is valid
+    await db.execute(update(Account).where(Account.id == acct.json()["id"]).values(balance=5000))
+    await db.commit()
+    assert (await auth_client.get("/reports/dashboard")).json()["total_assets"] == 1000
+
+    # Any API write bumps the user's data version
+    await auth_client.put(f"/accounts/{acct.json()['id']}", json={"name": "Renamed"})
+    assert (await auth_client.get("/reports/dashboard")).json()["total_assets"] == 5000
+
+
+@pytest.mark.asyncio
+async def test_cache_falls_back_when_redis_is_down():
+    cache = ReportCache(RedisCacheBackend("redis://127.0.0.1:1/0"), ttl=60)
+
+    async def compute():
+        return {"value": 42}
+
+    assert await cache.get_or_compute(1, "test", compute) == {"value": 42}
+    await cache.invalidate(1)
+    assert await cache.get_or_compute(1, "test", compute) == {"value": 42}
+
+
+@pytest.mark.asyncio
+async def test_writes_invalidate_while_cache_marked_down(auth_client: AsyncClient):
+    acct = (await auth_client.post("/accounts", json={
+        "name": "Main", "type": "asset", "category": "bank", "balance": 1000,
+    })).json()
+    assert (await auth_client.get("/reports/dashboard")).json()["total_assets"] == 1000
+
+    # One error in this worker marks the cache down, but writes still bump the version
+    report_cache._mark_down(OSError("blip"))
+    await auth_client.put(f"/accounts/{acct['id']}", json={"balance": 3000})
+    report_cache._down_until = 0.0
+    assert (await auth_client.get("/reports/dashboard")).json()["total_assets"] == 3000
+
+
+@pytest.mark.asyncio
+async def test_dashboard_conditional_get(auth_client: AsyncClient):
+    acct = await auth_client.post("/accounts", json={
+        "name": "Main", "type": "asset", "category": "bank", "balance": 1000,
+    })
+    first = await auth_client.get("/reports/dashboard")
+    etag = first.headers["etag"]
+
+    resp = await auth_client.get("/reports/dashboard", headers={"If-None-Match": etag})
+    assert resp.status_code == 304
+    assert resp.headers["etag"] == etag
+
+    await auth_client.put(f"/accounts/{acct.json()['id']}", json={"balance": 2000})
+    resp = await auth_client.get("/reports/dashboard", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["etag"] != etag
+    assert resp.json()["total_assets"] == 2000
+
+
+@pytest.mark.asyncio
+async def test_trends(auth_client: AsyncClient):
+    acct = await auth_client.post("/accounts", json={
+        "name": "Main", "type": "asset", "category": "bank", "balance": 0,
+    })
+    aid = acct.json()["id"]
+    start = month_window_start(3)
+    months = [start, date(start.year + start.month // 12, start.month % 12 + 1, 1)]
+    before = month_window_start(4)  # the month before the report, still inside the 12-month window
+    for month, income, food, rent in [(before, 1000, 0, 0), (months[0], 1000, 100, 400), (months[1], 2000, 300, 400)]:
+        for amount, type_, category in [(income, "income", "salary"), (food, "expense", "food"), (rent, "expense", "rent")]:
+            if not amount:
+                continue
+            await auth_client.post("/transactions", json={
+                "account_id": aid, "amount": amount, "type": type_,
+                "category": category, "date": month.isoformat(),
+            })
+
+    resp = await auth_client.get("/reports/trends?months=3")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert data["months"][0] == start.strftime("%Y-%m")
+    first, second, third = data["points"]
+    assert (first["income"], first["expense"]) == (1000, 500)
+    assert (second["income"], second["expense"]) == (2000, 700)
+    assert first["expense_change"] is None
+    assert second["expense_change"] == 200
+    assert second["expense_change_pct"] == 40
+    assert third["expense_change"] == -700
+    assert first["savings_rate_3m"] == 75  # (2000 - 500) / 2000, counting the month before
+    assert third["savings_rate_3m"] == 60  # (3000 - 1200) / 3000
+    assert third["savings_rate_12m"] == 70  # (4000 - 1200) / 4000
+
+    by_cat = {c["category"]: c["moving_average"] for c in data["category_moving_average"]}
+    assert by_cat["food"] == [None, None, round(400 / 3, 2)]
+    assert "salary" not in by_cat
+    assert data["spend_percentiles"]["p50"] == 350
+
+
+@pytest.mark.asyncio
+async def test_totals_convert_currencies_in_sql(auth_client: AsyncClient, db, monkeypatch, caplog):
+    for name, currency, balance in [("Checking", "USD", 100), ("Dhaka", "BDT", 12000), ("Euro", "EUR", 50)]:
+        await auth_client.post("/accounts", json={
+            "name": name, "type": "asset", "category": "cash", "balance": balance, "currency": currency,
+        })
+    await auth_client.post("/accounts", json={
+        "name": "Bullion", "type": "asset", "category": "gold", "balance": 10, "currency": "XAU",
+    })
+    first = await auth_client.get("/reports/dashboard")
+    assert first.json()["total_assets"] == 100  # no rates yet: only USD counts
+    assert "No USD rate for BDT, EUR, XAU" in caplog.text
+    purse = (await auth_client.get("/accounts/purse")).json()
+    assert sum(s["total_balance"] for s in purse) == 100
+
+    # Loaded from another process, so this one's in-memory rates aren't cleared directly
+    monkeypatch.setattr(fx_cache, "clear", lambda: None)
+
+    await load_rates(db, [
+        {"date": date.today() - timedelta(days=3), "base": "USD", "quote": "BDT", "rate": 100},
+        {"date": date.today() - timedelta(days=1), "base": "USD", "quote": "BDT", "rate": 120},
+        {"date": date.today(), "base": "EUR", "quote": "USD", "rate": 1.2},
+        {"date": date.today(), "base": "XAU", "quote": "USD", "rate": 80},
+        {"date": date.today() + timedelta(days=1), "base": "XAU", "quote": "USD", "rate": 999},
+    ])
+    resp = await auth_client.get("/reports/dashboard", headers={"If-None-Match": first.headers["etag"]})
+    assert resp.status_code == 200  # loading rates changes the ETag and the cache key
+    expected = 100 + 12000 / 120 + 50 * 1.2 + 10 * 80
+    assert resp.json()["total_assets"] == pytest.approx(expected)
+    assert (await auth_client.get("/reports/net-worth")).json()["current_net_worth"] == pytest.approx(expected)
+    sheet = (await auth_client.get("/reports/balance-sheet")).json()
+    assert sheet["total_assets"] == pytest.approx(expected)
+    purse = (await auth_client.get("/accounts/purse")).json()
+    assert sum(s["total_balance"] for s in purse) == pytest.approx(expected)
+    zakat = (await auth_client.post("/zakat/calculate", json={})).json()
+    assert zakat["breakdown"]["cash_and_bank"] == pytest.approx(260)
+
+    # A BDT user gets USD inverted and EUR crossed through USD
+    await auth_client.put("/auth/me", json={"currency": "BDT"})
+    dashboard = (await auth_client.get("/reports/dashboard")).json()
+    assert dashboard["total_assets"] == pytest.approx(expected * 120)
+
+    # A stale direct pair loses to a newer rate crossed through USD
+    await load_rates(db, [{"date": date.today() - timedelta(days=5), "base": "EUR", "quote": "BDT", "rate": 1}])
+    dashboard = (await auth_client.get("/reports/dashboard")).json()
+    assert dashboard["total_assets"] == pytest.approx(expected * 120)
@@ -1,6 +1,13 @@
+import csv
+import io
+import json
+from datetime import date, timedelta
+
 import pytest
 from httpx import AsyncClient
 
+from app.models.transaction import Transaction
+
 
 @pytest.mark.asyncio
 async def test_create_transaction(auth_client: AsyncClient):
@@ -33,3 +40,64 @@ async def test_list_transactions_filtered(auth_client: AsyncClient):
     assert resp.status_code == 200
     for t in resp.json():
         assert t["type"] == "income"
+
+
+@pytest.mark.asyncio
+async def test_export_transactions_csv_and_ndjson(auth_client: AsyncClient, db):
+    acct = await auth_client.post("/accounts", json={
+        "name": "Export", "type": "asset", "category": "bank", "balance": 0,
+    })
+    aid = acct.json()["id"]
+    user_id = acct.json()["user_id"]
+    db.add_all([
+        Transaction(
+            user_id=user_id, account_id=aid, amount=i, type="expense" if i % 2 else "income",
+            category="misc", date=date(2024, 1, 1) + timedelta(days=i % 300), tags=["a", "b"],
+        )
+        for i in range(1, 2501)
+    ])
+    await db.commit()
+
+    resp = await auth_client.get("/transactions/export?format=csv")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/csv")
+    rows = list(csv.reader(io.StringIO(resp.text)))
+    assert rows[0][:5] == ["id", "date", "type", "category", "amount"]
+    assert len(rows) == 2501
+    assert rows[1][-1] == "a;b"
+
+    resp = await auth_client.get("/transactions/export", params={"format": "ndjson", "type": "income"})
+    assert resp.status_code == 200
+    lines = [json.loads(line) for line in resp.text.splitlines()]
+    assert len(lines) == 1250
+    assert all(line["type"] == "income" for line in lines)
+    assert lines[0]["date"] >= lines[-1]["date"]
+
+
+@pytest.mark.asyncio
+async def test_list_transactions_keyset_cursor(auth_client: AsyncClient):
+    acct = await auth_client.post("/accounts", json={
+        "name": "Cursor", "type": "asset", "category": "bank", "balance": 0,
+    })
+    aid = acct.json()["id"]
+    for day in (1, 2, 2, 3, 4):
+        await auth_client.post("/transactions", json={
+            "account_id": aid, "amount": day, "type": "expense",
+            "category": "food", "date": f"2024-03-0{day}",
+        })
+
+    seen = []
+    resp = await auth_client.get("/transactions?per_page=2")
+    while True:
+        seen.extend(t["id"] for t in resp.json())
+        cursor = resp.headers.get("x-next-cursor")
+        if not cursor:
+            break
+        resp = await auth_client.get(f"/transactions?per_page=2&cursor={cursor}")
+
+    offset_ids = [t["id"] for t in (await auth_client.get("/transactions?per_page=10")).json()]
+    assert seen == offset_ids
+    assert len(set(seen)) == 5
+
+    resp = await auth_client.get("/transactions?cursor=not-a-cursor")
+    assert resp.status_code == 400